@@ -0,0 +1,128 @@
+import base64
+import hashlib
+import hmac
+import logging
+import os
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+USER = "user"
+MANAGER = "manager"
+GUEST = "guest"
+
+ALGORITHM = "pbkdf2_sha256"
+PASSWORD_ITERATIONS = 600000
+MIGRATION_ITERATIONS = 1000
+SALT_BYTES = 16
+
+_dummy_hash = None
+
+
+class Session(namedtuple("Session", ["user_id", "role", "username"])):
+    __slots__ = ()
+
+    @property
+    def is_admin(self):
+        return self.role == MANAGER
+
+    @property
+    def is_guest(self):
+        return self.role == GUEST
+
+
+GUEST_SESSION = Session(None, GUEST, "Guest")
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _derive(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+
+
+def hash_password(password, iterations=None):
+    iterations = PASSWORD_ITERATIONS if iterations is None else iterations
+    salt = os.urandom(SALT_BYTES)
+    return f"{ALGORITHM}${iterations}${_b64(salt)}${_b64(_derive(password, salt, iterations))}"
+
+
+def _parse(encoded):
+    algorithm, iterations, salt, digest = encoded.split("$")
+    if algorithm != ALGORITHM:
+        raise ValueError(f"unsupported password hash {algorithm!r}")
+    return int(iterations), base64.b64decode(salt), base64.b64decode(digest)
+
+
+def verify_password(password, encoded):
+    global _dummy_hash
+    if encoded is None:
+        if _dummy_hash is None:
+            _dummy_hash = hash_password("")
+        _verify(password, _dummy_hash)
+        return False
+    return _verify(password, encoded)
+
+
+def _verify(password, encoded):
+    iterations, salt, digest = _parse(encoded)
+    return hmac.compare_digest(_derive(password, salt, iterations), digest)
+
+
+def needs_rehash(encoded):
+    return _parse(encoded)[0] != PASSWORD_ITERATIONS
+
+
+def create_credentials_schema(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS credentials (
+                    username TEXT PRIMARY KEY,
+                    account_id INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    password_hash TEXT NOT NULL) WITHOUT ROWID''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_credentials_account ON credentials (role, account_id)")
+    for table, role in (("users", USER), ("managers", MANAGER)):
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {table}_credentials_delete AFTER DELETE ON {table}
+                         BEGIN
+                             DELETE FROM credentials WHERE role = '{role}' AND account_id = OLD.id;
+                         END''')
+
+
+def _rename_conflicting_users(conn):
+    conflicts = conn.execute("SELECT users.id, users.username FROM users JOIN managers "
+                             "ON managers.username = users.username").fetchall()
+    taken = {row[0] for row in conn.execute("SELECT username FROM users UNION SELECT username FROM managers")}
+    for user_id, username in conflicts:
+        suffix = user_id
+        while f"{username}-{suffix}" in taken:
+            suffix += 1
+        renamed = f"{username}-{suffix}"
+        taken.add(renamed)
+        conn.execute("UPDATE users SET username=? WHERE id=?", (renamed, user_id))
+        logger.warning("user %d shares the username %r with a manager and was renamed to %r",
+                       user_id, username, renamed)
+
+
+def migrate_plaintext_passwords(conn):
+    _rename_conflicting_users(conn)
+    for table, role in (("managers", MANAGER), ("users", USER)):
+        accounts = conn.execute(f"SELECT id, username, password FROM {table} "
+                                "WHERE username IS NOT NULL AND password IS NOT NULL").fetchall()
+        conn.executemany("INSERT INTO credentials (username, account_id, role, password_hash) VALUES (?, ?, ?, ?)",
+                         [(username, account_id, role, hash_password(password, MIGRATION_ITERATIONS))
+                          for account_id, username, password in accounts])
+        conn.execute(f"ALTER TABLE {table} DROP COLUMN password")
+
+
+def find_credentials(conn, username):
+    return conn.execute("SELECT account_id, role, password_hash FROM credentials WHERE username=?",
+                        (username,)).fetchone()
+
+
+def add_credentials(conn, username, account_id, role, password_hash):
+    conn.execute("INSERT INTO credentials (username, account_id, role, password_hash) VALUES (?, ?, ?, ?)",
+                 (username, account_id, role, password_hash))
+
+
+def update_password_hash(conn, username, password_hash):
+    conn.execute("UPDATE credentials SET password_hash=? WHERE username=?", (password_hash, username))
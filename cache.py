@@ -0,0 +1,104 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from database import get_connection
+
+QUERY_CACHE_BYTES = 16 * 1024 * 1024
+
+
+def data_version(user_id):
+    row = get_connection().execute("SELECT data_version FROM user_stats WHERE user_id=?", (user_id,)).fetchone()
+    return row[0] if row else 0
+
+
+def catalog_version():
+    row = get_connection().execute("SELECT version FROM catalog_version").fetchone()
+    return row[0] if row else 0
+
+
+def _size_of(value):
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_size_of(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(_size_of(k) + _size_of(v) for k, v in value.items())
+    return size
+
+
+class QueryCache:
+    def __init__(self, max_bytes=QUERY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_load(self, user_id, key, load, max_age=None):
+        full_key = (user_id, key)
+        if max_age is not None:
+            with self._lock:
+                entry = self._entries.get(full_key)
+                if entry is not None and time.monotonic() - entry[3] < max_age:
+                    self._entries.move_to_end(full_key)
+                    self.hits += 1
+                    return entry[1]
+        version = data_version(user_id)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and entry[0] == version:
+                self._entries[full_key] = entry[:3] + (time.monotonic(),)
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = load()
+        size = _size_of(value)
+        with self._lock:
+            if data_version(user_id) != version or size > self.max_bytes:
+                return value
+            self._discard(full_key)
+            self._store(full_key, version, value, size)
+        return value
+
+    def update(self, user_id, key, version, new_version, change):
+        full_key = (user_id, key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is None or entry[0] != version:
+                return
+            value = change(entry[1])
+            self._discard(full_key)
+            size = _size_of(value)
+            if size <= self.max_bytes:
+                self._store(full_key, new_version, value, size)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            for full_key in [k for k in self._entries if k[0] == user_id]:
+                self._discard(full_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _store(self, full_key, version, value, size):
+        self._entries[full_key] = (version, value, size, time.monotonic())
+        self.size += size
+        while self.size > self.max_bytes:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, full_key):
+        entry = self._entries.pop(full_key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+
+query_cache = QueryCache()
+
+
+def cached(user_id, key, load, max_age=None):
+    return query_cache.get_or_load(user_id, key, load, max_age)
@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+from trends import RAW, DAILY, WEEKLY, MONTHLY
+
+TWIN_AXES = "twin_axes"
+SHARED_AXES = "shared_axes"
+
+MARKER_LIMIT = 60
+RESOLUTION_LABELS = {RAW: "", DAILY: " (daily avg)", WEEKLY: " (weekly avg)", MONTHLY: " (monthly avg)"}
+RENDER_CACHE_SIZE = 16
+
+
+class RenderCache:
+    def __init__(self, capacity=RENDER_CACHE_SIZE):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+
+render_cache = RenderCache()
+
+
+def _format_date_axis(axes):
+    from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+    locator = AutoDateLocator(maxticks=8)
+    axes.xaxis.set_major_locator(locator)
+    axes.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+
+
+def _plot_twin_axes(axes, trend, marker):
+    ax2 = axes.twinx()
+    axes.plot(*trend.stress_before, label="Before", marker=marker, color='blue')
+    axes.plot(*trend.stress_after, label="After", marker=marker, color='green')
+    axes.set_ylim(0, 10)
+    axes.set_ylabel("Stress Level (0-10)")
+    axes.tick_params(axis='y', labelcolor='black')
+    axes.legend(loc='upper left')
+    ax2.plot(*trend.completion, label="Completion %", marker=marker and 's', linestyle='--', color='orange')
+    ax2.set_ylim(0, 110)
+    ax2.set_ylabel("Completion % (0-100)")
+    ax2.tick_params(axis='y', labelcolor='black')
+    ax2.legend(loc='upper right')
+
+
+def _plot_shared_axes(axes, trend, marker):
+    axes.plot(*trend.stress_before, label="Before", marker=marker, color='blue')
+    axes.plot(*trend.stress_after, label="After", marker=marker, color='green')
+    axes.plot(*trend.completion, label="Completion %", marker=marker and 's', linestyle='--', color='orange')
+    axes.legend()
+    axes.set_ylabel("Value")
+
+
+LAYOUTS = {TWIN_AXES: _plot_twin_axes, SHARED_AXES: _plot_shared_axes}
+
+
+def render_chart(layout, title, trend=None, message="No data available", width=640, height=480, dpi=100):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    canvas = FigureCanvasAgg(figure)
+    axes = figure.add_subplot(111)
+    if trend:
+        marker = 'o' if len(trend.stress_before[0]) <= MARKER_LIMIT else None
+        LAYOUTS[layout](axes, trend, marker)
+        axes.set_title(title + RESOLUTION_LABELS[trend.resolution])
+        axes.set_xlabel("Date")
+        _format_date_axis(axes)
+    else:
+        axes.text(0.5, 0.5, message,
+                  horizontalalignment='center',
+                  verticalalignment='center',
+                  transform=axes.transAxes)
+        axes.set_title(title)
+    canvas.draw()
+    width, height = canvas.get_width_height()
+    return width, height, bytes(canvas.buffer_rgba())
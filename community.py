@@ -0,0 +1,118 @@
+import re
+
+POST_PAGE_SIZE = 20
+COMMENT_PAGE_SIZE = 5
+POST_COLUMNS = "id, content, date"
+
+_LEGACY_COMMENT = re.compile(r"^Anonymous \((\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\): (.*)$")
+
+
+def create_comments_schema(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS post_comments (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    post_id INTEGER NOT NULL,
+                    date TEXT,
+                    body TEXT,
+                    FOREIGN KEY (post_id) REFERENCES community_posts(id) ON DELETE CASCADE)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_post_comments_post_date ON post_comments (post_id, date)")
+
+
+def create_comment_counts(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(community_posts)")}
+    if 'comment_count' not in columns:
+        conn.execute("ALTER TABLE community_posts ADD COLUMN comment_count INTEGER NOT NULL DEFAULT 0")
+    conn.execute('''UPDATE community_posts SET comment_count = (
+                    SELECT COUNT(*) FROM post_comments WHERE post_comments.post_id = community_posts.id)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_community_posts_comment_count "
+                 "ON community_posts (comment_count DESC, id)")
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS post_comments_count_insert AFTER INSERT ON post_comments
+                    BEGIN
+                        UPDATE community_posts SET comment_count = comment_count + 1 WHERE id = NEW.post_id;
+                    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS post_comments_count_delete AFTER DELETE ON post_comments
+                    BEGIN
+                        UPDATE community_posts SET comment_count = comment_count - 1 WHERE id = OLD.post_id;
+                    END''')
+
+
+def split_legacy_comments(conn):
+    rows = []
+    for post_id, post_date, blob in conn.execute(
+            "SELECT id, date, comments FROM community_posts WHERE comments IS NOT NULL AND comments != ''").fetchall():
+        for line in blob.split("\n"):
+            if not line.strip():
+                continue
+            match = _LEGACY_COMMENT.match(line)
+            rows.append((post_id, match.group(1), match.group(2)) if match else (post_id, post_date, line))
+    conn.executemany("INSERT INTO post_comments (post_id, date, body) VALUES (?, ?, ?)", rows)
+    conn.execute("UPDATE community_posts SET comments='' WHERE comments != ''")
+    return len(rows)
+
+
+def fetch_post_page(conn, before=None, limit=POST_PAGE_SIZE):
+    if before is None:
+        return conn.execute(
+            f"SELECT {POST_COLUMNS} FROM community_posts ORDER BY date DESC, id DESC LIMIT ?",
+            (limit,)).fetchall()
+    return conn.execute(
+        f"SELECT {POST_COLUMNS} FROM community_posts WHERE (date, id) < (?, ?) "
+        f"ORDER BY date DESC, id DESC LIMIT ?", (*before, limit)).fetchall()
+
+
+def fetch_posts_after(conn, after):
+    return conn.execute(
+        f"SELECT {POST_COLUMNS} FROM community_posts WHERE (date, id) > (?, ?) ORDER BY date, id",
+        after).fetchall()
+
+
+def existing_post_ids(conn, post_ids):
+    post_ids = list(post_ids)
+    if not post_ids:
+        return set()
+    return {row[0] for row in conn.execute(
+        f"SELECT id FROM community_posts WHERE id IN ({', '.join('?' for _ in post_ids)})", post_ids)}
+
+
+def add_comment(conn, post_id, body, date):
+    cursor = conn.execute("INSERT INTO post_comments (post_id, date, body) VALUES (?, ?, ?)", (post_id, date, body))
+    return cursor.lastrowid, date, body
+
+
+def fetch_comment_page(conn, post_id, before=None, limit=COMMENT_PAGE_SIZE):
+    if before is None:
+        return conn.execute(
+            "SELECT id, date, body FROM post_comments WHERE post_id=? ORDER BY date DESC, id DESC LIMIT ?",
+            (post_id, limit)).fetchall()
+    return conn.execute(
+        "SELECT id, date, body FROM post_comments WHERE post_id=? AND (date, id) < (?, ?) "
+        "ORDER BY date DESC, id DESC LIMIT ?", (post_id, *before, limit)).fetchall()
+
+
+def fetch_latest_comments(conn, post_ids=None, limit=COMMENT_PAGE_SIZE):
+    if post_ids is None:
+        where, params = "", ()
+    else:
+        post_ids = list(post_ids)
+        if not post_ids:
+            return {}
+        where, params = f"WHERE post_id IN ({', '.join('?' for _ in post_ids)})", tuple(post_ids)
+    latest = {}
+    for post_id, comment_id, date, body in conn.execute(
+            f"""SELECT post_id, id, date, body FROM (
+                    SELECT post_id, id, date, body,
+                           ROW_NUMBER() OVER (PARTITION BY post_id ORDER BY date DESC, id DESC) AS rn
+                    FROM post_comments {where})
+                WHERE rn <= ? ORDER BY post_id, rn""", (*params, limit)):
+        latest.setdefault(post_id, []).append((comment_id, date, body))
+    return latest
+
+
+def format_comments(comments):
+    if not comments:
+        return "No comments yet"
+    return "\n".join(f"Anonymous ({date}): {body}" for _, date, body in comments)
+
+
+def most_discussed_post(conn):
+    return conn.execute(
+        f"SELECT {POST_COLUMNS} FROM community_posts ORDER BY comment_count DESC, id LIMIT 1").fetchone()
@@ -0,0 +1,19 @@
+import pytest
+
+import auth
+import core
+import database
+import migrations
+from cache import query_cache
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    database.close_connection()
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "test.db"))
+    monkeypatch.setattr(auth, "PASSWORD_ITERATIONS", 1000)
+    query_cache.clear()
+    core.exercise_index.invalidate()
+    migrations.init_db()
+    yield database.get_connection()
+    database.close_connection()
@@ -0,0 +1,235 @@
+import math
+import random
+import sqlite3
+from collections import namedtuple
+from datetime import datetime
+
+import auth
+from cache import cached, catalog_version, data_version, query_cache
+from community import add_comment
+from database import get_connection, transaction
+from recommender import ExerciseIndex, IndexCache
+from rewards import SESSION_SUBMITTED, POST_SHARED, LOGIN, record_event, seed_user_rewards
+from sessions import RECENT_SESSIONS, fetch_recent_exercises
+from stats import add_exercise_sample, exercise_stats
+
+STRESS_LEVELS = range(1, 11)
+FALLBACK_STRESS_LEVEL = 3
+DEFAULT_DURATION = 5 * 60
+RECOMMENDATION_REFRESH_SECONDS = 5
+
+EXERCISE_DURATIONS = {
+    "Mindful Breathing 1": 5 * 60,
+    "Mindful Breathing 2": 10 * 60,
+    "Body Scan": 15 * 60,
+    "Walking Meditation": 10 * 60,
+    "Loving-Kindness Meditation": 12 * 60,
+    "Gentle Stretching": 12 * 60,
+}
+
+Login = namedtuple("Login", ["session", "earned"])
+Exercise = namedtuple("Exercise", ["id", "name", "description", "stress_level_min", "stress_level_max"])
+
+_EXERCISE_COLUMNS = "id, name, description, stress_level_min, stress_level_max"
+
+
+def now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _check_stress_level(level):
+    if level not in STRESS_LEVELS:
+        raise ValueError(f"Stress level must be between {STRESS_LEVELS[0]} and {STRESS_LEVELS[-1]}")
+
+
+def check_credentials(username, password):
+    if not username or not password:
+        raise ValueError("Username and password cannot be empty")
+
+
+def register(username, password):
+    check_credentials(username, password)
+    password_hash = auth.hash_password(password)
+    try:
+        with transaction() as conn:
+            user_id = conn.execute("INSERT INTO users (username) VALUES (?)", (username,)).lastrowid
+            auth.add_credentials(conn, username, user_id, auth.USER, password_hash)
+            seed_user_rewards(conn, user_id)
+    except sqlite3.IntegrityError:
+        raise ValueError("Username already exists")
+    return user_id
+
+
+def add_manager(username, password):
+    check_credentials(username, password)
+    password_hash = auth.hash_password(password)
+    try:
+        with transaction() as conn:
+            manager_id = conn.execute("INSERT INTO managers (username) VALUES (?)", (username,)).lastrowid
+            auth.add_credentials(conn, username, manager_id, auth.MANAGER, password_hash)
+    except sqlite3.IntegrityError:
+        raise ValueError("Username already exists")
+    return manager_id
+
+
+def login(username, password):
+    check_credentials(username, password)
+    credentials = auth.find_credentials(get_connection(), username)
+    if not auth.verify_password(password, credentials[2] if credentials else None):
+        return None
+    account_id, role, password_hash = credentials
+    session = auth.Session(account_id, role, username)
+    rehashed = auth.hash_password(password) if auth.needs_rehash(password_hash) else None
+    earned = []
+    if rehashed is None and role == auth.MANAGER:
+        return Login(session, earned)
+    login_date = now()
+    with transaction() as conn:
+        if rehashed is not None:
+            auth.update_password_hash(conn, username, rehashed)
+        if role == auth.USER:
+            conn.execute("INSERT INTO login_history (user_id, login_date) VALUES (?, ?)", (account_id, login_date))
+            earned = record_event(conn, account_id, LOGIN, date=login_date)
+    return Login(session, earned)
+
+
+def delete_user(user_id):
+    with transaction() as conn:
+        deleted = conn.execute("DELETE FROM users WHERE id=?", (user_id,)).rowcount
+    query_cache.invalidate(user_id)
+    return deleted > 0
+
+
+def exercise_duration(exercise_name):
+    return EXERCISE_DURATIONS.get(exercise_name, DEFAULT_DURATION)
+
+
+def completion_percentage(exercise_name, remaining_seconds):
+    duration = exercise_duration(exercise_name)
+    if remaining_seconds <= 0:
+        return 0.0
+    return min((duration - remaining_seconds) / duration * 100, 100.0)
+
+
+def list_exercises(conn):
+    return [Exercise(*row) for row in conn.execute(f"SELECT {_EXERCISE_COLUMNS} FROM exercises")]
+
+
+def find_exercise(conn, name):
+    row = conn.execute(f"SELECT {_EXERCISE_COLUMNS} FROM exercises WHERE name=?", (name,)).fetchone()
+    return Exercise(*row) if row else None
+
+
+def _build_exercise_index():
+    return ExerciseIndex(list_exercises(get_connection()), STRESS_LEVELS, FALLBACK_STRESS_LEVEL)
+
+
+exercise_index = IndexCache(_build_exercise_index, catalog_version, RECOMMENDATION_REFRESH_SECONDS)
+
+
+def recent_exercises(user_id):
+    return cached(user_id, ("recent_exercises",), lambda: fetch_recent_exercises(get_connection(), user_id),
+                  RECOMMENDATION_REFRESH_SECONDS)
+
+
+def user_exercise_stats(user_id):
+    return cached(user_id, ("exercise_stats",), lambda: exercise_stats(get_connection(), user_id),
+                  RECOMMENDATION_REFRESH_SECONDS)
+
+
+def recommend_exercise(stress_level, recent=(), stats=None, rng=random):
+    _check_stress_level(stress_level)
+    return exercise_index.get().sample(stress_level, rng, recent, stats)
+
+
+def recommend_for_user(user_id, stress_level, rng=random):
+    return recommend_exercise(stress_level, recent_exercises(user_id), user_exercise_stats(user_id), rng)
+
+
+def _check_exercise(name, description, min_level, max_level):
+    if not name or not description:
+        raise ValueError("Name and description cannot be empty")
+    _check_stress_level(min_level)
+    _check_stress_level(max_level)
+    if min_level > max_level:
+        raise ValueError("Min stress level cannot be greater than max stress level")
+
+
+def add_exercise(name, description, min_level, max_level):
+    _check_exercise(name, description, min_level, max_level)
+    with transaction() as conn:
+        exercise_id = conn.execute(
+            "INSERT INTO exercises (name, description, stress_level_min, stress_level_max) VALUES (?, ?, ?, ?)",
+            (name, description, min_level, max_level)).lastrowid
+    exercise_index.invalidate()
+    return exercise_id
+
+
+def update_exercise(exercise_id, name, description, min_level, max_level):
+    _check_exercise(name, description, min_level, max_level)
+    with transaction() as conn:
+        updated = conn.execute(
+            "UPDATE exercises SET name=?, description=?, stress_level_min=?, stress_level_max=? WHERE id=?",
+            (name, description, min_level, max_level, exercise_id)).rowcount > 0
+    exercise_index.invalidate()
+    return updated
+
+
+def delete_exercise(exercise_id):
+    with transaction() as conn:
+        deleted = conn.execute("DELETE FROM exercises WHERE id=?", (exercise_id,)).rowcount > 0
+    exercise_index.invalidate()
+    return deleted
+
+
+def record_session(user_id, exercise, stress_before, stress_after, duration_percentage, notes=""):
+    _check_stress_level(stress_before)
+    _check_stress_level(stress_after)
+    if not exercise:
+        raise ValueError("No exercise selected")
+    duration_percentage = float(duration_percentage)
+    if not math.isfinite(duration_percentage):
+        raise ValueError("Completion must be a finite number")
+    duration_percentage = min(max(duration_percentage, 0.0), 100.0)
+    session_date = now()
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO stress_levels (user_id, date, stress_before, stress_after, exercise_type, notes, "
+            "duration_percentage) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (user_id, session_date, stress_before, stress_after, exercise, notes, duration_percentage))
+        earned = record_event(conn, user_id, SESSION_SUBMITTED, date=session_date, exercise_type=exercise,
+                              stress_before=stress_before, stress_after=stress_after)
+        version = data_version(user_id)
+    query_cache.update(user_id, ("recent_exercises",), version - 1, version,
+                       lambda recent: (exercise,) + recent[:RECENT_SESSIONS - 1])
+    query_cache.update(user_id, ("exercise_stats",), version - 1, version,
+                       lambda stats: add_exercise_sample(stats, exercise, stress_before - stress_after,
+                                                         duration_percentage))
+    return earned
+
+
+def share_post(user_id, content):
+    content = content.strip()
+    if not content:
+        raise ValueError("Post content cannot be empty")
+    post_date = now()
+    with transaction() as conn:
+        post_id = conn.execute("INSERT INTO community_posts (user_id, content, date) VALUES (?, ?, ?)",
+                               (user_id, content, post_date)).lastrowid
+        earned = record_event(conn, user_id, POST_SHARED, date=post_date)
+    return post_id, earned
+
+
+def comment_on_post(post_id, body):
+    body = body.strip()
+    if not body:
+        raise ValueError("Comment cannot be empty")
+    with transaction() as conn:
+        if conn.execute("SELECT 1 FROM community_posts WHERE id=?", (post_id,)).fetchone() is None:
+            return None
+        return add_comment(conn, post_id, body, now())
+
+
+def delete_post(post_id):
+    with transaction() as conn:
+        return conn.execute("DELETE FROM community_posts WHERE id=?", (post_id,)).rowcount > 0
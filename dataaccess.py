@@ -0,0 +1,95 @@
+import logging
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from database import get_connection
+
+logger = logging.getLogger(__name__)
+
+READ_THREADS = 2
+
+
+class _QuerySignals(QObject):
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+
+
+class _Query(QRunnable):
+    def __init__(self, fn, args, signals):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.signals = signals
+
+    def run(self):
+        try:
+            result = self.fn(get_connection(), *self.args)
+        except ValueError as e:
+            self.signals.failed.emit(e)
+        except Exception as e:
+            logger.exception("Background query %s failed", getattr(self.fn, "__name__", self.fn))
+            self.signals.failed.emit(e)
+        else:
+            self.signals.finished.emit(result)
+
+
+class DataAccess(QObject):
+    busy_changed = pyqtSignal(bool)
+    failed = pyqtSignal(object, object)
+
+    def __init__(self, threads=READ_THREADS, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(threads)
+        self.pool.setExpiryTimeout(-1)
+        self.generation = 0
+        self.pending = 0
+        self._tokens = {}
+        self._in_flight = set()
+
+    def submit(self, channel, fn, *args, on_done, on_error=None):
+        token = (self.generation, self._tokens.get(channel, (0, 0))[1] + 1)
+        self._tokens[channel] = token
+        signals = _QuerySignals()
+        signals.finished.connect(lambda result: self._finish(channel, token, signals, on_done, result))
+        signals.failed.connect(lambda error: self._finish(channel, token, signals, on_error, error, failed=True))
+        self._in_flight.add(signals)
+        self._set_pending(self.pending + 1)
+        self.pool.start(_Query(fn, args, signals))
+
+    def cancel(self, channel):
+        token = self._tokens.get(channel)
+        if token is not None:
+            self._tokens[channel] = (token[0], token[1] + 1)
+
+    def cancel_all(self):
+        self.generation += 1
+
+    def shutdown(self):
+        self.cancel_all()
+        self.pool.clear()
+        self.pool.waitForDone()
+
+    def _finish(self, channel, token, signals, callback, result, failed=False):
+        self._in_flight.discard(signals)
+        self._set_pending(self.pending - 1)
+        if self._tokens.get(channel) != token or token[0] != self.generation:
+            return
+        if callback is not None:
+            callback(result)
+        elif failed:
+            self.failed.emit(channel, result)
+
+    def _set_pending(self, pending):
+        was_busy = self.pending > 0
+        self.pending = pending
+        if was_busy != (pending > 0):
+            self.busy_changed.emit(pending > 0)
+
+
+_instance = None
+
+
+def data_access():
+    global _instance
+    if _instance is None:
+        _instance = DataAccess()
+    return _instance
@@ -0,0 +1,156 @@
+import logging
+import random
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'mbsr_data.db'
+BUSY_TIMEOUT_MS = 5000
+WRITE_RETRIES = 4
+RETRY_BASE_DELAY = 0.05
+RETRY_MAX_DELAY = 1.0
+SLOW_LOCK_WAIT = 0.5
+
+WriteStats = namedtuple("WriteStats", ["transactions", "retries", "failures", "queue_wait", "lock_wait",
+                                       "max_queue_wait", "max_lock_wait"])
+
+_local = threading.local()
+
+
+class _WriteMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.transactions = self.retries = self.failures = 0
+            self.queue_wait = self.lock_wait = self.max_queue_wait = self.max_lock_wait = 0.0
+
+    def record(self, queue_wait, lock_wait, retries):
+        with self._lock:
+            self.transactions += 1
+            self.retries += retries
+            self.queue_wait += queue_wait
+            self.lock_wait += lock_wait
+            self.max_queue_wait = max(self.max_queue_wait, queue_wait)
+            self.max_lock_wait = max(self.max_lock_wait, lock_wait)
+
+    def failed(self, retries):
+        with self._lock:
+            self.retries += retries
+            self.failures += 1
+
+    def snapshot(self):
+        with self._lock:
+            return WriteStats(self.transactions, self.retries, self.failures, self.queue_wait, self.lock_wait,
+                              self.max_queue_wait, self.max_lock_wait)
+
+
+_write_lock = threading.Lock()
+_write_metrics = _WriteMetrics()
+
+
+def write_stats():
+    return _write_metrics.snapshot()
+
+
+def reset_write_stats():
+    _write_metrics.reset()
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def get_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _connect(DB_PATH)
+        _local.conn = conn
+        _local.depth = 0
+    return conn
+
+
+def close_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.execute("PRAGMA optimize")
+        conn.close()
+        _local.conn = None
+        _local.depth = 0
+
+
+def _is_busy(error):
+    message = str(error)
+    return "locked" in message or "busy" in message
+
+
+def _begin_write(conn):
+    start = time.perf_counter()
+    _write_lock.acquire()
+    queued = time.perf_counter()
+    retries = 0
+    try:
+        while True:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                break
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e) or retries >= WRITE_RETRIES:
+                    _write_metrics.failed(retries)
+                    raise
+                time.sleep(min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** retries) * random.uniform(0.5, 1.5))
+                retries += 1
+    except BaseException:
+        _write_lock.release()
+        raise
+    acquired = time.perf_counter()
+    _write_metrics.record(queued - start, acquired - queued, retries)
+    if acquired - start > SLOW_LOCK_WAIT:
+        logger.warning("waited %.0f ms for the write lock (%.0f ms queued in process, %d retries)",
+                       (acquired - start) * 1000, (queued - start) * 1000, retries)
+
+
+@contextmanager
+def transaction():
+    conn = get_connection()
+    depth = _local.depth
+    savepoint = f"sp_{depth}"
+    if depth:
+        conn.execute(f"SAVEPOINT {savepoint}")
+    else:
+        _begin_write(conn)
+    _local.depth = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        if depth:
+            conn.execute(f"ROLLBACK TO {savepoint}")
+            conn.execute(f"RELEASE {savepoint}")
+        elif conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    else:
+        if depth:
+            conn.execute(f"RELEASE {savepoint}")
+        else:
+            try:
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+    finally:
+        _local.depth = depth
+        if not depth:
+            _write_lock.release()
@@ -0,0 +1,77 @@
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+SPANS = (DAY, WEEK, MONTH)
+
+EPOCH = date(1970, 1, 1)
+DAY_NUMBER_COLUMN = "day_number"
+
+DateRange = namedtuple("DateRange", ["first", "last"])
+
+
+def day_number_sql(column):
+    return f"CAST(julianday(substr({column}, 1, 10)) - 2440587.5 AS INTEGER)"
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value[:10])
+
+
+def day_number(value):
+    return (_as_date(value) - EPOCH).days
+
+
+def from_day_number(number):
+    return EPOCH + timedelta(days=number)
+
+
+def day_range(day):
+    day = _as_date(day)
+    return DateRange(day, day)
+
+
+def week_range(day):
+    day = _as_date(day)
+    first = day - timedelta(days=day.weekday())
+    return DateRange(first, first + timedelta(days=6))
+
+
+def month_range(day):
+    first = _as_date(day).replace(day=1)
+    following = (first + timedelta(days=31)).replace(day=1)
+    return DateRange(first, following - timedelta(days=1))
+
+
+def custom_range(first, last):
+    first, last = _as_date(first), _as_date(last)
+    if last < first:
+        first, last = last, first
+    return DateRange(first, last)
+
+
+SPAN_RANGES = {DAY: day_range, WEEK: week_range, MONTH: month_range}
+
+
+def span_range(span, day):
+    return SPAN_RANGES[span](day)
+
+
+def range_bounds(period):
+    return day_number(period.first), day_number(period.last) + 1
+
+
+def range_clause(period, column=DAY_NUMBER_COLUMN):
+    return f"{column} >= ? AND {column} < ?", list(range_bounds(period))
+
+
+def describe_range(period):
+    if period.first == period.last:
+        return period.first.isoformat()
+    return f"{period.first.isoformat()} to {period.last.isoformat()}"
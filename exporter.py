@@ -0,0 +1,234 @@
+import csv
+import gzip
+import multiprocessing
+import os
+import queue
+import re
+import sqlite3
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from dateranges import month_range, range_clause
+
+SESSION_CSV_HEADER = ["Date", "Exercise", "Stress Before", "Stress After", "Completion %", "Notes"]
+MULTI_USER_CSV_HEADER = ["Username"] + SESSION_CSV_HEADER
+
+BY_USER = "user"
+BY_MONTH = "month"
+PARTITIONS = (BY_USER, BY_MONTH)
+
+CHUNK_SIZE = 5000
+UNDATED = "undated"
+
+Partition = namedtuple("Partition", ["name", "key", "rows"])
+ExportResult = namedtuple("ExportResult", ["files", "rows", "elapsed", "cancelled"])
+
+_USER_QUERY = ("SELECT date, exercise_type, stress_before, stress_after, duration_percentage, notes "
+               "FROM stress_levels WHERE user_id=? ORDER BY date, id")
+_MONTH_QUERY = ("SELECT COALESCE(users.username, ''), stress_levels.date, exercise_type, stress_before, stress_after, "
+                "duration_percentage, notes FROM stress_levels LEFT JOIN users ON users.id = stress_levels.user_id "
+                "WHERE {} ORDER BY stress_levels.day_number, stress_levels.date, stress_levels.id")
+_UNDATED_QUERY = ("SELECT COALESCE(users.username, ''), stress_levels.date, exercise_type, stress_before, "
+                  "stress_after, duration_percentage, notes FROM stress_levels "
+                  "LEFT JOIN users ON users.id = stress_levels.user_id "
+                  "WHERE stress_levels.day_number IS NULL ORDER BY stress_levels.id")
+
+
+def format_session_row(row):
+    return [row[0], row[1], row[2], row[3], round(float(row[4]), 1) if row[4] is not None else 0.0, row[5] or ""]
+
+
+def _open_output(path, compress):
+    if compress:
+        return gzip.open(path, "wt", newline="", encoding="utf-8", compresslevel=6)
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+def write_sessions(cursor, path, header, format_row, compress=False, chunk_size=CHUNK_SIZE,
+                   on_chunk=None, cancelled=None):
+    written = 0
+    tmp_path = path + ".part"
+    try:
+        with _open_output(tmp_path, compress) as out:
+            writer = csv.writer(out)
+            writer.writerow(header)
+            while True:
+                if cancelled is not None and cancelled():
+                    raise InterruptedError(path)
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                writer.writerows(format_row(row) for row in rows)
+                written += len(rows)
+                if on_chunk is not None:
+                    on_chunk(len(rows))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return written
+
+
+def write_user_sessions(conn, user_id, path, compress=False):
+    return write_sessions(conn.execute(_USER_QUERY, (user_id,)), path, SESSION_CSV_HEADER, format_session_row,
+                          compress)
+
+
+def _format_multi_user_row(row):
+    return [row[0]] + format_session_row(row[1:])
+
+
+def _safe_name(name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("._") or "user"
+
+
+def list_partitions(conn, partition):
+    if partition == BY_USER:
+        return [Partition(f"{user_id}_{_safe_name(username)}", user_id, rows) for user_id, username, rows in conn.execute(
+            "SELECT users.id, users.username, user_stats.session_count FROM users "
+            "JOIN user_stats ON user_stats.user_id = users.id WHERE user_stats.session_count > 0 ORDER BY users.id")]
+    if partition == BY_MONTH:
+        return [Partition(month or UNDATED, month, rows) for month, rows in conn.execute(
+            "SELECT CASE WHEN day_number IS NOT NULL THEN substr(date, 1, 7) END AS month, COUNT(*) "
+            "FROM stress_levels GROUP BY month ORDER BY month")]
+    raise ValueError(f"unknown partition {partition!r}")
+
+
+_worker_connections = {}
+_worker_progress = None
+_worker_cancel = None
+
+
+def _init_worker(progress, cancel):
+    global _worker_progress, _worker_cancel
+    _worker_progress, _worker_cancel = progress, cancel
+
+
+def _worker_connection(db_path):
+    conn = _worker_connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        conn.execute("PRAGMA busy_timeout = 5000")
+        _worker_connections[db_path] = conn
+    return conn
+
+
+class _BatchProgress:
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+        self.rows = 0
+        self.checked = 0.0
+        self.stopped = False
+
+    def add(self, rows):
+        self.rows += rows
+        if self.rows >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            _worker_progress.put(self.rows)
+            self.rows = 0
+
+    def cancelled(self):
+        now = time.monotonic()
+        if now - self.checked > 0.1:
+            self.checked = now
+            self.stopped = _worker_cancel.is_set()
+        return self.stopped
+
+
+def _export_partition(conn, partition, part, path, compress, chunk_size, batch_progress):
+    if partition == BY_USER:
+        cursor = conn.execute(_USER_QUERY, (part.key,))
+        header, format_row = SESSION_CSV_HEADER, format_session_row
+    elif part.key is None:
+        cursor = conn.execute(_UNDATED_QUERY)
+        header, format_row = MULTI_USER_CSV_HEADER, _format_multi_user_row
+    else:
+        clause, bounds = range_clause(month_range(part.key + "-01"), "stress_levels.day_number")
+        cursor = conn.execute(_MONTH_QUERY.format(clause), bounds)
+        header, format_row = MULTI_USER_CSV_HEADER, _format_multi_user_row
+    try:
+        write_sessions(cursor, path, header, format_row, compress, chunk_size,
+                       on_chunk=batch_progress.add, cancelled=batch_progress.cancelled)
+    finally:
+        cursor.close()
+
+
+def _export_batch(db_path, partition, batch, compress, chunk_size):
+    conn = _worker_connection(db_path)
+    batch_progress = _BatchProgress(chunk_size)
+    written = []
+    try:
+        for part, path in batch:
+            _export_partition(conn, partition, part, path, compress, chunk_size, batch_progress)
+            written.append(path)
+    except InterruptedError:
+        pass
+    finally:
+        batch_progress.flush()
+    return written
+
+
+def _batches(parts, out_dir, suffix, chunk_size):
+    batch, rows = [], 0
+    for part in parts:
+        batch.append((part, os.path.join(out_dir, part.name + suffix)))
+        rows += part.rows
+        if rows >= chunk_size:
+            yield batch
+            batch, rows = [], 0
+    if batch:
+        yield batch
+
+
+def export_sessions(db_path, out_dir, partition=BY_USER, compress=False, workers=None, chunk_size=CHUNK_SIZE,
+                    progress=None, cancel=None):
+    start = time.perf_counter()
+    db_path = os.path.abspath(db_path)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        parts = list_partitions(conn, partition)
+    finally:
+        conn.close()
+    os.makedirs(out_dir, exist_ok=True)
+    total = sum(part.rows for part in parts)
+    suffix = ".csv.gz" if compress else ".csv"
+    files, done = [], 0
+    if progress is not None:
+        progress(0, total)
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        progress_queue, cancel_event = manager.Queue(), manager.Event()
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context,
+                                 initializer=_init_worker, initargs=(progress_queue, cancel_event)) as pool:
+            pending = {pool.submit(_export_batch, db_path, partition, batch, compress, chunk_size)
+                       for batch in _batches(parts, out_dir, suffix, chunk_size)}
+            try:
+                while pending:
+                    finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                    while True:
+                        try:
+                            done += progress_queue.get_nowait()
+                        except queue.Empty:
+                            break
+                    if progress is not None:
+                        progress(done, total)
+                    for future in finished:
+                        if not future.cancelled():
+                            files.extend(future.result())
+                    if cancel is not None and cancel.is_set() and not cancel_event.is_set():
+                        cancel_event.set()
+                        for future in pending:
+                            future.cancel()
+                        pending = {future for future in pending if not future.cancelled()}
+            except BaseException:
+                cancel_event.set()
+                for future in pending:
+                    future.cancel()
+                raise
+            cancelled = cancel_event.is_set()
+    return ExportResult(sorted(files), done, time.perf_counter() - start, cancelled)
@@ -0,0 +1,135 @@
+import csv
+import gzip
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from database import transaction
+from exporter import SESSION_CSV_HEADER, MULTI_USER_CSV_HEADER
+from rewards import backfill_rewards
+from stats import (create_stats_triggers, create_exercise_stats_triggers, drop_stats_triggers, rebuild_user_stats,
+                   rebuild_exercise_stats)
+
+BATCH_SIZE = 50000
+MAX_ERRORS = 100
+STRESS_RANGE = range(1, 11)
+
+ImportResult = namedtuple("ImportResult", ["rows", "skipped", "errors", "users", "elapsed"])
+
+_INSERT = ("INSERT INTO stress_levels (user_id, date, exercise_type, stress_before, stress_after, "
+           "duration_percentage, notes) VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+
+def _open_input(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", newline="", encoding="utf-8")
+    return open(path, newline="", encoding="utf-8")
+
+
+def _stress(value):
+    level = int(value)
+    if level not in STRESS_RANGE:
+        raise ValueError(f"stress level {level} out of range")
+    return level
+
+
+def parse_session_row(row):
+    if len(row) != len(SESSION_CSV_HEADER):
+        raise ValueError(f"expected {len(SESSION_CSV_HEADER)} columns, got {len(row)}")
+    date, exercise, stress_before, stress_after, completion, notes = row
+    parsed = datetime.fromisoformat(date)
+    if parsed.tzinfo is not None:
+        raise ValueError("dates with a time zone are not supported")
+    if not exercise:
+        raise ValueError("missing exercise")
+    completion = float(completion) if completion else 0.0
+    if not 0.0 <= completion <= 100.0:
+        raise ValueError(f"completion {completion} out of range")
+    return (parsed.isoformat(" ", "seconds"), exercise, _stress(stress_before), _stress(stress_after),
+            completion, notes)
+
+
+def _validate(path, batch, user_ids, default_user_id, errors):
+    valid = []
+    for line, row in batch:
+        try:
+            if default_user_id is None:
+                username, row = row[0], row[1:]
+                user_id = user_ids.get(username)
+                if user_id is None:
+                    raise ValueError(f"unknown user {username!r}")
+            else:
+                user_id = default_user_id
+            valid.append((user_id, *parse_session_row(row)))
+        except ValueError as e:
+            if len(errors) < MAX_ERRORS:
+                errors.append((path, line, str(e)))
+    return valid
+
+
+def _read_batches(reader, batch_size):
+    batch = []
+    for row in reader:
+        if not row:
+            continue
+        batch.append((reader.line_num, row))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _defer_indexes(conn):
+    indexes = conn.execute("SELECT name, sql FROM sqlite_master WHERE type='index' AND tbl_name='stress_levels' "
+                           "AND sql IS NOT NULL").fetchall()
+    for name, _ in indexes:
+        conn.execute(f"DROP INDEX {name}")
+    return [sql for _, sql in indexes]
+
+
+def import_sessions(paths, username=None, batch_size=BATCH_SIZE, progress=None):
+    start = time.perf_counter()
+    imported = skipped = 0
+    errors = []
+    users = set()
+    with transaction() as conn:
+        user_ids = dict(conn.execute("SELECT username, id FROM users"))
+        default_user_id = None
+        if username is not None:
+            default_user_id = user_ids.get(username)
+            if default_user_id is None:
+                raise ValueError(f"unknown user {username!r}")
+        drop_stats_triggers(conn)
+        index_sql = _defer_indexes(conn)
+        for path in paths:
+            with _open_input(path) as source:
+                reader = csv.reader(source)
+                header = next(reader, None)
+                if header == MULTI_USER_CSV_HEADER:
+                    file_user_id = None
+                elif header == SESSION_CSV_HEADER:
+                    if default_user_id is None:
+                        raise ValueError(f"{path}: single-user file needs a target user")
+                    file_user_id = default_user_id
+                else:
+                    raise ValueError(f"{path}: unrecognised header {header!r}")
+                for batch in _read_batches(reader, batch_size):
+                    rows = _validate(path, batch, user_ids, file_user_id, errors)
+                    conn.executemany(_INSERT, rows)
+                    users.update(row[0] for row in rows)
+                    imported += len(rows)
+                    skipped += len(batch) - len(rows)
+                    if progress is not None:
+                        progress(imported, skipped)
+        for sql in index_sql:
+            conn.execute(sql)
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS imported_users (id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM temp.imported_users")
+        conn.executemany("INSERT INTO temp.imported_users (id) VALUES (?)", [(user_id,) for user_id in users])
+        rebuild_user_stats(conn, "temp.imported_users")
+        rebuild_exercise_stats(conn, "temp.imported_users")
+        create_stats_triggers(conn)
+        create_exercise_stats_triggers(conn)
+        backfill_rewards(conn, "temp.imported_users")
+    return ImportResult(imported, skipped, errors, len(users), time.perf_counter() - start)
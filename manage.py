@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import getpass
+import logging
+import sys
+import threading
+
+import core
+import database
+from database import transaction
+from migrations import init_db
+from rewards import backfill_rewards
+from exporter import PARTITIONS, BY_USER, export_sessions
+from importer import import_sessions
+from service import DEFAULT_HOST, DEFAULT_PORT, DB_WORKERS, serve
+
+
+def backfill_rewards_command(args):
+    with transaction() as conn:
+        result = backfill_rewards(conn)
+    rate = result.events / result.elapsed if result.elapsed else float(result.events)
+    print(f"Backfilled rewards for {result.users} users from {result.events} events in {result.elapsed:.2f}s "
+          f"({rate:,.0f} events/s)")
+
+
+def export_command(args):
+    def report(done, total):
+        if args.verbose:
+            print(f"\rExported {done:,}/{total:,} rows", end="", file=sys.stderr, flush=True)
+
+    cancel = threading.Event()
+    try:
+        result = export_sessions(database.DB_PATH, args.out, args.partition, args.gzip, args.workers,
+                                 progress=report, cancel=cancel)
+    except KeyboardInterrupt:
+        cancel.set()
+        raise
+    if args.verbose:
+        print(file=sys.stderr)
+    rate = result.rows / result.elapsed if result.elapsed else float(result.rows)
+    print(f"Exported {result.rows} rows into {len(result.files)} files in {result.elapsed:.2f}s ({rate:,.0f} rows/s)")
+
+
+def import_command(args):
+    def report(rows, skipped):
+        if args.verbose:
+            print(f"\rImported {rows:,} rows, skipped {skipped:,}", end="", file=sys.stderr, flush=True)
+
+    try:
+        result = import_sessions(args.files, args.user, progress=report)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Import failed: {e}")
+    if args.verbose:
+        print(file=sys.stderr)
+    for path, line, message in result.errors:
+        print(f"{path}:{line}: {message}", file=sys.stderr)
+    rate = result.rows / result.elapsed if result.elapsed else float(result.rows)
+    print(f"Imported {result.rows} rows for {result.users} users in {result.elapsed:.2f}s ({rate:,.0f} rows/s), "
+          f"skipped {result.skipped} invalid rows")
+
+
+def add_manager_command(args):
+    password = getpass.getpass("Password: ")
+    if password != getpass.getpass("Repeat password: "):
+        sys.exit("Passwords do not match")
+    try:
+        manager_id = core.add_manager(args.username, password)
+    except ValueError as e:
+        sys.exit(f"Could not add manager: {e}")
+    print(f"Added manager {args.username} with id {manager_id}")
+
+
+def serve_command(args):
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} database workers", file=sys.stderr)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="StressRelief maintenance commands")
+    parser.add_argument("--db", default=database.DB_PATH, help="path to the SQLite database")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log migration timings")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill = commands.add_parser("backfill-rewards", help="re-evaluate every reward rule for every user")
+    backfill.set_defaults(handler=backfill_rewards_command)
+    export = commands.add_parser("export", help="export all exercise sessions as CSV files")
+    export.add_argument("out", help="output directory")
+    export.add_argument("--partition", choices=PARTITIONS, default=BY_USER, help="one file per user or per month")
+    export.add_argument("--gzip", action="store_true", help="compress the output files")
+    export.add_argument("--workers", type=int, help="number of worker processes (default: CPU count)")
+    export.set_defaults(handler=export_command)
+    load = commands.add_parser("import", help="import exercise sessions from exported CSV files")
+    load.add_argument("files", nargs="+", help="CSV files, optionally gzip compressed")
+    load.add_argument("--user", help="username that owns the sessions in single-user files")
+    load.set_defaults(handler=import_command)
+    manager = commands.add_parser("add-manager", help="create a manager account")
+    manager.add_argument("username", help="login name of the new manager")
+    manager.set_defaults(handler=add_manager_command)
+    service = commands.add_parser("serve", help="run the headless HTTP/JSON service")
+    service.add_argument("--host", default=DEFAULT_HOST, help="address to listen on")
+    service.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on")
+    service.add_argument("--workers", type=int, default=DB_WORKERS, help="number of database worker threads")
+    service.set_defaults(handler=serve_command)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    database.DB_PATH = args.db
+    init_db()
+    try:
+        args.handler(args)
+    finally:
+        database.close_connection()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+import logging
+import time
+
+from auth import create_credentials_schema, migrate_plaintext_passwords
+from database import get_connection, transaction
+from rewards import backfill_rewards
+from stats import (STATS_TRIGGERS, create_stats_schema, create_stats_triggers, rebuild_user_stats,
+                   create_exercise_stats_schema, rebuild_exercise_stats)
+from community import create_comments_schema, create_comment_counts, split_legacy_comments
+from dateranges import DAY_NUMBER_COLUMN, day_number_sql
+
+logger = logging.getLogger(__name__)
+
+SEED_EXERCISES = [
+    ("Mindful Breathing 1",
+     "This is a foundational mindfulness exercise focusing on slow, deep breathing to promote relaxation. Sit comfortably, close your eyes if comfortable, and inhale deeply through your nose for a count of 4, hold for 4, then exhale slowly for 6. Repeat this cycle for 5 minutes, allowing your mind to settle and your body to release tension. Ideal for beginners or moments of mild stress.",
+     1, 3),
+    ("Mindful Breathing 2",
+     "An advanced breathing exercise to enhance focus and calm. Begin by sitting quietly, then count each breath from 1 to 10 as you inhale and exhale, restarting at 1 once you reach 10. If your mind wanders, gently return to 1. Practice for 10 minutes, noticing the rhythm of your breath. Suitable for moderate stress levels or to deepen concentration.",
+     4, 6),
+    ("Body Scan",
+     "A guided meditation to release physical and mental tension. Lie down or sit comfortably, and slowly bring your attention to each part of your body, starting from your toes and moving up to your head. Notice any sensations without judgment, spending about 1-2 minutes per area. This 15-20 minute practice is perfect for high stress or chronic tension relief.",
+     7, 10),
+    ("Walking Meditation",
+     "A moving mindfulness practice to connect with your body and surroundings. Walk slowly for 10 minutes in a quiet space, focusing on the sensation of each step—lifting, moving, and placing your foot. Coordinate your breath with your steps (e.g., inhale for 3 steps, exhale for 3). Great for moderate stress or when you need a break from sitting.",
+     3, 5),
+    ("Loving-Kindness Meditation",
+     "A heart-centered practice to cultivate compassion. Sit comfortably and silently repeat phrases like 'May I be happy, may I be healthy' for yourself, then extend them to others. Spend 10-15 minutes, starting with loved ones and gradually including neutral or difficult people. Ideal for emotional stress or fostering positivity.",
+     2, 4),
+    ("Gentle Stretching",
+     "A physical exercise to release tension and improve flexibility. Perform a series of gentle stretches—neck rolls, shoulder shrugs, side bends, and leg stretches—for 10-15 minutes. Move slowly, breathing deeply into each stretch. This is excellent for all stress levels, especially when combined with mindful breathing.",
+     1, 10)
+]
+
+def _table_columns(c, table):
+    c.execute(f"PRAGMA table_xinfo({table})")
+    return {row[1] for row in c.fetchall()}
+
+
+def _create_base_schema(c):
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='exercises'")
+    seed = c.fetchone() is None
+    c.execute('''CREATE TABLE IF NOT EXISTS exercises (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 name TEXT,
+                 description TEXT,
+                 stress_level_min INTEGER,
+                 stress_level_max INTEGER)''')
+    if seed:
+        c.executemany(
+            "INSERT INTO exercises (name, description, stress_level_min, stress_level_max) VALUES (?, ?, ?, ?)",
+            SEED_EXERCISES)
+    c.execute('''CREATE TABLE IF NOT EXISTS users (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 username TEXT UNIQUE,
+                 password TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS managers (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 username TEXT UNIQUE,
+                 password TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS stress_levels (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 user_id INTEGER,
+                 date TEXT,
+                 stress_before INTEGER,
+                 stress_after INTEGER,
+                 exercise_type TEXT,
+                 notes TEXT,
+                 duration_percentage REAL DEFAULT 0.0,
+                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS community_posts (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 user_id INTEGER,
+                 content TEXT,
+                 date TEXT,
+                 comments TEXT DEFAULT '',
+                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS login_history (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 user_id INTEGER,
+                 login_date TEXT,
+                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS rewards (
+                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 user_id INTEGER,
+                 reward_name TEXT,
+                 reward_description TEXT,
+                 earned INTEGER DEFAULT 0,
+                 earn_date TEXT,
+                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE)''')
+
+
+def _migrate_legacy_columns(c):
+    if 'video_url' in _table_columns(c, "exercises"):
+        c.execute("CREATE TABLE exercises_temp AS SELECT id, name, description, stress_level_min, stress_level_max FROM exercises")
+        c.execute("DROP TABLE exercises")
+        c.execute('''CREATE TABLE exercises (
+                     id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     name TEXT,
+                     description TEXT,
+                     stress_level_min INTEGER,
+                     stress_level_max INTEGER)''')
+        c.execute("INSERT INTO exercises (id, name, description, stress_level_min, stress_level_max) SELECT id, name, description, stress_level_min, stress_level_max FROM exercises_temp")
+        c.execute("DROP TABLE exercises_temp")
+    if 'duration_percentage' not in _table_columns(c, "stress_levels"):
+        c.execute("ALTER TABLE stress_levels ADD COLUMN duration_percentage REAL DEFAULT 0.0")
+    if 'is_admin' in _table_columns(c, "users"):
+        c.execute("SELECT id, username, password FROM users WHERE is_admin=1")
+        for admin in c.fetchall():
+            c.execute("INSERT OR IGNORE INTO managers (id, username, password) VALUES (?, ?, ?)", admin)
+            c.execute("DELETE FROM users WHERE id=?", (admin[0],))
+
+
+def _create_indexes(c):
+    c.execute("""DELETE FROM rewards WHERE id NOT IN (
+                 SELECT id FROM (SELECT id, ROW_NUMBER() OVER (
+                     PARTITION BY user_id, reward_name ORDER BY earned DESC, id) AS rn FROM rewards)
+                 WHERE rn = 1)""")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stress_levels_user_date ON stress_levels (user_id, date)")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_rewards_user_reward ON rewards (user_id, reward_name)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_login_history_user_date ON login_history (user_id, login_date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_community_posts_date ON community_posts (date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_community_posts_user ON community_posts (user_id)")
+
+
+def _add_reward_progress(c):
+    columns = _table_columns(c, "rewards")
+    if 'progress' not in columns:
+        c.execute("ALTER TABLE rewards ADD COLUMN progress INTEGER DEFAULT 0")
+    if 'last_day' not in columns:
+        c.execute("ALTER TABLE rewards ADD COLUMN last_day TEXT")
+
+
+def _create_user_stats(c):
+    create_stats_schema(c.connection)
+    rebuild_user_stats(c.connection)
+
+
+def _create_post_comments(c):
+    create_comments_schema(c.connection)
+    split_legacy_comments(c.connection)
+
+
+def _add_comment_counts(c):
+    create_comment_counts(c.connection)
+
+
+def _superseded(c):
+    pass
+
+
+def _add_day_numbers(c):
+    for table, column in (("stress_levels", "date"), ("login_history", "login_date")):
+        if DAY_NUMBER_COLUMN not in _table_columns(c, table):
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {DAY_NUMBER_COLUMN} INTEGER "
+                      f"GENERATED ALWAYS AS ({day_number_sql(column)}) VIRTUAL")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stress_levels_user_day ON stress_levels (user_id, day_number)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stress_levels_day ON stress_levels (day_number)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_login_history_user_day ON login_history (user_id, day_number)")
+    c.execute("DROP INDEX IF EXISTS idx_stress_levels_date")
+
+
+def _backfill_rewards(c):
+    backfill_rewards(c.connection)
+
+
+def _create_credentials(c):
+    create_credentials_schema(c.connection)
+    migrate_plaintext_passwords(c.connection)
+
+
+def _create_exercise_stats(c):
+    create_exercise_stats_schema(c.connection)
+    rebuild_exercise_stats(c.connection)
+
+
+def _add_data_versions(c):
+    if 'data_version' not in _table_columns(c, "user_stats"):
+        c.execute("ALTER TABLE user_stats ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0")
+    for name in STATS_TRIGGERS:
+        c.execute(f"DROP TRIGGER IF EXISTS {name}")
+    create_stats_triggers(c.connection)
+
+
+def _add_catalog_version(c):
+    c.execute("CREATE TABLE IF NOT EXISTS catalog_version (id INTEGER PRIMARY KEY CHECK (id = 1), "
+              "version INTEGER NOT NULL)")
+    c.execute("INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)")
+    for operation in ("INSERT", "UPDATE", "DELETE"):
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS exercises_catalog_{operation.lower()} AFTER {operation} ON exercises
+                     BEGIN
+                         UPDATE catalog_version SET version = version + 1;
+                     END''')
+
+
+def _add_session_day_order(c):
+    c.execute("CREATE INDEX IF NOT EXISTS idx_stress_levels_day_date ON stress_levels (day_number, date)")
+    c.execute("DROP INDEX IF EXISTS idx_stress_levels_day")
+
+
+def _add_post_day_numbers(c):
+    if DAY_NUMBER_COLUMN not in _table_columns(c, "community_posts"):
+        c.execute(f"ALTER TABLE community_posts ADD COLUMN {DAY_NUMBER_COLUMN} INTEGER "
+                  f"GENERATED ALWAYS AS ({day_number_sql('date')}) VIRTUAL")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_community_posts_user_day ON community_posts (user_id, day_number)")
+
+
+MIGRATIONS = [
+    (1, "base schema", _create_base_schema),
+    (2, "legacy columns", _migrate_legacy_columns),
+    (3, "lookup indexes", _create_indexes),
+    (4, "reward progress", _add_reward_progress),
+    (5, "user statistics", _create_user_stats),
+    (6, "post comments", _create_post_comments),
+    (7, "comment counts", _add_comment_counts),
+    (8, "session date index", _superseded),
+    (9, "day numbers", _add_day_numbers),
+    (10, "credentials", _create_credentials),
+    (11, "exercise statistics", _create_exercise_stats),
+    (12, "data versions", _add_data_versions),
+    (13, "reward backfill", _superseded),
+    (14, "catalog version", _add_catalog_version),
+    (15, "session day order", _add_session_day_order),
+    (16, "post day numbers", _add_post_day_numbers),
+    (17, "reward backfill", _backfill_rewards),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def init_db():
+    timings = []
+    if schema_version(get_connection()) >= SCHEMA_VERSION:
+        return timings
+    for version, name, step in MIGRATIONS:
+        with transaction() as conn:
+            if schema_version(conn) >= version:
+                continue
+            start = time.perf_counter()
+            step(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version}")
+            elapsed = time.perf_counter() - start
+        logger.info("migration %d (%s) applied in %.1f ms", version, name, elapsed * 1000)
+        timings.append((version, name, elapsed))
+    return timings
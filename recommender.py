@@ -0,0 +1,86 @@
+import math
+import random
+import threading
+import time
+
+EXPLORATION = 1.0
+TEMPERATURE = 1.0
+PRIOR_SESSIONS = 1
+PRIOR_VARIANCE = 1.0
+
+
+def _score(stats, total):
+    if stats is None:
+        count, benefit, variance = 0, 0.0, 0.0
+    else:
+        count, benefit, variance = (stats.session_count, stats.mean_reduction * stats.completion_rate,
+                                    stats.reduction_variance)
+    weight = count + PRIOR_SESSIONS
+    return (count * benefit / weight
+            + EXPLORATION * math.sqrt((variance + PRIOR_VARIANCE) * math.log(total + 1) / weight))
+
+
+def bandit_weights(candidates, stats):
+    total = sum(stats[exercise.name].session_count for exercise in candidates if exercise.name in stats)
+    scores = [_score(stats.get(exercise.name), total) for exercise in candidates]
+    best = max(scores)
+    return [math.exp((score - best) / TEMPERATURE) for score in scores]
+
+
+class ExerciseIndex:
+    def __init__(self, exercises, levels, fallback_level):
+        self.exercises = tuple(exercises)
+        fallback = self._covering(fallback_level)
+        self.buckets = {level: self._covering(level) or fallback for level in levels}
+
+    def _covering(self, level):
+        return tuple(exercise for exercise in self.exercises
+                     if exercise.stress_level_min <= level <= exercise.stress_level_max)
+
+    def candidates(self, level, exclude=()):
+        bucket = self.buckets[level]
+        fresh = tuple(exercise for exercise in bucket if exercise.name not in exclude)
+        return fresh or bucket
+
+    def sample(self, level, rng=random, exclude=(), stats=None):
+        candidates = self.candidates(level, exclude)
+        if not candidates:
+            return None
+        if stats:
+            return rng.choices(candidates, bandit_weights(candidates, stats))[0]
+        return rng.choice(candidates)
+
+
+class IndexCache:
+    def __init__(self, build, version, max_age):
+        self.build = build
+        self.version = version
+        self.max_age = max_age
+        self.generation = 0
+        self.builds = 0
+        self._index = None
+        self._index_version = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        index = self._index
+        if index is not None and time.monotonic() - self._checked < self.max_age:
+            return index
+        version = self.version()
+        with self._lock:
+            if self._index is not None and self._index_version == version:
+                self._checked = time.monotonic()
+                return self._index
+            generation = self.generation
+        index = self.build()
+        with self._lock:
+            if self.generation == generation:
+                self._index, self._index_version, self._checked = index, version, time.monotonic()
+                self.builds += 1
+        return index
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._index = None
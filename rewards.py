@@ -0,0 +1,286 @@
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+
+SESSION_SUBMITTED = "session_submitted"
+POST_SHARED = "post_shared"
+LOGIN = "login"
+
+EVENT_SOURCES = {
+    SESSION_SUBMITTED: ("SELECT id, user_id, date, day_number, exercise_type, stress_before, stress_after "
+                        "FROM stress_levels"),
+    POST_SHARED: "SELECT id, user_id, date, day_number FROM community_posts",
+    LOGIN: "SELECT id, user_id, login_date AS date, day_number FROM login_history",
+}
+
+BackfillResult = namedtuple("BackfillResult", ["users", "events", "elapsed"])
+
+
+def _sql_literal(value):
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+
+class FieldIn:
+    def __init__(self, field, values):
+        self.field = field
+        self.values = tuple(values)
+        self.sql = f"{field} IN ({', '.join(_sql_literal(v) for v in self.values)})"
+
+    def __call__(self, payload):
+        return payload[self.field] in self.values
+
+
+class FieldLess:
+    def __init__(self, field, other):
+        self.field = field
+        self.other = other
+        self.sql = f"{field} < {other}"
+
+    def __call__(self, payload):
+        return payload[self.field] < payload[self.other]
+
+
+class RewardRule:
+    def __init__(self, name, description, message, event, target):
+        self.name = name
+        self.description = description
+        self.message = message
+        self.event = event
+        self.target = target
+
+    def advance(self, progress, last_day, payload):
+        raise NotImplementedError
+
+    def stage(self, conn, staged):
+        pass
+
+    def backfill_sql(self):
+        raise NotImplementedError
+
+    def _events(self):
+        return _temp_table("events", self.event)
+
+
+class CountRule(RewardRule):
+    def __init__(self, name, description, message, event, target, where=None):
+        super().__init__(name, description, message, event, target)
+        self.where = where
+
+    def advance(self, progress, last_day, payload):
+        if self.where is not None and not self.where(payload):
+            return progress, last_day
+        return progress + 1, payload["day"]
+
+    def backfill_sql(self):
+        where = f"WHERE {self.where.sql}" if self.where is not None else ""
+        also = f"AND {self.where.sql}" if self.where is not None else ""
+        return f"""
+            SELECT user_id, COUNT(*) >= {self.target}, MIN(COUNT(*), {self.target}), MAX(day),
+                   CASE WHEN COUNT(*) >= {self.target} THEN (
+                       SELECT date FROM {self._events()} e WHERE e.user_id = g.user_id {also}
+                       ORDER BY day_number, rowid LIMIT 1 OFFSET {self.target - 1}) END
+            FROM {self._events()} g {where} GROUP BY user_id"""
+
+
+class DailyStreakRule(RewardRule):
+    def advance(self, progress, last_day, payload):
+        day = payload["day"]
+        if last_day is not None and day <= last_day:
+            return progress, last_day
+        if last_day is not None and date.fromisoformat(day) - date.fromisoformat(last_day) == timedelta(days=1):
+            return progress + 1, day
+        return 1, day
+
+    def _islands(self):
+        return _temp_table("islands", self.event)
+
+    def stage(self, conn, staged):
+        _stage(conn, staged, self._islands(), f"""
+            SELECT user_id, island, COUNT(DISTINCT day_number) AS length, MIN(day_number) AS start,
+                   MAX(day) AS last_day
+            FROM (SELECT user_id, day_number, day,
+                         day_number - DENSE_RANK() OVER (PARTITION BY user_id ORDER BY day_number) AS island
+                  FROM {self._events()})
+            GROUP BY user_id, island""", "user_id, island")
+
+    def backfill_sql(self):
+        return f"""
+            SELECT user_id, MAX(length) >= {self.target},
+                   (SELECT length FROM {self._islands()} j WHERE j.user_id = i.user_id ORDER BY island DESC LIMIT 1),
+                   MAX(last_day),
+                   CASE WHEN MAX(length) >= {self.target} THEN (
+                       SELECT MIN(date) FROM {self._events()} e WHERE e.user_id = i.user_id AND e.day_number = (
+                           SELECT start FROM {self._islands()} j WHERE j.user_id = i.user_id AND length >= {self.target}
+                           ORDER BY island LIMIT 1) + {self.target - 1}) END
+            FROM {self._islands()} i GROUP BY user_id"""
+
+
+class RunRule(RewardRule):
+    def __init__(self, name, description, message, event, target, condition):
+        super().__init__(name, description, message, event, target)
+        self.condition = condition
+
+    def advance(self, progress, last_day, payload):
+        return (progress + 1 if self.condition(payload) else 0), payload["day"]
+
+    def _runs(self):
+        return _temp_table("runs", self.name.lower().replace(" ", "_"))
+
+    def stage(self, conn, staged):
+        _stage(conn, staged, self._runs(), f"""
+            SELECT user_id, run, COUNT(*) AS length, MIN(seq) AS start, MAX(seq) AS stop
+            FROM (SELECT user_id, rowid AS seq,
+                         rowid - ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY day_number, rowid) AS run
+                  FROM {self._events()} WHERE {self.condition.sql})
+            GROUP BY user_id, run""", "user_id, run")
+
+    def backfill_sql(self):
+        return f"""
+            SELECT user_id,
+                   COALESCE((SELECT MAX(length) FROM {self._runs()} r WHERE r.user_id = u.user_id), 0) >= {self.target},
+                   COALESCE((SELECT length FROM {self._runs()} r WHERE r.user_id = u.user_id AND r.stop = u.last), 0),
+                   last_day,
+                   (SELECT date FROM {self._events()} WHERE rowid = (
+                       SELECT start FROM {self._runs()} r WHERE r.user_id = u.user_id AND length >= {self.target}
+                       ORDER BY run LIMIT 1) + {self.target - 1})
+            FROM (SELECT user_id, MAX(rowid) AS last, MAX(day) AS last_day FROM {self._events()} GROUP BY user_id) u"""
+
+
+REWARDS = [
+    DailyStreakRule("Three Day Login", "Log in for three consecutive days",
+                    "for logging in three consecutive days", LOGIN, 3),
+    DailyStreakRule("Three Day Exercise", "Complete exercises for three consecutive days",
+                    "for completing exercises three consecutive days", SESSION_SUBMITTED, 3),
+    CountRule("Ten Exercises Completed", "Complete 10 exercises in total",
+              "for completing 10 exercises", SESSION_SUBMITTED, 10),
+    CountRule("First Community Post", "Share your first community post",
+              "for sharing your first post", POST_SHARED, 1),
+    RunRule("Stress Reduction Master", "Reduce stress level in three consecutive exercises",
+            "for reducing stress in three consecutive exercises", SESSION_SUBMITTED, 3,
+            condition=FieldLess("stress_after", "stress_before")),
+    DailyStreakRule("Perfect Week", "Complete at least one exercise each day for a week",
+                    "for exercising every day for a week", SESSION_SUBMITTED, 7),
+    CountRule("Mindful Master", "Complete 50 Mindful Breathing exercises",
+              "for completing 50 Mindful Breathing exercises", SESSION_SUBMITTED, 50,
+              where=FieldIn("exercise_type", ("Mindful Breathing 1", "Mindful Breathing 2"))),
+]
+
+RULES_BY_NAME = {rule.name: rule for rule in REWARDS}
+RULES_BY_EVENT = {}
+for _rule in REWARDS:
+    RULES_BY_EVENT.setdefault(_rule.event, []).append(_rule)
+del _rule
+
+
+def seed_user_rewards(conn, user_id):
+    conn.executemany(
+        "INSERT OR IGNORE INTO rewards (user_id, reward_name, reward_description, earned) VALUES (?, ?, ?, 0)",
+        [(user_id, rule.name, rule.description) for rule in REWARDS])
+
+
+def user_rewards(conn, user_id):
+    return {row[0]: (row[1], row[2]) for row in conn.execute(
+        "SELECT reward_name, earned, earn_date FROM rewards WHERE user_id=?", (user_id,))}
+
+
+def _apply(state, event, payload):
+    earned = []
+    changed = []
+    for rule in RULES_BY_EVENT.get(event, ()):
+        entry = state.setdefault(rule.name, [0, 0, None, None])
+        if entry[0]:
+            continue
+        progress, last_day = rule.advance(entry[1], entry[2], payload)
+        if (progress, last_day) == (entry[1], entry[2]):
+            continue
+        entry[1], entry[2] = progress, last_day
+        if progress >= rule.target:
+            entry[0], entry[3] = 1, payload["date"]
+            earned.append(rule)
+        changed.append(rule)
+    return changed, earned
+
+
+def _write_state(conn, user_id, state, rules):
+    conn.executemany(
+        """INSERT INTO rewards (user_id, reward_name, reward_description, earned, progress, last_day, earn_date)
+           VALUES (?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT (user_id, reward_name) DO UPDATE SET
+               earned = excluded.earned, earn_date = excluded.earn_date,
+               progress = excluded.progress, last_day = excluded.last_day""",
+        [(user_id, rule.name, rule.description, *state[rule.name]) for rule in rules])
+
+
+def record_event(conn, user_id, event, **payload):
+    rules = RULES_BY_EVENT.get(event, [])
+    if not rules:
+        return []
+    payload.setdefault("day", payload["date"][:10])
+    placeholders = ", ".join("?" for _ in rules)
+    state = {row[0]: list(row[1:]) for row in conn.execute(
+        f"SELECT reward_name, earned, progress, last_day, earn_date FROM rewards "
+        f"WHERE user_id=? AND reward_name IN ({placeholders})",
+        (user_id, *[rule.name for rule in rules]))}
+    for entry in state.values():
+        entry[1] = entry[1] or 0
+    changed, earned = _apply(state, event, payload)
+    if changed:
+        _write_state(conn, user_id, state, changed)
+    return earned
+
+
+def _temp_table(kind, key):
+    return f"temp.reward_{kind}_{key}"
+
+
+def _stage(conn, staged, table, select, key):
+    if table in staged:
+        return
+    conn.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.execute(f"CREATE TABLE {table} AS {select}")
+    conn.execute(f"CREATE INDEX {table}_key ON {table.split('.')[1]} ({key})")
+    staged.append(table)
+
+
+def _stage_events(conn, users, staged):
+    for event in RULES_BY_EVENT:
+        _stage(conn, staged, _temp_table("events", event), f"""
+            SELECT *, substr(date, 1, 10) AS day FROM ({EVENT_SOURCES[event]})
+            WHERE day_number IS NOT NULL AND user_id IN (SELECT id FROM {users})
+            ORDER BY user_id, date, id""", "user_id, day_number")
+    return sum(conn.execute(f"SELECT COUNT(*) FROM {_temp_table('events', event)}").fetchone()[0]
+               for event in RULES_BY_EVENT)
+
+
+def backfill_rewards(conn, users="users"):
+    start = time.perf_counter()
+    user_count = conn.execute(f"SELECT COUNT(*) FROM {users}").fetchone()[0]
+    staged = []
+    events = _stage_events(conn, users, staged)
+    for rule in REWARDS:
+        rule.stage(conn, staged)
+    conn.execute(
+        f"WITH rules (name, description) AS (VALUES {', '.join('(?, ?)' for _ in REWARDS)}) "
+        "INSERT OR IGNORE INTO rewards (user_id, reward_name, reward_description, earned) "
+        f"SELECT {users}.id, rules.name, rules.description, 0 FROM {users}, rules",
+        [value for rule in REWARDS for value in (rule.name, rule.description)])
+    conn.execute(f"UPDATE rewards SET progress=0, last_day=NULL WHERE user_id IN (SELECT id FROM {users})")
+    for rule in REWARDS:
+        conn.execute(
+            f"""WITH computed (user_id, earned, progress, last_day, earn_date) AS ({rule.backfill_sql()})
+                INSERT INTO rewards (user_id, reward_name, reward_description, earned, progress, last_day, earn_date)
+                SELECT user_id, ?, ?, earned, CASE WHEN earned THEN {rule.target} ELSE progress END,
+                       CASE WHEN earned THEN substr(earn_date, 1, 10) ELSE last_day END, earn_date
+                FROM computed WHERE true
+                ON CONFLICT (user_id, reward_name) DO UPDATE SET
+                    earn_date = CASE WHEN rewards.earned THEN rewards.earn_date ELSE excluded.earn_date END,
+                    progress = CASE WHEN rewards.earned THEN {rule.target} ELSE excluded.progress END,
+                    last_day = CASE WHEN rewards.earned THEN substr(rewards.earn_date, 1, 10) ELSE excluded.last_day END,
+                    earned = MAX(rewards.earned, excluded.earned)""",
+            (rule.name, rule.description))
+    for table in staged:
+        conn.execute(f"DROP TABLE {table}")
+    return BackfillResult(user_count, events, time.perf_counter() - start)
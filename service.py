@@ -0,0 +1,397 @@
+import asyncio
+import json
+import logging
+import re
+import secrets
+import signal
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import core
+from cache import cached, query_cache
+from community import COMMENT_PAGE_SIZE, fetch_comment_page, fetch_latest_comments, fetch_post_page
+from database import close_connection, get_connection, write_stats
+from dateranges import custom_range
+from rewards import user_rewards
+from sessions import fetch_session_page
+from stats import all_user_stats, user_stats
+from trends import fetch_trend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8750
+DB_WORKERS = 4
+QUEUE_PER_WORKER = 16
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+KEEP_ALIVE_SECONDS = 30
+TOKEN_IDLE_SECONDS = 30 * 60
+MAX_TOKENS = 10000
+
+PUBLIC = "public"
+ACCOUNT = "account"
+MEMBER = "member"
+MANAGER = "manager"
+
+SESSION_FIELDS = ["date", "exercise", "stress_before", "stress_after", "completion", "notes", "id"]
+
+Route = namedtuple("Route", ["method", "pattern", "role", "handler"])
+Request = namedtuple("Request", ["params", "query", "body", "session", "token"])
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or status.phrase)
+        self.status = status
+        self.message = message or status.phrase
+
+
+def _query_value(request, name, default=None):
+    values = request.query.get(name)
+    return values[-1] if values else default
+
+
+def _query_int(request, name, default=None):
+    value = _query_value(request, name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer")
+
+
+def _body_value(request, name, kind, default=None):
+    value = request.body.get(name, default)
+    if value is None or not isinstance(value, kind) or isinstance(value, bool) and kind is not bool:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} is required")
+    return value
+
+
+def _keyset(request, prefix):
+    date, row_id = _query_value(request, f"{prefix}_date"), _query_int(request, f"{prefix}_id")
+    if date is None or row_id is None:
+        return None
+    return date, row_id
+
+
+def _earned(rules):
+    return [{"name": rule.name, "message": rule.message} for rule in rules]
+
+
+def _exercise(exercise):
+    return exercise._asdict() if exercise else None
+
+
+def _series(series):
+    dates, values = series
+    return {"dates": [day.isoformat(" ") for day in dates], "values": list(values)}
+
+
+class Service:
+    def __init__(self, workers=DB_WORKERS):
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        self.slots = asyncio.Semaphore(workers * QUEUE_PER_WORKER)
+        self.tokens = OrderedDict()
+        self.tokens_lock = threading.Lock()
+        self.routes = [Route(method, re.compile(pattern + "$"), role, handler) for method, pattern, role, handler in (
+            ("POST", r"/register", PUBLIC, self.register),
+            ("POST", r"/login", PUBLIC, self.login),
+            ("POST", r"/logout", ACCOUNT, self.logout),
+            ("GET", r"/exercises", PUBLIC, self.list_exercises),
+            ("POST", r"/exercises", MANAGER, self.add_exercise),
+            ("PUT", r"/exercises/(\d+)", MANAGER, self.update_exercise),
+            ("DELETE", r"/exercises/(\d+)", MANAGER, self.delete_exercise),
+            ("GET", r"/recommendation", MEMBER, self.recommendation),
+            ("GET", r"/sessions", MEMBER, self.list_sessions),
+            ("POST", r"/sessions", MEMBER, self.record_session),
+            ("GET", r"/stats", MEMBER, self.stats),
+            ("GET", r"/rewards", MEMBER, self.rewards),
+            ("GET", r"/trend", MEMBER, self.trend),
+            ("GET", r"/posts", PUBLIC, self.list_posts),
+            ("POST", r"/posts", MEMBER, self.share_post),
+            ("DELETE", r"/posts/(\d+)", MANAGER, self.delete_post),
+            ("GET", r"/posts/(\d+)/comments", PUBLIC, self.list_comments),
+            ("POST", r"/posts/(\d+)/comments", MEMBER, self.add_comment),
+            ("GET", r"/users", MANAGER, self.list_users),
+            ("DELETE", r"/users/(\d+)", MANAGER, self.delete_user),
+            ("GET", r"/metrics", MANAGER, self.metrics),
+        )]
+
+    def register(self, request):
+        return {"user_id": core.register(_body_value(request, "username", str), _body_value(request, "password", str))}
+
+    def login(self, request):
+        login = core.login(_body_value(request, "username", str), _body_value(request, "password", str))
+        if login is None:
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, "Invalid username or password")
+        session = login.session
+        token = secrets.token_urlsafe(32)
+        with self.tokens_lock:
+            self.tokens[token] = (session, time.monotonic())
+            self._evict_tokens(time.monotonic())
+        return {"token": token, "user_id": session.user_id, "username": session.username, "role": session.role,
+                "is_admin": session.is_admin, "earned": _earned(login.earned)}
+
+    def logout(self, request):
+        with self.tokens_lock:
+            self.tokens.pop(request.token, None)
+        return {}
+
+    def list_exercises(self, request):
+        return [_exercise(exercise) for exercise in core.list_exercises(get_connection())]
+
+    def _exercise_fields(self, request):
+        return (_body_value(request, "name", str).strip(), _body_value(request, "description", str).strip(),
+                _body_value(request, "stress_level_min", int), _body_value(request, "stress_level_max", int))
+
+    def add_exercise(self, request):
+        return {"id": core.add_exercise(*self._exercise_fields(request))}
+
+    def update_exercise(self, request):
+        if not core.update_exercise(int(request.params[0]), *self._exercise_fields(request)):
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Exercise not found")
+        return {}
+
+    def delete_exercise(self, request):
+        if not core.delete_exercise(int(request.params[0])):
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Exercise not found")
+        return {}
+
+    def recommendation(self, request):
+        exercise = core.recommend_for_user(request.session.user_id, _query_int(request, "stress"))
+        if exercise is None:
+            return None
+        return dict(exercise._asdict(), duration=core.exercise_duration(exercise.name))
+
+    def list_sessions(self, request):
+        user_id = request.session.user_id
+        first, last = _query_value(request, "from"), _query_value(request, "to")
+        period = custom_range(first, last or first) if first else None
+        after = _keyset(request, "after")
+        rows = cached(user_id, ("session_page", period, after),
+                      lambda: fetch_session_page(get_connection(), user_id, period, after))
+        return [dict(zip(SESSION_FIELDS, row)) for row in rows]
+
+    def record_session(self, request):
+        earned = core.record_session(request.session.user_id, _body_value(request, "exercise", str),
+                                     _body_value(request, "stress_before", int),
+                                     _body_value(request, "stress_after", int),
+                                     _body_value(request, "completion", (int, float), 0.0),
+                                     _body_value(request, "notes", str, ""))
+        return {"earned": _earned(earned)}
+
+    def stats(self, request):
+        user_id = request.session.user_id
+        return cached(user_id, ("stats",), lambda: user_stats(get_connection(), user_id))._asdict()
+
+    def rewards(self, request):
+        rewards = user_rewards(get_connection(), request.session.user_id)
+        return {name: {"earned": bool(earned), "earn_date": earn_date} for name, (earned, earn_date) in rewards.items()}
+
+    def trend(self, request):
+        user_id = request.session.user_id
+        trend = cached(user_id, ("trend",), lambda: fetch_trend(get_connection(), user_id))
+        if trend is None:
+            return None
+        return {"resolution": trend.resolution, "stress_before": _series(trend.stress_before),
+                "stress_after": _series(trend.stress_after), "completion": _series(trend.completion)}
+
+    def list_posts(self, request):
+        conn = get_connection()
+        posts = fetch_post_page(conn, before=_keyset(request, "before"))
+        latest = fetch_latest_comments(conn, [post[0] for post in posts], limit=COMMENT_PAGE_SIZE)
+        return [{"id": post_id, "content": content, "date": date,
+                 "comments": [{"id": c[0], "date": c[1], "body": c[2]} for c in reversed(latest.get(post_id, []))]}
+                for post_id, content, date in posts]
+
+    def share_post(self, request):
+        post_id, earned = core.share_post(request.session.user_id, _body_value(request, "content", str))
+        return {"id": post_id, "earned": _earned(earned)}
+
+    def delete_post(self, request):
+        if not core.delete_post(int(request.params[0])):
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Post not found")
+        return {}
+
+    def list_comments(self, request):
+        page = fetch_comment_page(get_connection(), int(request.params[0]), _keyset(request, "before"))
+        return [{"id": comment_id, "date": date, "body": body} for comment_id, date, body in page]
+
+    def add_comment(self, request):
+        comment = core.comment_on_post(int(request.params[0]), _body_value(request, "body", str))
+        if comment is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Post not found")
+        comment_id, date, body = comment
+        return {"id": comment_id, "date": date, "body": body}
+
+    def list_users(self, request):
+        return [dict(stats._asdict(), id=user_id, username=username)
+                for user_id, username, stats in all_user_stats(get_connection())]
+
+    def delete_user(self, request):
+        user_id = int(request.params[0])
+        if not core.delete_user(user_id):
+            raise HTTPError(HTTPStatus.NOT_FOUND, "User not found")
+        with self.tokens_lock:
+            for token in [t for t, (session, _) in self.tokens.items()
+                          if session.user_id == user_id and not session.is_admin]:
+                del self.tokens[token]
+        return {}
+
+    def metrics(self, request):
+        return {"writes": write_stats()._asdict(),
+                "query_cache": {"hits": query_cache.hits, "misses": query_cache.misses, "bytes": query_cache.size}}
+
+    def _route(self, method, path):
+        allowed = False
+        for route in self.routes:
+            match = route.pattern.match(path)
+            if match is None:
+                continue
+            if route.method == method:
+                return route, match.groups()
+            allowed = True
+        raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED if allowed else HTTPStatus.NOT_FOUND)
+
+    def _evict_tokens(self, now):
+        while self.tokens:
+            token, (_, last_seen) = next(iter(self.tokens.items()))
+            if now - last_seen < TOKEN_IDLE_SECONDS and len(self.tokens) <= MAX_TOKENS:
+                break
+            del self.tokens[token]
+
+    def _authenticate(self, headers, role):
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        session = None
+        with self.tokens_lock:
+            now = time.monotonic()
+            self._evict_tokens(now)
+            if scheme.lower() == "bearer" and token in self.tokens:
+                session = self.tokens[token][0]
+                self.tokens[token] = (session, now)
+                self.tokens.move_to_end(token)
+        if role == PUBLIC:
+            return session, token
+        if session is None:
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, "Login required")
+        if role == MEMBER and session.is_admin:
+            raise HTTPError(HTTPStatus.FORBIDDEN, "Managers cannot use this endpoint")
+        if role == MANAGER and not session.is_admin:
+            raise HTTPError(HTTPStatus.FORBIDDEN, "Manager access required")
+        return session, token
+
+    async def dispatch(self, method, target, headers, body):
+        url = urlsplit(target)
+        try:
+            route, params = self._route(method, url.path)
+            session, token = self._authenticate(headers, route.role)
+            try:
+                data = json.loads(body) if body else {}
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body must be JSON")
+            if not isinstance(data, dict):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+            request = Request(params, parse_qs(url.query), data, session, token)
+            async with self.slots:
+                result = await asyncio.get_running_loop().run_in_executor(self.pool, route.handler, request)
+            return HTTPStatus.OK, result
+        except HTTPError as e:
+            return e.status, {"error": e.message}
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        except Exception:
+            logger.exception("%s %s failed", method, url.path)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"}
+
+    def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_SECONDS)
+                except asyncio.LimitOverrunError:
+                    self._respond(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                  {"error": "Request headers too large"}, False)
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                    headers = {}
+                    for line in lines[1:]:
+                        if line:
+                            name, _, value = line.partition(":")
+                            headers[name.strip().lower()] = value.strip()
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request"}, False)
+                    break
+                if length < 0:
+                    self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request"}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Request body too large"},
+                                  False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self.dispatch(method, target, headers, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                self._respond(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def close(self):
+        barrier = threading.Barrier(self.workers)
+
+        def close_worker():
+            try:
+                barrier.wait(timeout=5)
+            except threading.BrokenBarrierError:
+                pass
+            close_connection()
+
+        for _ in range(self.workers):
+            self.pool.submit(close_worker)
+        self.pool.shutdown(wait=True)
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=DB_WORKERS):
+    service = Service(workers)
+    server = await asyncio.start_server(service.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+    logger.info("serving on %s", ", ".join(str(sock.getsockname()) for sock in server.sockets))
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError, ValueError):
+            pass
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        service.close()
+    logger.info("service stopped")
@@ -0,0 +1,49 @@
+from dateranges import range_clause, from_day_number
+
+SESSION_COLUMNS = "date, exercise_type, stress_before, stress_after, duration_percentage, notes"
+SESSION_HEADERS = ["Date", "Exercise", "Stress Before", "Stress After", "Completion %", "Notes"]
+PAGE_SIZE = 200
+RECENT_SESSIONS = 2
+
+
+def _filters(user_id, period):
+    clauses, params = ["user_id=?"], [user_id]
+    if period is not None:
+        clause, bounds = range_clause(period)
+        clauses.append(clause)
+        params.extend(bounds)
+    return clauses, params
+
+
+def fetch_session_page(conn, user_id, period=None, after=None, limit=PAGE_SIZE):
+    clauses, params = _filters(user_id, period)
+    if after is not None:
+        clauses.append("(date, id) > (?, ?)")
+        params.extend(after)
+    params.append(limit)
+    return conn.execute(
+        f"SELECT {SESSION_COLUMNS}, id FROM stress_levels WHERE {' AND '.join(clauses)} "
+        f"ORDER BY date, id LIMIT ?", params).fetchall()
+
+
+def count_sessions(conn, user_id, period=None):
+    clauses, params = _filters(user_id, period)
+    return conn.execute(f"SELECT COUNT(*) FROM stress_levels WHERE {' AND '.join(clauses)}", params).fetchone()[0]
+
+
+def fetch_day_activity(conn, user_id, period):
+    clause, bounds = range_clause(period)
+    return {from_day_number(day): (count, reduction) for day, count, reduction in conn.execute(
+        f"SELECT day_number, COUNT(*), AVG(stress_before - stress_after) FROM stress_levels "
+        f"WHERE user_id=? AND {clause} GROUP BY day_number", [user_id, *bounds])}
+
+
+def fetch_sessions(conn, user_id):
+    return conn.execute(f"SELECT {SESSION_COLUMNS} FROM stress_levels WHERE user_id=? ORDER BY date, id",
+                        (user_id,)).fetchall()
+
+
+def fetch_recent_exercises(conn, user_id, limit=RECENT_SESSIONS):
+    return tuple(row[0] for row in conn.execute(
+        "SELECT exercise_type FROM stress_levels WHERE user_id=? ORDER BY date DESC, id DESC LIMIT ?",
+        (user_id, limit)))
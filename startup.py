@@ -0,0 +1,22 @@
+import os
+import sys
+import time
+
+ENV_VAR = "STRESS_STARTUP_TIMING"
+
+enabled = os.environ.get(ENV_VAR, "") not in ("", "0")
+
+_start = time.perf_counter()
+_last = _start
+_marks = {}
+
+
+def mark(name):
+    global _last
+    if not enabled or name in _marks:
+        return
+    now = time.perf_counter()
+    _marks[name] = now - _start
+    print(f"[startup] {name}: +{(now - _last) * 1000:.1f} ms (total {(now - _start) * 1000:.1f} ms)",
+          file=sys.stderr)
+    _last = now
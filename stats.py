@@ -0,0 +1,183 @@
+from collections import namedtuple
+
+UserStats = namedtuple("UserStats", ["session_count", "average_completion", "average_stress_before",
+                                     "average_stress_after", "last_session_date"])
+
+EMPTY_STATS = UserStats(0, None, None, None, None)
+
+ExerciseStats = namedtuple("ExerciseStats", ["session_count", "mean_reduction", "reduction_variance",
+                                             "completion_rate"])
+
+_STATS_COLUMNS = """COALESCE(session_count, 0),
+                    completion_sum / NULLIF(completion_count, 0),
+                    stress_before_sum * 1.0 / NULLIF(session_count, 0),
+                    stress_after_sum * 1.0 / NULLIF(session_count, 0),
+                    last_session_date"""
+
+STATS_TRIGGERS = ("stress_levels_stats_insert", "stress_levels_stats_delete")
+EXERCISE_STATS_TRIGGERS = ("stress_levels_exercise_stats_insert", "stress_levels_exercise_stats_delete")
+
+_EXERCISE_STATS_ROWS = """{0}.user_id IN (SELECT id FROM users) AND {0}.exercise_type IS NOT NULL
+                          AND {0}.stress_before IS NOT NULL AND {0}.stress_after IS NOT NULL"""
+
+
+def create_stats_schema(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS user_stats (
+                    user_id INTEGER PRIMARY KEY,
+                    session_count INTEGER NOT NULL DEFAULT 0,
+                    completion_sum REAL NOT NULL DEFAULT 0,
+                    completion_count INTEGER NOT NULL DEFAULT 0,
+                    stress_before_sum INTEGER NOT NULL DEFAULT 0,
+                    stress_after_sum INTEGER NOT NULL DEFAULT 0,
+                    last_session_date TEXT,
+                    data_version INTEGER NOT NULL DEFAULT 0,
+                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE)''')
+    create_stats_triggers(conn)
+
+
+def create_stats_triggers(conn):
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS stress_levels_stats_insert AFTER INSERT ON stress_levels
+                    WHEN NEW.user_id IN (SELECT id FROM users)
+                    BEGIN
+                        INSERT INTO user_stats (user_id, session_count, completion_sum, completion_count,
+                                                stress_before_sum, stress_after_sum, last_session_date, data_version)
+                        VALUES (NEW.user_id, 1, COALESCE(NEW.duration_percentage, 0),
+                                NEW.duration_percentage IS NOT NULL, COALESCE(NEW.stress_before, 0),
+                                COALESCE(NEW.stress_after, 0), NEW.date, 1)
+                        ON CONFLICT (user_id) DO UPDATE SET
+                            session_count = session_count + 1,
+                            data_version = data_version + 1,
+                            completion_sum = completion_sum + excluded.completion_sum,
+                            completion_count = completion_count + excluded.completion_count,
+                            stress_before_sum = stress_before_sum + excluded.stress_before_sum,
+                            stress_after_sum = stress_after_sum + excluded.stress_after_sum,
+                            last_session_date = CASE
+                                WHEN last_session_date IS NULL OR excluded.last_session_date > last_session_date
+                                THEN excluded.last_session_date ELSE last_session_date END;
+                    END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS stress_levels_stats_delete AFTER DELETE ON stress_levels
+                    BEGIN
+                        UPDATE user_stats SET
+                            session_count = session_count - 1,
+                            data_version = data_version + 1,
+                            completion_sum = completion_sum - COALESCE(OLD.duration_percentage, 0),
+                            completion_count = completion_count - (OLD.duration_percentage IS NOT NULL),
+                            stress_before_sum = stress_before_sum - COALESCE(OLD.stress_before, 0),
+                            stress_after_sum = stress_after_sum - COALESCE(OLD.stress_after, 0),
+                            last_session_date = (SELECT MAX(date) FROM stress_levels WHERE user_id = OLD.user_id)
+                        WHERE user_id = OLD.user_id;
+                    END''')
+
+
+def create_exercise_stats_schema(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS exercise_stats (
+                    user_id INTEGER NOT NULL,
+                    exercise_type TEXT NOT NULL,
+                    session_count INTEGER NOT NULL DEFAULT 0,
+                    reduction_mean REAL NOT NULL DEFAULT 0,
+                    reduction_m2 REAL NOT NULL DEFAULT 0,
+                    completion_sum REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user_id, exercise_type),
+                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE) WITHOUT ROWID''')
+    create_exercise_stats_triggers(conn)
+
+
+def create_exercise_stats_triggers(conn):
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS stress_levels_exercise_stats_insert AFTER INSERT ON stress_levels
+                     WHEN {_EXERCISE_STATS_ROWS.format("NEW")}
+                     BEGIN
+                         INSERT INTO exercise_stats (user_id, exercise_type, session_count, reduction_mean,
+                                                     reduction_m2, completion_sum)
+                         VALUES (NEW.user_id, NEW.exercise_type, 1, NEW.stress_before - NEW.stress_after, 0,
+                                 COALESCE(NEW.duration_percentage, 0))
+                         ON CONFLICT (user_id, exercise_type) DO UPDATE SET
+                             session_count = session_count + 1,
+                             reduction_mean = reduction_mean
+                                 + (excluded.reduction_mean - reduction_mean) / (session_count + 1.0),
+                             reduction_m2 = reduction_m2
+                                 + (excluded.reduction_mean - reduction_mean) * (excluded.reduction_mean - reduction_mean)
+                                 * session_count / (session_count + 1.0),
+                             completion_sum = completion_sum + excluded.completion_sum;
+                     END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS stress_levels_exercise_stats_delete AFTER DELETE ON stress_levels
+                     WHEN {_EXERCISE_STATS_ROWS.format("OLD")}
+                     BEGIN
+                         DELETE FROM exercise_stats
+                         WHERE user_id = OLD.user_id AND exercise_type = OLD.exercise_type AND session_count <= 1;
+                         UPDATE exercise_stats SET
+                             session_count = session_count - 1,
+                             reduction_mean = (reduction_mean * session_count - (OLD.stress_before - OLD.stress_after))
+                                 / (session_count - 1.0),
+                             reduction_m2 = MAX(reduction_m2
+                                 - (OLD.stress_before - OLD.stress_after - reduction_mean)
+                                 * (OLD.stress_before - OLD.stress_after - reduction_mean)
+                                 * session_count / (session_count - 1.0), 0),
+                             completion_sum = completion_sum - COALESCE(OLD.duration_percentage, 0)
+                         WHERE user_id = OLD.user_id AND exercise_type = OLD.exercise_type;
+                     END''')
+
+
+def drop_stats_triggers(conn):
+    for name in STATS_TRIGGERS + EXERCISE_STATS_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def rebuild_user_stats(conn, users="users"):
+    conn.execute(f'''UPDATE user_stats SET session_count = 0, completion_sum = 0, completion_count = 0,
+                                          stress_before_sum = 0, stress_after_sum = 0, last_session_date = NULL,
+                                          data_version = data_version + 1
+                    WHERE user_id IN (SELECT id FROM {users})''')
+    conn.execute(f'''INSERT INTO user_stats (user_id, session_count, completion_sum, completion_count,
+                                            stress_before_sum, stress_after_sum, last_session_date, data_version)
+                    SELECT user_id, COUNT(*), COALESCE(SUM(duration_percentage), 0), COUNT(duration_percentage),
+                           COALESCE(SUM(stress_before), 0), COALESCE(SUM(stress_after), 0), MAX(date), 1
+                    FROM stress_levels WHERE user_id IN (SELECT id FROM {users})
+                    GROUP BY user_id
+                    ON CONFLICT (user_id) DO UPDATE SET
+                        session_count = excluded.session_count,
+                        completion_sum = excluded.completion_sum,
+                        completion_count = excluded.completion_count,
+                        stress_before_sum = excluded.stress_before_sum,
+                        stress_after_sum = excluded.stress_after_sum,
+                        last_session_date = excluded.last_session_date''')
+
+
+def rebuild_exercise_stats(conn, users="users"):
+    conn.execute(f"DELETE FROM exercise_stats WHERE user_id IN (SELECT id FROM {users})")
+    conn.execute(f'''INSERT INTO exercise_stats (user_id, exercise_type, session_count, reduction_mean, reduction_m2,
+                                                completion_sum)
+                    SELECT user_id, exercise_type, COUNT(*), AVG(reduction),
+                           MAX(SUM(reduction * reduction) - SUM(reduction) * SUM(reduction) * 1.0 / COUNT(*), 0),
+                           SUM(completion)
+                    FROM (SELECT user_id, exercise_type, stress_before - stress_after AS reduction,
+                                 COALESCE(duration_percentage, 0) AS completion
+                          FROM stress_levels
+                          WHERE user_id IN (SELECT id FROM {users}) AND exercise_type IS NOT NULL
+                                AND stress_before IS NOT NULL AND stress_after IS NOT NULL)
+                    GROUP BY user_id, exercise_type''')
+
+
+def user_stats(conn, user_id):
+    row = conn.execute(f"SELECT {_STATS_COLUMNS} FROM user_stats WHERE user_id=?", (user_id,)).fetchone()
+    return UserStats(*row) if row else EMPTY_STATS
+
+
+def all_user_stats(conn):
+    return [(row[0], row[1], UserStats(*row[2:])) for row in conn.execute(
+        f"SELECT users.id, users.username, {_STATS_COLUMNS} "
+        f"FROM users LEFT JOIN user_stats ON user_stats.user_id = users.id ORDER BY users.id")]
+
+
+def add_exercise_sample(stats, exercise_type, reduction, completion):
+    count, mean, variance, rate = stats.get(exercise_type, ExerciseStats(0, 0.0, 0.0, 0.0))
+    delta = reduction - mean
+    m2 = variance * (count - 1) + delta * delta * count / (count + 1)
+    updated = ExerciseStats(count + 1, mean + delta / (count + 1), m2 / count if count else 0.0,
+                            (rate * count + completion / 100) / (count + 1))
+    return {**stats, exercise_type: updated}
+
+
+def exercise_stats(conn, user_id):
+    return {row[0]: ExerciseStats(row[1], row[2], row[3] / (row[1] - 1) if row[1] > 1 else 0.0, row[4] / row[1] / 100)
+            for row in conn.execute("SELECT exercise_type, session_count, reduction_mean, reduction_m2, completion_sum "
+                                    "FROM exercise_stats WHERE user_id=?", (user_id,))}
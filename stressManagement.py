@@ -1,137 +1,269 @@
+import startup
 import sys
 import sqlite3
-import csv
-from datetime import datetime, timedelta
+import threading
 import random
 import builtins
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLabel, QLineEdit, QTextEdit, QComboBox,
-                             QMessageBox, QStackedWidget, QFormLayout, QDialog, QTableWidget,
+                             QMessageBox, QStackedWidget, QFormLayout, QDialog, QTableWidget, QTableView,
                              QTableWidgetItem, QScrollArea, QProgressBar, QListWidget, QListWidgetItem,
-                             QCalendarWidget, QDialogButtonBox, QSpinBox, QGridLayout, QFrame, QFileDialog, QInputDialog)
-from PyQt6.QtCore import Qt, QTimer, QDate, QLocale
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-from contextlib import contextmanager
-
-@contextmanager
-def get_db_connection():
-    conn = sqlite3.connect('mbsr_data.db')
-    yield conn
-    conn.close()
-
-def init_db():
-    conn = sqlite3.connect('mbsr_data.db')
-    c = conn.cursor()
-    c.execute("PRAGMA foreign_keys = ON")
-    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='exercises'")
-    if not c.fetchone():
-        c.execute('''CREATE TABLE exercises (
-                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                     name TEXT,
-                     description TEXT,
-                     stress_level_min INTEGER,
-                     stress_level_max INTEGER)''')
-    c.execute("PRAGMA table_info(exercises)")
-    columns = {row[1] for row in c.fetchall()}
-    if 'video_url' in columns:
-        c.execute("CREATE TABLE exercises_temp AS SELECT id, name, description, stress_level_min, stress_level_max FROM exercises")
-        c.execute("DROP TABLE exercises")
-        c.execute('''CREATE TABLE exercises (
-                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                     name TEXT,
-                     description TEXT,
-                     stress_level_min INTEGER,
-                     stress_level_max INTEGER)''')
-        c.execute("INSERT INTO exercises (id, name, description, stress_level_min, stress_level_max) SELECT id, name, description, stress_level_min, stress_level_max FROM exercises_temp")
-        c.execute("DROP TABLE exercises_temp")
-    c.execute("DELETE FROM exercises")
-    c.execute(
-        "INSERT INTO exercises (name, description, stress_level_min, stress_level_max) VALUES (?, ?, ?, ?)",
-        ("Mindful Breathing 1",
-         "This is a foundational mindfulness exercise focusing on slow, deep breathing to promote relaxation. Sit comfortably, close your eyes if comfortable, and inhale deeply through your nose for a count of 4, hold for 4, then exhale slowly for 6. Repeat this cycle for 5 minutes, allowing your mind to settle and your body to release tension. Ideal for beginners or moments of mild stress.",
-         1, 3))
-    c.execute(
-        "INSERT INTO exercises (name, description, stress_level_min, stress_level_max) VALUES (?, ?, ?, ?)",
-        ("Mindful Breathing 2",
-         "An advanced breathing exercise to enhance focus and calm. Begin by sitting quietly, then count each breath from 1 to 10 as you inhale and exhale, restarting at 1 once you reach 10. If your mind wanders, gently return to 1. Practice for 10 minutes, noticing the rhythm of your breath. Suitable for moderate stress levels or to deepen concentration.",
-         4, 6))
-    c.execute(
-        "INSERT INTO exercises (name, description, stress_level_min, stress_level_max) VALUES (?, ?, ?, ?)",
-        ("Body Scan",
-         "A guided meditation to release physical and mental tension. Lie down or sit comfortably, and slowly bring your attention to each part of your body, starting from your toes and moving up to your head. Notice any sensations without judgment, spending about 1-2 minutes per area. This 15-20 minute practice is perfect for high stress or chronic tension relief.",
-         7, 10))
-    c.execute(
-        "INSERT INTO exercises (name, description, stress_level_min, stress_level_max) VALUES (?, ?, ?, ?)",
-        ("Walking Meditation",
-         "A moving mindfulness practice to connect with your body and surroundings. Walk slowly for 10 minutes in a quiet space, focusing on the sensation of each step—lifting, moving, and placing your foot. Coordinate your breath with your steps (e.g., inhale for 3 steps, exhale for 3). Great for moderate stress or when you need a break from sitting.",
-         3, 5))
-    c.execute(
-        "INSERT INTO exercises (name, description, stress_level_min, stress_level_max) VALUES (?, ?, ?, ?)",
-        ("Loving-Kindness Meditation",
-         "A heart-centered practice to cultivate compassion. Sit comfortably and silently repeat phrases like 'May I be happy, may I be healthy' for yourself, then extend them to others. Spend 10-15 minutes, starting with loved ones and gradually including neutral or difficult people. Ideal for emotional stress or fostering positivity.",
-         2, 4))
-    c.execute(
-        "INSERT INTO exercises (name, description, stress_level_min, stress_level_max) VALUES (?, ?, ?, ?)",
-        ("Gentle Stretching",
-         "A physical exercise to release tension and improve flexibility. Perform a series of gentle stretches—neck rolls, shoulder shrugs, side bends, and leg stretches—for 10-15 minutes. Move slowly, breathing deeply into each stretch. This is excellent for all stress levels, especially when combined with mindful breathing.",
-         1, 10))
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                 username TEXT UNIQUE,
-                 password TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS managers (
-                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                 username TEXT UNIQUE,
-                 password TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS stress_levels (
-                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                 user_id INTEGER,
-                 date TEXT,
-                 stress_before INTEGER,
-                 stress_after INTEGER,
-                 exercise_type TEXT,
-                 notes TEXT,
-                 duration_percentage REAL DEFAULT 0.0,
-                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS community_posts (
-                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                 user_id INTEGER,
-                 content TEXT,
-                 date TEXT,
-                 comments TEXT DEFAULT '',
-                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS login_history (
-                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                 user_id INTEGER,
-                 login_date TEXT,
-                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS rewards (
-                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                 user_id INTEGER,
-                 reward_name TEXT,
-                 reward_description TEXT,
-                 earned INTEGER DEFAULT 0,
-                 earn_date TEXT,
-                 FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE)''')
-    c.execute("PRAGMA table_info(stress_levels)")
-    columns = {row[1] for row in c.fetchall()}
-    if 'duration_percentage' not in columns:
-        c.execute("ALTER TABLE stress_levels ADD COLUMN duration_percentage REAL DEFAULT 0.0")
-    c.execute("SELECT id, username, password, is_admin FROM users WHERE is_admin=1")
-    admin_users = c.fetchall()
-    for admin in admin_users:
-        c.execute("INSERT OR IGNORE INTO managers (id, username, password) VALUES (?, ?, ?)",
-                  (admin[0], admin[1], admin[2]))
-        c.execute("DELETE FROM users WHERE id=?", (admin[0],))
-    conn.commit()
-    conn.close()
-
-class MplCanvas(FigureCanvas):
+                             QCalendarWidget, QDialogButtonBox, QSpinBox, QGridLayout, QFrame, QFileDialog, QInputDialog,
+                             QSizePolicy, QCheckBox)
+from PyQt6.QtCore import (Qt, QTimer, QDate, QLocale, QAbstractTableModel, QModelIndex, QObject, QRunnable,
+                          QThreadPool, QSize, QEvent, pyqtSignal)
+from PyQt6.QtGui import QImage, QPixmap, QColor, QTextCharFormat
+import database
+from database import get_connection, close_connection
+from migrations import init_db
+from stats import user_stats, all_user_stats
+from community import (POST_PAGE_SIZE, COMMENT_PAGE_SIZE, existing_post_ids, fetch_post_page, fetch_posts_after,
+                       fetch_comment_page, fetch_latest_comments, format_comments, most_discussed_post)
+from trends import fetch_trend
+from charts import TWIN_AXES, SHARED_AXES, render_cache, render_chart
+from cache import data_version, cached
+from dataaccess import data_access
+from sessions import SESSION_HEADERS, PAGE_SIZE, fetch_session_page, count_sessions, fetch_day_activity
+from dateranges import DAY, WEEK, MONTH, span_range, month_range, describe_range
+from exporter import BY_USER, BY_MONTH, export_sessions, write_user_sessions
+from rewards import REWARDS, user_rewards
+from auth import GUEST_SESSION
+import core
+
+startup.mark("import")
+
+_chart_pool = None
+
+
+def chart_pool():
+    global _chart_pool
+    if _chart_pool is None:
+        _chart_pool = QThreadPool()
+        _chart_pool.setMaxThreadCount(1)
+        _chart_pool.setExpiryTimeout(-1)
+    return _chart_pool
+
+
+def activity_color(count, max_count, reduction):
+    if reduction is None or reduction == 0:
+        color = QColor("#9E9E9E")
+    else:
+        color = QColor("#4CAF50" if reduction > 0 else "#F44336")
+    color.setAlpha(60 + int(195 * count / max_count))
+    return color
+
+
+class ChartSignals(QObject):
+    rendered = pyqtSignal(object, object)
+
+
+class ChartJob(QRunnable):
+    def __init__(self, key, chart_layout, title, user_id, message, width, height, dpi, signals):
+        super().__init__()
+        self.key = key
+        self.chart_layout = chart_layout
+        self.title = title
+        self.user_id = user_id
+        self.message = message
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+        self.signals = signals
+
+    def run(self):
+        try:
+            version = data_version(self.user_id) if self.user_id is not None else 0
+        except sqlite3.Error:
+            version = None
+        cache_key = self.key + (version,)
+        entry = render_cache.get(cache_key) if version is not None else None
+        if entry is None:
+            trend, message = None, self.message
+            if self.user_id is not None:
+                try:
+                    trend = cached(self.user_id, ("trend",), lambda: fetch_trend(get_connection(), self.user_id))
+                except sqlite3.Error:
+                    message = "Stress data is unavailable"
+            entry = render_chart(self.chart_layout, self.title, trend, message, self.width, self.height, self.dpi)
+            if version is not None:
+                render_cache.put(cache_key, entry)
+        self.signals.rendered.emit(self.key, entry)
+
+
+class ChartView(QLabel):
+    def __init__(self, name, chart_layout, parent=None):
+        super().__init__(parent)
+        self.name = name
+        self.chart_layout = chart_layout
+        self.request = None
+        self.key = None
+        self.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(150)
+        self.resize_timer.timeout.connect(self.refresh)
+
+    def sizeHint(self):
+        return QSize(640, 480)
+
+    def minimumSizeHint(self):
+        return QSize(320, 240)
+
+    def show_trend(self, user_id, title):
+        self.request = (user_id, title, "No data available")
+        self.key = None
+        self.refresh()
+
+    def show_message(self, title, message):
+        self.request = (None, title, message)
+        self.key = None
+        self.refresh()
+
+    def refresh(self):
+        if self.request is None or not self.isVisible():
+            return
+        user_id, title, message = self.request
+        ratio = self.devicePixelRatioF()
+        width, height = int(self.width() * ratio), int(self.height() * ratio)
+        key = (self.name, user_id, title, message, width, height)
+        if key == self.key:
+            return
+        self.key = key
+        if self.pixmap().isNull():
+            self.setText("Loading chart...")
+        signals = ChartSignals()
+        signals.rendered.connect(self.on_rendered)
+        self.pending_signals = signals
+        chart_pool().start(ChartJob(key, self.chart_layout, title, user_id, message, width, height,
+                                    100 * ratio, signals))
+
+    def on_rendered(self, key, entry):
+        if key != self.key:
+            return
+        width, height, data = entry
+        pixmap = QPixmap.fromImage(QImage(data, width, height, QImage.Format.Format_RGBA8888))
+        pixmap.setDevicePixelRatio(self.devicePixelRatioF())
+        self.setPixmap(pixmap)
+        startup.mark("first chart")
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.resize_timer.start()
+
+class FirstPaintWatcher(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint:
+            QApplication.instance().removeEventFilter(self)
+            startup.mark("first paint")
+        return False
+
+
+class SessionTableModel(QAbstractTableModel):
     def __init__(self, parent=None):
-        fig = Figure()
-        self.axes = fig.add_subplot(111)
-        super(MplCanvas, self).__init__(fig)
+        super().__init__(parent)
+        self.user_id = None
+        self.period = None
+        self.rows = []
+        self.exhausted = True
+        self.fetching = False
+        self.empty_message = ""
+        self.channel = ("sessions", id(self))
+        channel = self.channel
+        self.destroyed.connect(lambda: data_access().cancel(channel))
+
+    def load(self, user_id, period=None, empty_message=""):
+        self.beginResetModel()
+        self.user_id = user_id
+        self.period = period
+        self.empty_message = "Loading..."
+        self.rows = []
+        self.exhausted = True
+        self.fetching = True
+        self.endResetModel()
+        self.request_page(None, lambda rows: self.on_loaded(rows, empty_message))
+
+    def request_page(self, after, on_done):
+        user_id, period = self.user_id, self.period
+        data_access().submit(self.channel, lambda conn: cached(
+            user_id, ("session_page", period, after), lambda: fetch_session_page(conn, user_id, period, after)),
+            on_done=on_done, on_error=self.on_failed)
+
+    def on_failed(self, error):
+        self.fetching = False
+        self.exhausted = True
+        if not self.rows:
+            self.beginResetModel()
+            self.empty_message = "Could not load records"
+            self.endResetModel()
+        data_access().failed.emit(self.channel, error)
+
+    def on_loaded(self, rows, empty_message):
+        self.beginResetModel()
+        self.empty_message = empty_message
+        self.rows = list(rows)
+        self.exhausted = len(rows) < PAGE_SIZE
+        self.fetching = False
+        self.endResetModel()
+
+    def clear(self):
+        data_access().cancel(self.channel)
+        self.beginResetModel()
+        self.user_id = None
+        self.rows = []
+        self.exhausted = True
+        self.fetching = False
+        self.empty_message = ""
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        if not self.rows and self.empty_message:
+            return 1
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(SESSION_HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return SESSION_HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if not self.rows:
+            return self.empty_message if index.column() == 0 else None
+        value = self.rows[index.row()][index.column()]
+        if value is None:
+            return ""
+        if index.column() == 4:
+            return str(builtins.round(float(value), 1))
+        return str(value)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted and not self.fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted or self.fetching or not self.rows:
+            return
+        last = self.rows[-1]
+        self.fetching = True
+        self.request_page((last[0], last[-1]), self.on_more_loaded)
+
+    def on_more_loaded(self, page):
+        self.fetching = False
+        self.exhausted = len(page) < PAGE_SIZE
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
 
 class UserDetailsDialog(QDialog):
     def __init__(self, user_id, username, parent=None):
@@ -139,19 +271,18 @@ class UserDetailsDialog(QDialog):
         self.user_id = user_id
         self.setWindowTitle(f"User Details: {username}")
         self.layout = QVBoxLayout()
-        self.canvas = MplCanvas(self)
+        self.canvas = ChartView("details", SHARED_AXES, self)
         self.update_stress_diagram()
         self.layout.addWidget(self.canvas)
-        self.session_table = QTableWidget()
-        self.session_table.setColumnCount(6)
-        self.session_table.setHorizontalHeaderLabels(
-            ["Date", "Exercise", "Stress Before", "Stress After", "Completion %", "Notes"])
+        self.session_model = SessionTableModel(self)
+        self.session_table = QTableView()
+        self.session_table.setModel(self.session_model)
         self.layout.addWidget(self.session_table)
         self.update_session_table()
         button_layout = QHBoxLayout()
-        delete_btn = QPushButton("Delete User")
-        delete_btn.clicked.connect(self.delete_user)
-        button_layout.addWidget(delete_btn)
+        self.delete_btn = QPushButton("Delete User")
+        self.delete_btn.clicked.connect(self.delete_user)
+        button_layout.addWidget(self.delete_btn)
         export_btn = QPushButton("Export User Data")
         export_btn.clicked.connect(lambda: self.parent().export_user_data(self.user_id))
         export_btn.setStyleSheet("""
@@ -167,68 +298,139 @@ class UserDetailsDialog(QDialog):
         self.setLayout(self.layout)
 
     def update_stress_diagram(self):
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        c.execute(
-            "SELECT date, exercise_type, stress_before, stress_after, duration_percentage, notes FROM stress_levels WHERE user_id=? ORDER BY date",
-            (self.user_id,))
-        data = c.fetchall()
-        conn.close()
-        self.canvas.axes.clear()
-        if data:
-            dates = [row[0] for row in data]
-            stress_before = [row[2] for row in data]
-            stress_after = [row[3] for row in data]
-            percentages = [row[4] for row in data]
-            self.canvas.axes.plot(dates, stress_before, label="Before", marker='o', color='blue')
-            self.canvas.axes.plot(dates, stress_after, label="After", marker='o', color='green')
-            self.canvas.axes.plot(dates, percentages, label="Completion %", marker='s', linestyle='--',
-                                  color='orange')
-            self.canvas.axes.legend()
-            self.canvas.axes.set_title("User Stress Level and Completion % Trends")
-            self.canvas.axes.set_xlabel("Date")
-            self.canvas.axes.set_ylabel("Value")
-            self.canvas.axes.tick_params(axis='x', rotation=45)
-        else:
-            self.canvas.axes.text(0.5, 0.5, "No data available",
-                                  horizontalalignment='center',
-                                  verticalalignment='center',
-                                  transform=self.canvas.axes.transAxes)
-            self.canvas.axes.set_title("User Stress Level and Completion % Trends")
-        self.canvas.draw()
+        self.canvas.show_trend(self.user_id, "User Stress Level and Completion % Trends")
 
     def update_session_table(self):
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        c.execute(
-            "SELECT date, exercise_type, stress_before, stress_after, duration_percentage, notes FROM stress_levels WHERE user_id=? ORDER BY date",
-            (self.user_id,))
-        data = c.fetchall()
-        conn.close()
-        self.session_table.setRowCount(len(data))
-        if not data:
-            self.session_table.setRowCount(1)
-            self.session_table.setItem(0, 0, QTableWidgetItem("No records for this user"))
-        else:
-            for i, row in enumerate(data):
-                for j, value in enumerate(row):
-                    if j == 4 and value is not None:
-                        self.session_table.setItem(i, j, QTableWidgetItem(str(builtins.round(float(value), 1))))
-                    else:
-                        self.session_table.setItem(i, j, QTableWidgetItem(str(value) if value is not None else ""))
+        self.session_model.load(self.user_id, empty_message="No records for this user")
 
     def delete_user(self):
         reply = QMessageBox.question(self, "Confirm Delete",
                                      "Are you sure you want to delete this user? This will also delete their stress records and community posts.",
                                      QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if reply == QMessageBox.StandardButton.Yes:
-            conn = sqlite3.connect('mbsr_data.db')
-            c = conn.cursor()
-            c.execute("DELETE FROM users WHERE id=?", (self.user_id,))
-            conn.commit()
-            conn.close()
-            QMessageBox.information(self, "Success", "User deleted successfully")
-            self.accept()
+            self.delete_btn.setEnabled(False)
+            self.parent().write(("delete_user", self.user_id), core.delete_user, self.user_id,
+                                on_done=self.finish_delete, on_error=self.delete_failed)
+
+    def finish_delete(self, deleted):
+        QMessageBox.information(self, "Success", "User deleted successfully")
+        self.accept()
+
+    def delete_failed(self, error):
+        self.delete_btn.setEnabled(True)
+        self.parent().show_write_error(error)
+
+class ExportSignals(QObject):
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+
+class ExportJob(QRunnable):
+    def __init__(self, out_dir, partition, compress, cancel, signals):
+        super().__init__()
+        self.out_dir = out_dir
+        self.partition = partition
+        self.compress = compress
+        self.cancel = cancel
+        self.signals = signals
+
+    def run(self):
+        try:
+            result = export_sessions(database.DB_PATH, self.out_dir, self.partition, self.compress,
+                                     progress=self.signals.progress.emit, cancel=self.cancel)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+
+class BulkExportDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Export All Data")
+        self.cancel = None
+        layout = QFormLayout()
+        self.partition_combo = QComboBox()
+        self.partition_combo.addItem("One file per user", BY_USER)
+        self.partition_combo.addItem("One file per month", BY_MONTH)
+        layout.addRow("Split by:", self.partition_combo)
+        self.gzip_check = QCheckBox("Compress files (gzip)")
+        layout.addRow("", self.gzip_check)
+        folder_layout = QHBoxLayout()
+        self.folder_input = QLineEdit()
+        browse_btn = QPushButton("Browse...")
+        browse_btn.clicked.connect(self.choose_folder)
+        folder_layout.addWidget(self.folder_input)
+        folder_layout.addWidget(browse_btn)
+        layout.addRow("Folder:", folder_layout)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximum(1000)
+        layout.addRow("Progress:", self.progress_bar)
+        self.status_label = QLabel("")
+        layout.addRow("", self.status_label)
+        button_layout = QHBoxLayout()
+        self.start_btn = QPushButton("Start")
+        self.start_btn.clicked.connect(self.start_export)
+        self.cancel_btn = QPushButton("Close")
+        self.cancel_btn.clicked.connect(self.reject)
+        button_layout.addWidget(self.start_btn)
+        button_layout.addWidget(self.cancel_btn)
+        layout.addRow(button_layout)
+        self.setLayout(layout)
+
+    def choose_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Export Folder")
+        if folder:
+            self.folder_input.setText(folder)
+
+    def start_export(self):
+        out_dir = self.folder_input.text().strip()
+        if not out_dir:
+            QMessageBox.warning(self, "Error", "Please choose an export folder")
+            return
+        self.cancel = threading.Event()
+        self.signals = ExportSignals()
+        self.signals.progress.connect(self.show_progress)
+        self.signals.finished.connect(self.export_finished)
+        self.signals.failed.connect(self.export_failed)
+        self.start_btn.setEnabled(False)
+        self.cancel_btn.setText("Cancel")
+        self.status_label.setText("Starting export...")
+        QThreadPool.globalInstance().start(ExportJob(out_dir, self.partition_combo.currentData(),
+                                                     self.gzip_check.isChecked(), self.cancel, self.signals))
+
+    def show_progress(self, done, total):
+        self.progress_bar.setValue(int(done * 1000 / total) if total else 1000)
+        self.status_label.setText(f"Exported {done:,} of {total:,} sessions")
+
+    def export_finished(self, result):
+        self.cancel = None
+        self.start_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(True)
+        self.cancel_btn.setText("Close")
+        if result.cancelled:
+            self.status_label.setText(f"Cancelled after {result.rows:,} sessions")
+        else:
+            self.status_label.setText(f"Exported {result.rows:,} sessions into {len(result.files)} files "
+                                      f"in {result.elapsed:.1f}s")
+
+    def export_failed(self, message):
+        self.cancel = None
+        self.start_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(True)
+        self.cancel_btn.setText("Close")
+        self.status_label.setText("Export failed")
+        QMessageBox.critical(self, "Error", f"Failed to export data: {message}")
+
+    def reject(self):
+        if self.cancel is not None:
+            self.cancel.set()
+            self.cancel_btn.setEnabled(False)
+            self.status_label.setText("Cancelling...")
+            return
+        super().reject()
+
 
 class ExerciseEditDialog(QDialog):
     def __init__(self, exercise_id=None, name="", description="", min_level=1, max_level=10, parent=None):
@@ -255,136 +457,150 @@ class ExerciseEditDialog(QDialog):
         self.setLayout(layout)
 
 class LoginDialog(QDialog):
-    def __init__(self):
+    def __init__(self, data):
         super().__init__()
         self.setWindowTitle("Login")
+        self.data = data
+        self.login = None
         layout = QFormLayout()
         self.username = QLineEdit()
         self.password = QLineEdit()
         self.password.setEchoMode(QLineEdit.EchoMode.Password)
+        self.status = QLabel()
         login_btn = QPushButton("Login")
         register_btn = QPushButton("Register")
         login_btn.clicked.connect(self.handle_login)
         register_btn.clicked.connect(self.handle_register)
+        self.buttons = [login_btn, register_btn]
         layout.addRow("Username:", self.username)
         layout.addRow("Password:", self.password)
         layout.addWidget(login_btn)
         layout.addWidget(register_btn)
+        layout.addRow(self.status)
         self.setLayout(layout)
 
-    def handle_login(self):
-        if not self.username.text() or not self.password.text():
-            QMessageBox.warning(self, "Error", "Username and password cannot be empty")
-            return
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        c.execute("SELECT id FROM managers WHERE username=? AND password=?",
-                  (self.username.text(), self.password.text()))
-        manager = c.fetchone()
-        if manager:
-            self.user_id = manager[0]
-            self.is_admin = True
-            conn.close()
-            self.accept()
+    def submit(self, message, fn, on_done):
+        try:
+            core.check_credentials(self.username.text(), self.password.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "Error", str(e))
             return
-        c.execute("SELECT id FROM users WHERE username=? AND password=?",
-                  (self.username.text(), self.password.text()))
-        user = c.fetchone()
-        if user:
-            self.user_id = user[0]
-            self.is_admin = False
-            c.execute("INSERT INTO login_history (user_id, login_date) VALUES (?, ?)",
-                      (self.user_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-            conn.commit()
-            conn.close()
-            self.accept()
-        else:
+        self.set_busy(message)
+        self.data.submit("auth", lambda conn, username, password: fn(username, password),
+                         self.username.text(), self.password.text(), on_done=on_done, on_error=self.show_error)
+
+    def set_busy(self, message):
+        for button in self.buttons:
+            button.setEnabled(not message)
+        self.status.setText(message)
+
+    def handle_login(self):
+        self.submit("Signing in...", core.login, self.finish_login)
+
+    def finish_login(self, login):
+        self.set_busy("")
+        if login is None:
             QMessageBox.warning(self, "Error", "Invalid username or password")
-            conn.close()
+            return
+        self.login = login
+        self.accept()
 
     def handle_register(self):
-        if not self.username.text() or not self.password.text():
-            QMessageBox.warning(self, "Error", "Username and password cannot be empty")
-            return
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        try:
-            c.execute("INSERT INTO users (username, password) VALUES (?, ?)",
-                      (self.username.text(), self.password.text()))
-            user_id = c.lastrowid
-            rewards = [
-                ("Three Day Login", "Log in for three consecutive days"),
-                ("Three Day Exercise", "Complete exercises for three consecutive days"),
-                ("Ten Exercises Completed", "Complete 10 exercises in total"),
-                ("First Community Post", "Share your first community post"),
-                ("Stress Reduction Master", "Reduce stress level in three consecutive exercises"),
-                ("Perfect Week", "Complete at least one exercise each day for a week"),
-                ("Mindful Master", "Complete 50 Mindful Breathing exercises")
-            ]
-            for name, desc in rewards:
-                c.execute("INSERT INTO rewards (user_id, reward_name, reward_description, earned) VALUES (?, ?, ?, ?)",
-                          (user_id, name, desc, 0))
-            conn.commit()
-            QMessageBox.information(self, "Success", "Registration successful! Please login.")
-        except sqlite3.IntegrityError:
-            QMessageBox.warning(self, "Error", "Username already exists")
-        finally:
-            conn.close()
+        self.submit("Creating account...", core.register, self.finish_register)
+
+    def finish_register(self, user_id):
+        self.set_busy("")
+        QMessageBox.information(self, "Success", "Registration successful! Please login.")
+
+    def show_error(self, error):
+        self.set_busy("")
+        QMessageBox.warning(self, "Error", str(error))
+
+    def reject(self):
+        self.data.cancel("auth")
+        super().reject()
 
 class MBSRApp(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.user_id = None
-        self.is_admin = False
-        self.username = "Guest"
+        self.session = GUEST_SESSION
         self.stress_before_level = None
         self.current_exercise = None
         self.timer_count = 0
         self.nav_buttons = []
         self.setWindowTitle("StressRelief")
         self.setGeometry(100, 100, 800, 600)
+        self.data = data_access()
+        self.data.busy_changed.connect(self.show_busy)
+        self.data.failed.connect(self.show_load_error)
         self.init_ui()
 
+    @property
+    def user_id(self):
+        return self.session.user_id
+
+    @property
+    def is_admin(self):
+        return self.session.is_admin
+
+    @property
+    def username(self):
+        return self.session.username
+
+    def show_busy(self, busy):
+        if busy:
+            self.statusBar().showMessage("Loading...")
+        else:
+            self.statusBar().clearMessage()
+
+    def show_load_error(self, channel, error):
+        self.statusBar().showMessage(f"Could not load data: {error}", 5000)
+
+    def write(self, channel, fn, *args, on_done, on_error=None):
+        self.data.submit(channel, lambda conn, *args: fn(*args), *args, on_done=on_done,
+                         on_error=on_error or self.show_write_error)
+
+    def show_write_error(self, error):
+        if isinstance(error, ValueError):
+            QMessageBox.warning(self, "Error", str(error))
+        else:
+            QMessageBox.warning(self, "Error", f"Could not save changes: {error}")
+
     def init_ui(self):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
         main_layout = QVBoxLayout(central_widget)
         self.nav_layout = QHBoxLayout()
-        if self.is_admin:
-            nav_button_texts = ["Manage User", "Manage Exercise", "Manage Community", "Logout"]
-        else:
-            nav_button_texts = ["Home", "View Dashboard", "Get Reward", "Exercises List", "Community", "Login"]
-        for text in nav_button_texts:
-            button = QPushButton(text)
-            button.clicked.connect(lambda checked, b=text: self.navigate(b))
-            self.nav_layout.addWidget(button)
-            self.nav_buttons.append(button)
         main_layout.addLayout(self.nav_layout)
+        self.update_navigation_bar()
         self.page_stack = QStackedWidget()
-        self.home_page = self.create_home_page()
-        self.dashboard_page = self.create_dashboard_page()
-        self.exercise_list_page = self.create_exercise_list_page()
-        self.exercise_assessment_page = self.create_exercise_assessment_page()
-        self.exercise_recommendation_page = self.create_exercise_recommendation_page()
-        self.exercise_completion_page = self.create_exercise_completion_page()
-        self.community_page = self.create_community_page()
-        self.reward_page = self.create_reward_page()
-        self.manage_user_page = self.create_manage_user_page()
-        self.manage_exercise_page = self.create_manage_exercise_page()
-        self.manage_community_page = self.create_manage_community_page()
-        self.page_stack.addWidget(self.home_page)
-        self.page_stack.addWidget(self.dashboard_page)
-        self.page_stack.addWidget(self.exercise_list_page)
-        self.page_stack.addWidget(self.exercise_assessment_page)
-        self.page_stack.addWidget(self.exercise_recommendation_page)
-        self.page_stack.addWidget(self.exercise_completion_page)
-        self.page_stack.addWidget(self.community_page)
-        self.page_stack.addWidget(self.reward_page)
-        self.page_stack.addWidget(self.manage_user_page)
-        self.page_stack.addWidget(self.manage_exercise_page)
-        self.page_stack.addWidget(self.manage_community_page)
         main_layout.addWidget(self.page_stack)
-        self.page_stack.setCurrentWidget(self.home_page)
+        self.page_factories = {
+            "home": self.create_home_page,
+            "dashboard": self.create_dashboard_page,
+            "exercise_list": self.create_exercise_list_page,
+            "exercise_assessment": self.create_exercise_assessment_page,
+            "exercise_recommendation": self.create_exercise_recommendation_page,
+            "exercise_completion": self.create_exercise_completion_page,
+            "community": self.create_community_page,
+            "reward": self.create_reward_page,
+            "manage_user": self.create_manage_user_page,
+            "manage_exercise": self.create_manage_exercise_page,
+            "manage_community": self.create_manage_community_page,
+        }
+        self.pages = {}
+        self.show_page("home")
+
+    def get_page(self, name):
+        page = self.pages.get(name)
+        if page is None:
+            page = self.page_factories[name]()
+            self.pages[name] = page
+            self.page_stack.addWidget(page)
+        return page
+
+    def show_page(self, name):
+        self.page_stack.setCurrentWidget(self.get_page(name))
 
     def export_user_data(self, user_id=None):
         if self.is_admin and user_id is None:
@@ -394,30 +610,25 @@ class MBSRApp(QMainWindow):
             QMessageBox.warning(self, "Login Required", "Please login to export data")
             return
         user_id_to_export = user_id if self.is_admin else self.user_id
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        c.execute(
-            "SELECT date, exercise_type, stress_before, stress_after, duration_percentage, notes FROM stress_levels WHERE user_id=? ORDER BY date",
-            (user_id_to_export,))
-        data = c.fetchall()
-        conn.close()
-        if not data:
+        self.data.submit("export_check", lambda conn: cached(
+            user_id_to_export, ("stats",), lambda: user_stats(conn, user_id_to_export)).session_count,
+            on_done=lambda session_count: self.save_user_export(user_id_to_export, session_count))
+
+    def save_user_export(self, user_id_to_export, session_count):
+        if not session_count:
             QMessageBox.information(self, "No Data", "No exercise data available to export.")
             return
         file_path, _ = QFileDialog.getSaveFileName(self, "Save Data", f"exercise_data_{self.username}.csv",
                                                    "CSV Files (*.csv)")
         if file_path:
-            try:
-                with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerow(["Date", "Exercise", "Stress Before", "Stress After", "Completion %", "Notes"])
-                    for row in data:
-                        writer.writerow(
-                            [row[0], row[1], row[2], row[3], round(float(row[4]), 1) if row[4] is not None else 0.0,
-                             row[5] or ""])
-                QMessageBox.information(self, "Success", f"Data exported successfully to {file_path}")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to export data: {str(e)}")
+            self.statusBar().showMessage(f"Exporting to {file_path}...")
+            self.data.submit(("export", file_path), write_user_sessions, user_id_to_export, file_path,
+                             on_done=lambda rows: QMessageBox.information(
+                                 self, "Success", f"Data exported successfully to {file_path}"),
+                             on_error=lambda e: QMessageBox.critical(self, "Error", f"Failed to export data: {str(e)}"))
+
+    def show_bulk_export(self):
+        BulkExportDialog(self).exec()
 
     def navigate(self, page):
         if self.user_id is None and page != "Login" and page != f"Hi {self.username}":
@@ -425,33 +636,36 @@ class MBSRApp(QMainWindow):
             self.show_login_dialog()
             return
         if page == "Home":
-            self.page_stack.setCurrentWidget(self.home_page)
+            self.show_page("home")
             self.update_pressure_diagram()
+            self.update_sample_comment()
         elif page == "View Dashboard":
             if self.is_admin:
                 QMessageBox.warning(self, "Access Denied", "Managers cannot access dashboard")
                 return
-            self.page_stack.setCurrentWidget(self.dashboard_page)
-            QTimer.singleShot(100, self.update_dashboard)
+            self.show_page("dashboard")
+            self.update_dashboard()
+            self.update_calendar_activity()
         elif page == "Get Reward":
             if self.is_admin:
                 QMessageBox.warning(self, "Access Denied", "Managers cannot access rewards")
                 return
-            self.page_stack.setCurrentWidget(self.reward_page)
+            self.show_page("reward")
             self.update_reward_page()
         elif page == "Exercises List":
-            self.page_stack.setCurrentWidget(self.exercise_list_page)
+            self.show_page("exercise_list")
+            self.update_exercise_list()
         elif page == "Community":
-            self.page_stack.setCurrentWidget(self.community_page)
-            self.update_posts()
+            self.show_page("community")
+            self.load_newer_posts()
         elif page == "Manage User":
-            self.page_stack.setCurrentWidget(self.manage_user_page)
+            self.show_page("manage_user")
             self.update_manage_user()
         elif page == "Manage Exercise":
-            self.page_stack.setCurrentWidget(self.manage_exercise_page)
+            self.show_page("manage_exercise")
             self.update_manage_exercise()
         elif page == "Manage Community":
-            self.page_stack.setCurrentWidget(self.manage_community_page)
+            self.show_page("manage_community")
             self.update_manage_community()
         elif page == "Logout" or page == "Login" or page == f"Hi {self.username}":
             if self.user_id is None and not self.is_admin:
@@ -462,7 +676,7 @@ class MBSRApp(QMainWindow):
     def create_home_page(self):
         page = QWidget()
         layout = QVBoxLayout()
-        self.canvas = MplCanvas(self)
+        self.canvas = ChartView("home", TWIN_AXES, self)
         self.update_pressure_diagram()
         layout.addWidget(self.canvas)
         lets_go_btn = QPushButton("Let's Go!")
@@ -480,12 +694,13 @@ class MBSRApp(QMainWindow):
         quote_label.setStyleSheet("border: 1px solid gray; padding: 1px; color: #222;")
         quote_label.setWordWrap(True)
         layout.addWidget(quote_label)
-        comment_label = QLabel(self.get_sample_comment())
-        comment_label.setStyleSheet("border: 1px solid gray; padding: 1px; color: #222;  cursor: pointer;")
-        comment_label.setWordWrap(True)
-        comment_label.mousePressEvent = lambda event: self.navigate("Community")
-        layout.addWidget(comment_label)
+        self.comment_label = QLabel("Loading community highlights...")
+        self.comment_label.setStyleSheet("border: 1px solid gray; padding: 1px; color: #222;  cursor: pointer;")
+        self.comment_label.setWordWrap(True)
+        self.comment_label.mousePressEvent = lambda event: self.navigate("Community")
+        layout.addWidget(self.comment_label)
         page.setLayout(layout)
+        self.update_sample_comment()
         return page
 
     def start_exercise(self):
@@ -495,9 +710,9 @@ class MBSRApp(QMainWindow):
         if self.user_id is None:
             QMessageBox.warning(self, "Login Required", "Please login to access exercises")
             if not self.show_login_dialog():
-                self.page_stack.setCurrentWidget(self.home_page)
+                self.show_page("home")
                 return
-        self.page_stack.setCurrentWidget(self.exercise_assessment_page)
+        self.show_page("exercise_assessment")
 
     def create_dashboard_page(self):
         page = QWidget()
@@ -507,7 +722,15 @@ class MBSRApp(QMainWindow):
         self.calendar.setMaximumDate(QDate.currentDate())
         self.calendar.setLocale(QLocale(QLocale.Language.English, QLocale.Country.UnitedStates))
         self.calendar.selectionChanged.connect(self.update_dashboard_by_date)
+        self.calendar.currentPageChanged.connect(lambda year, month: self.update_calendar_activity())
+        self.calendar_activity = (None, None, {})
         calendar_layout.addWidget(self.calendar)
+        self.span_combo = QComboBox()
+        self.span_combo.addItem("Day", DAY)
+        self.span_combo.addItem("Week", WEEK)
+        self.span_combo.addItem("Month", MONTH)
+        self.span_combo.currentIndexChanged.connect(self.update_dashboard_by_date)
+        calendar_layout.addWidget(self.span_combo)
         reset_btn = QPushButton("Show All Records")
         reset_btn.clicked.connect(lambda: self.update_dashboard(selected_date=None))
         calendar_layout.addWidget(reset_btn)
@@ -527,15 +750,13 @@ class MBSRApp(QMainWindow):
         layout.addWidget(self.date_label)
         self.progress_label = QLabel("Completed Exercises: 0")
         layout.addWidget(self.progress_label)
-        self.canvas_dashboard = MplCanvas(self)
+        self.canvas_dashboard = ChartView("dashboard", TWIN_AXES, self)
         layout.addWidget(self.canvas_dashboard)
-        self.session_table = QTableWidget()
-        self.session_table.setColumnCount(6)
-        self.session_table.setHorizontalHeaderLabels(
-            ["Date", "Exercise", "Stress Before", "Stress After", "Completion %", "Notes"])
+        self.session_model = SessionTableModel(self)
+        self.session_table = QTableView()
+        self.session_table.setModel(self.session_model)
         layout.addWidget(self.session_table)
         page.setLayout(layout)
-        self.update_dashboard()
         return page
 
     def create_exercise_list_page(self):
@@ -547,11 +768,22 @@ class MBSRApp(QMainWindow):
         content_layout = QVBoxLayout(content_widget)
         content_layout.setContentsMargins(10, 10, 10, 10)
         content_layout.setSpacing(15)
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        c.execute("SELECT name, description FROM exercises")
-        exercises = c.fetchall()
-        conn.close()
+        self.exercise_list_layout = content_layout
+        content_layout.addWidget(QLabel("Loading exercises..."))
+        content_layout.addStretch()
+        scroll_area.setWidget(content_widget)
+        scroll_area.setStyleSheet("border: none; background-color: #000;")
+        layout.addWidget(scroll_area)
+        page.setLayout(layout)
+        return page
+
+    def update_exercise_list(self):
+        self.data.submit("exercise_list", core.list_exercises, on_done=self.show_exercise_list)
+
+    def show_exercise_list(self, exercises):
+        content_layout = self.exercise_list_layout
+        while content_layout.count() > 1:
+            content_layout.takeAt(0).widget().deleteLater()
         for exercise in exercises:
             exercise_frame = QFrame()
             exercise_frame.setStyleSheet("""
@@ -562,28 +794,22 @@ class MBSRApp(QMainWindow):
                 margin: 5px;
             """)
             exercise_layout = QVBoxLayout()
-            exercise_label = QLabel(f"Exercise: {exercise[0]}")
+            exercise_label = QLabel(f"Exercise: {exercise.name}")
             exercise_label.setStyleSheet("font-size: 14px; color: #E0E0E0; font-weight: bold;")
             exercise_label.setWordWrap(True)
             exercise_label.setMinimumWidth(300)
             exercise_layout.addWidget(exercise_label)
-            desc_label = QLabel(f"Description: {exercise[1]}")
+            desc_label = QLabel(f"Description: {exercise.description}")
             desc_label.setStyleSheet("font-size: 12px; color: #B0B0B0;")
             desc_label.setWordWrap(True)
             desc_label.setMinimumWidth(300)
             exercise_layout.addWidget(desc_label)
             exercise_frame.setLayout(exercise_layout)
-            content_layout.addWidget(exercise_frame)
+            content_layout.insertWidget(content_layout.count() - 1, exercise_frame)
             separator = QFrame()
             separator.setFrameShape(QFrame.Shape.HLine)
             separator.setStyleSheet("color: #444;")
-            content_layout.addWidget(separator)
-        content_layout.addStretch()
-        scroll_area.setWidget(content_widget)
-        scroll_area.setStyleSheet("border: none; background-color: #000;")
-        layout.addWidget(scroll_area)
-        page.setLayout(layout)
-        return page
+            content_layout.insertWidget(content_layout.count() - 1, separator)
 
     def create_exercise_assessment_page(self):
         page = QWidget()
@@ -659,8 +885,6 @@ class MBSRApp(QMainWindow):
         self.finish_btn = finish_btn
         self.end_early_btn = end_early_btn
         page.setLayout(layout)
-        if self.stress_before_level:
-            self.recommend_exercise()
         return page
 
     def create_exercise_completion_page(self):
@@ -675,9 +899,9 @@ class MBSRApp(QMainWindow):
         self.notes_input = QTextEdit()
         layout.addWidget(notes_label)
         layout.addWidget(self.notes_input)
-        submit_btn = QPushButton("Submit")
-        submit_btn.clicked.connect(self.submit_exercise)
-        layout.addWidget(submit_btn)
+        self.submit_btn = QPushButton("Submit")
+        self.submit_btn.clicked.connect(self.submit_exercise)
+        layout.addWidget(self.submit_btn)
         page.setLayout(layout)
         return page
 
@@ -690,67 +914,44 @@ class MBSRApp(QMainWindow):
         layout.addWidget(title_label)
         grid_layout = QGridLayout()
         self.reward_widgets = []
-        rewards = [
-            ("Three Day Login", "Log in for three consecutive days"),
-            ("Three Day Exercise", "Complete exercises for three consecutive days"),
-            ("Ten Exercises Completed", "Complete 10 exercises in total"),
-            ("First Community Post", "Share your first community post"),
-            ("Stress Reduction Master", "Reduce stress level in three consecutive exercises"),
-            ("Perfect Week", "Complete at least one exercise each day for a week"),
-            ("Mindful Master", "Complete 50 Mindful Breathing exercises")
-        ]
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        for i, (reward_name, reward_description) in enumerate(rewards):
-            c.execute("SELECT earned, earn_date FROM rewards WHERE user_id=? AND reward_name=?",
-                      (self.user_id, reward_name))
-            result = c.fetchone()
-            earned = result[0] if result else 0
-            earn_date = result[1] if result and result[1] else "Not earned yet"
+        for i, rule in enumerate(REWARDS):
             reward_widget = QWidget()
             reward_layout = QVBoxLayout()
-            icon_label = QLabel("🏅" if earned else "🔘")
+            icon_label = QLabel()
             icon_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            icon_label.setStyleSheet(f"font-size: 30px; color: {'green' if earned else 'gray'};")
             reward_layout.addWidget(icon_label)
-            name_label = QLabel(reward_name)
+            name_label = QLabel(rule.name)
             name_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            name_label.setStyleSheet(f"font-weight: bold; color: {'black' if earned else 'gray'};")
             reward_layout.addWidget(name_label)
-            desc_label = QLabel(reward_description)
+            desc_label = QLabel(rule.description)
             desc_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
             desc_label.setWordWrap(True)
-            desc_label.setStyleSheet(f"color: {'black' if earned else 'gray'};")
             reward_layout.addWidget(desc_label)
-            date_label = QLabel(f"Earned: {earn_date}")
+            date_label = QLabel()
             date_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            date_label.setStyleSheet(f"color: {'black' if earned else 'gray'};")
             reward_layout.addWidget(date_label)
             reward_widget.setLayout(reward_layout)
-            reward_widget.setStyleSheet(f"border: 1px solid {'green' if earned else 'gray'}; padding: 10px;")
             grid_layout.addWidget(reward_widget, i // 2, i % 2)
-            self.reward_widgets.append((reward_widget, reward_name))
-        conn.close()
+            self.reward_widgets.append((reward_widget, rule.name))
+        self.show_rewards({})
         layout.addLayout(grid_layout)
         layout.addStretch()
         page.setLayout(layout)
         return page
 
     def update_reward_page(self):
+        if "reward" not in self.pages:
+            return
         if self.user_id is None or self.is_admin:
-            for widget, _ in self.reward_widgets:
-                widget.setStyleSheet("border: 1px solid gray; padding: 10px;")
-                for child in widget.findChildren(QLabel):
-                    child.setStyleSheet("color: gray;")
+            self.data.cancel("rewards")
+            self.show_rewards({})
             return
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
+        self.data.submit("rewards", user_rewards, self.user_id, on_done=self.show_rewards)
+
+    def show_rewards(self, earned_rewards):
         for widget, reward_name in self.reward_widgets:
-            c.execute("SELECT earned, earn_date FROM rewards WHERE user_id=? AND reward_name=?",
-                      (self.user_id, reward_name))
-            result = c.fetchone()
-            earned = result[0] if result else 0
-            earn_date = result[1] if result and result[1] else "Not earned yet"
+            earned, earn_date = earned_rewards.get(reward_name, (0, None))
+            earn_date = earn_date or "Not earned yet"
             widget.setStyleSheet(f"border: 1px solid {'green' if earned else 'gray'}; padding: 10px;")
             labels = widget.findChildren(QLabel)
             labels[0].setText("🏅" if earned else "🔘")
@@ -759,87 +960,13 @@ class MBSRApp(QMainWindow):
             labels[2].setStyleSheet(f"color: {'white' if earned else 'gray'};")
             labels[3].setText(f"Earned: {earn_date}")
             labels[3].setStyleSheet(f"color: {'white' if earned else 'gray'};")
-        conn.close()
 
-    def check_and_award_rewards(self):
-        if self.user_id is None or self.is_admin:
-            return
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        today = datetime.now().date()
-        past_three_days = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(3)]
-        c.execute("SELECT DISTINCT login_date FROM login_history WHERE user_id=? AND " + " OR ".join(["login_date LIKE ?" for _ in past_three_days]),
-                  (self.user_id, *[f"{day}%" for day in past_three_days]))
-        login_dates = [row[0].split()[0] for row in c.fetchall() if row]
-        if all(day in login_dates for day in past_three_days):
-            c.execute("SELECT earned FROM rewards WHERE user_id=? AND reward_name='Three Day Login'", (self.user_id,))
-            earned = c.fetchone()
-            if earned and earned[0] == 0:
-                c.execute("UPDATE rewards SET earned=1, earn_date=? WHERE user_id=? AND reward_name=?",
-                          (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), self.user_id, "Three Day Login"))
-                QMessageBox.information(self, "Reward Earned!", "Congratulations! You've earned the 'Three Day Login' medal for logging in three consecutive days!")
-        c.execute("SELECT DISTINCT date FROM stress_levels WHERE user_id=? AND " + " OR ".join(["date LIKE ?" for _ in past_three_days]),
-                  (self.user_id, *[f"{day}%" for day in past_three_days]))
-        exercise_dates = [row[0].split()[0] for row in c.fetchall() if row]
-        if all(day in exercise_dates for day in past_three_days):
-            c.execute("SELECT earned FROM rewards WHERE user_id=? AND reward_name='Three Day Exercise'", (self.user_id,))
-            earned = c.fetchone()
-            if earned and earned[0] == 0:
-                c.execute("UPDATE rewards SET earned=1, earn_date=? WHERE user_id=? AND reward_name=?",
-                          (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), self.user_id, "Three Day Exercise"))
-                QMessageBox.information(self, "Reward Earned!", "Congratulations! You've earned the 'Three Day Exercise' medal for completing exercises three consecutive days!")
-        c.execute("SELECT COUNT(*) FROM stress_levels WHERE user_id=?", (self.user_id,))
-        exercise_count = c.fetchone()
-        if exercise_count and exercise_count[0] >= 10:
-            c.execute("SELECT earned FROM rewards WHERE user_id=? AND reward_name='Ten Exercises Completed'", (self.user_id,))
-            earned = c.fetchone()
-            if earned and earned[0] == 0:
-                c.execute("UPDATE rewards SET earned=1, earn_date=? WHERE user_id=? AND reward_name=?",
-                          (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), self.user_id, "Ten Exercises Completed"))
-                QMessageBox.information(self, "Reward Earned!", "Congratulations! You've earned the 'Ten Exercises Completed' medal for completing 10 exercises!")
-        c.execute("SELECT COUNT(*) FROM community_posts WHERE user_id=?", (self.user_id,))
-        post_count = c.fetchone()
-        if post_count and post_count[0] >= 1:
-            c.execute("SELECT earned FROM rewards WHERE user_id=? AND reward_name='First Community Post'", (self.user_id,))
-            earned = c.fetchone()
-            if earned and earned[0] == 0:
-                c.execute("UPDATE rewards SET earned=1, earn_date=? WHERE user_id=? AND reward_name=?",
-                          (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), self.user_id, "First Community Post"))
-                QMessageBox.information(self, "Reward Earned!", "Congratulations! You've earned the 'First Community Post' medal for sharing your first post!")
-        c.execute("SELECT stress_before, stress_after FROM stress_levels WHERE user_id=? ORDER BY date DESC LIMIT 3",
-                  (self.user_id,))
-        recent_sessions = c.fetchall()
-        if recent_sessions and len(recent_sessions) >= 3 and all(session[1] < session[0] for session in recent_sessions if session):
-            c.execute("SELECT earned FROM rewards WHERE user_id=? AND reward_name='Stress Reduction Master'", (self.user_id,))
-            earned = c.fetchone()
-            if earned and earned[0] == 0:
-                c.execute("UPDATE rewards SET earned=1, earn_date=? WHERE user_id=? AND reward_name=?",
-                          (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), self.user_id, "Stress Reduction Master"))
-                QMessageBox.information(self, "Reward Earned!", "Congratulations! You've earned the 'Stress Reduction Master' medal for reducing stress in three consecutive exercises!")
-        past_seven_days = [(today - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(7)]
-        c.execute("SELECT DISTINCT date FROM stress_levels WHERE user_id=? AND " + " OR ".join(["date LIKE ?" for _ in past_seven_days]),
-                  (self.user_id, *[f"{day}%" for day in past_seven_days]))
-        week_exercise_dates = [row[0].split()[0] for row in c.fetchall() if row]
-        if all(day in week_exercise_dates for day in past_seven_days):
-            c.execute("SELECT earned FROM rewards WHERE user_id=? AND reward_name='Perfect Week'", (self.user_id,))
-            earned = c.fetchone()
-            if earned and earned[0] == 0:
-                c.execute("UPDATE rewards SET earned=1, earn_date=? WHERE user_id=? AND reward_name=?",
-                          (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), self.user_id, "Perfect Week"))
-                QMessageBox.information(self, "Reward Earned!", "Congratulations! You've earned the 'Perfect Week' medal for exercising every day for a week!")
-        c.execute("SELECT COUNT(*) FROM stress_levels WHERE user_id=? AND exercise_type IN ('Mindful Breathing 1', 'Mindful Breathing 2')",
-                  (self.user_id,))
-        mindful_count = c.fetchone()
-        if mindful_count and mindful_count[0] >= 50:
-            c.execute("SELECT earned FROM rewards WHERE user_id=? AND reward_name='Mindful Master'", (self.user_id,))
-            earned = c.fetchone()
-            if earned and earned[0] == 0:
-                c.execute("UPDATE rewards SET earned=1, earn_date=? WHERE user_id=? AND reward_name=?",
-                          (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), self.user_id, "Mindful Master"))
-                QMessageBox.information(self, "Reward Earned!", "Congratulations! You've earned the 'Mindful Master' medal for completing 50 Mindful Breathing exercises!")
-        conn.commit()
-        conn.close()
-        self.update_reward_page()
+    def announce_rewards(self, earned):
+        for rule in earned:
+            QMessageBox.information(self, "Reward Earned!",
+                                    f"Congratulations! You've earned the '{rule.name}' medal {rule.message}!")
+        if earned:
+            self.update_reward_page()
 
     def create_manage_user_page(self):
         page = QWidget()
@@ -852,8 +979,10 @@ class MBSRApp(QMainWindow):
         self.user_table.setColumnWidth(0, 300)
         self.user_table.setColumnWidth(1, 200)
         layout.addWidget(self.user_table)
+        export_all_btn = QPushButton("Export All Data")
+        export_all_btn.clicked.connect(self.show_bulk_export)
+        layout.addWidget(export_all_btn)
         page.setLayout(layout)
-        self.update_manage_user()
         return page
 
     def create_manage_exercise_page(self):
@@ -868,7 +997,6 @@ class MBSRApp(QMainWindow):
         self.exercise_table.cellClicked.connect(self.edit_exercise)
         layout.addWidget(self.exercise_table)
         page.setLayout(layout)
-        self.update_manage_exercise()
         return page
 
     def create_manage_community_page(self):
@@ -878,31 +1006,28 @@ class MBSRApp(QMainWindow):
         self.community_list.itemDoubleClicked.connect(self.delete_post)
         layout.addWidget(self.community_list)
         page.setLayout(layout)
-        self.update_manage_community()
         return page
 
     def update_manage_user(self):
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        c.execute("SELECT id, username FROM users")
-        users = c.fetchall()
+        self.user_table.setEnabled(False)
+        self.data.submit("manage_user", all_user_stats, on_done=self.show_manage_user)
+
+    def show_manage_user(self, users):
         self.user_table.setRowCount(len(users))
-        for i, (user_id, username) in enumerate(users):
-            c.execute("SELECT AVG(duration_percentage) FROM stress_levels WHERE user_id=?", (user_id,))
-            avg_completion = c.fetchone()
-            self.user_table.setItem(i, 0, QTableWidgetItem(username))
-            self.user_table.setItem(i, 1, QTableWidgetItem(str(builtins.round(float(avg_completion[0]), 1)) if avg_completion and avg_completion[0] is not None else "0.0"))
-            self.user_table.setProperty("user_id", user_id)
-        conn.close()
+        for i, (user_id, username, stats) in enumerate(users):
+            avg_completion = stats.average_completion
+            item = QTableWidgetItem(username)
+            item.setData(Qt.ItemDataRole.UserRole, user_id)
+            self.user_table.setItem(i, 0, item)
+            self.user_table.setItem(i, 1, QTableWidgetItem(str(builtins.round(float(avg_completion), 1)) if avg_completion is not None else "0.0"))
+        self.user_table.setEnabled(True)
 
     def show_user_details(self, row, column):
-        username = self.user_table.item(row, 0).text()
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        c.execute("SELECT id FROM users WHERE username=?", (username,))
-        user_id = c.fetchone()
-        user_id = user_id[0]
-        conn.close()
+        item = self.user_table.item(row, 0)
+        if item is None:
+            return
+        username = item.text()
+        user_id = item.data(Qt.ItemDataRole.UserRole)
         dialog = UserDetailsDialog(user_id, username, self)
         dialog.exec()
         self.update_manage_user()
@@ -912,86 +1037,60 @@ class MBSRApp(QMainWindow):
         if dialog.exec():
             name = dialog.name_input.text().strip()
             description = dialog.description_input.toPlainText().strip()
-            min_level = dialog.min_level_input.value()
-            max_level = dialog.max_level_input.value()
-            if not name or not description:
-                QMessageBox.warning(self, "Error", "Name and description cannot be empty")
-                return
-            if min_level > max_level:
-                QMessageBox.warning(self, "Error", "Min stress level cannot be greater than max stress level")
-                return
-            conn = sqlite3.connect('mbsr_data.db')
-            c = conn.cursor()
-            c.execute(
-                "INSERT INTO exercises (name, description, stress_level_min, stress_level_max) VALUES (?, ?, ?, ?)",
-                (name, description, min_level, max_level))
-            conn.commit()
-            conn.close()
-            self.update_manage_exercise()
-            QMessageBox.information(self, "Success", "Exercise added successfully")
+            self.write("save_exercise", core.add_exercise, name, description, dialog.min_level_input.value(),
+                       dialog.max_level_input.value(),
+                       on_done=lambda exercise_id: self.exercise_saved("Exercise added successfully"))
+
+    def exercise_saved(self, message):
+        self.update_manage_exercise()
+        QMessageBox.information(self, "Success", message)
 
     def edit_exercise(self, row, column):
         name = self.exercise_table.item(row, 0).text()
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        c.execute("SELECT id, name, description, stress_level_min, stress_level_max FROM exercises WHERE name=?",
-                  (name,))
-        exercise = c.fetchone()
-        conn.close()
+        self.data.submit("edit_exercise", core.find_exercise, name, on_done=self.show_exercise_editor)
+
+    def show_exercise_editor(self, exercise):
         if exercise:
-            dialog = ExerciseEditDialog(exercise[0], exercise[1], exercise[2], exercise[3], exercise[4])
+            dialog = ExerciseEditDialog(*exercise)
             if dialog.exec():
                 new_name = dialog.name_input.text().strip()
                 description = dialog.description_input.toPlainText().strip()
-                min_level = dialog.min_level_input.value()
-                max_level = dialog.max_level_input.value()
-                if not new_name or not description:
-                    QMessageBox.warning(self, "Error", "Name and description cannot be empty")
-                    return
-                if min_level > max_level:
-                    QMessageBox.warning(self, "Error", "Min stress level cannot be greater than max stress level")
-                    return
-                conn = sqlite3.connect('mbsr_data.db')
-                c = conn.cursor()
-                c.execute(
-                    "UPDATE exercises SET name=?, description=?, stress_level_min=?, stress_level_max=? WHERE id=?",
-                    (new_name, description, min_level, max_level, exercise[0]))
-                conn.commit()
-                conn.close()
-                self.update_manage_exercise()
-                QMessageBox.information(self, "Success", "Exercise updated successfully")
+                self.write("save_exercise", core.update_exercise, exercise.id, new_name, description,
+                           dialog.min_level_input.value(), dialog.max_level_input.value(),
+                           on_done=lambda updated: self.exercise_saved("Exercise updated successfully"))
             else:
                 reply = QMessageBox.question(self, "Confirm Delete", "Do you want to delete this exercise?",
                                              QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
                 if reply == QMessageBox.StandardButton.Yes:
-                    conn = sqlite3.connect('mbsr_data.db')
-                    c = conn.cursor()
-                    c.execute("DELETE FROM exercises WHERE id=?", (exercise[0],))
-                    conn.commit()
-                    conn.close()
-                    self.update_manage_exercise()
-                    QMessageBox.information(self, "Success", "Exercise deleted successfully")
+                    self.write("save_exercise", core.delete_exercise, exercise.id,
+                               on_done=lambda deleted: self.exercise_saved("Exercise deleted successfully"))
 
     def update_manage_exercise(self):
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        c.execute("SELECT name, description, stress_level_min, stress_level_max FROM exercises")
-        exercises = c.fetchall()
-        conn.close()
+        self.exercise_table.setEnabled(False)
+        self.data.submit("manage_exercise", lambda conn: conn.execute(
+            "SELECT name, description, stress_level_min, stress_level_max FROM exercises").fetchall(),
+            on_done=self.show_manage_exercise)
+
+    def show_manage_exercise(self, exercises):
+        self.exercise_table.setEnabled(True)
         self.exercise_table.setRowCount(len(exercises))
         for i, exercise in enumerate(exercises):
             for j, value in enumerate(exercise):
                 self.exercise_table.setItem(i, j, QTableWidgetItem(str(value)))
 
     def update_manage_community(self):
+        self.community_list.setEnabled(False)
+        self.data.submit("manage_community", lambda conn: (
+            conn.execute("SELECT id, content, date FROM community_posts ORDER BY date DESC").fetchall(),
+            fetch_latest_comments(conn)), on_done=self.show_manage_community)
+
+    def show_manage_community(self, result):
+        posts, latest_comments = result
         self.community_list.clear()
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        c.execute("SELECT id, content, date, comments FROM community_posts ORDER BY date DESC")
-        posts = c.fetchall()
-        conn.close()
+        self.community_list.setEnabled(True)
         for post in posts:
-            display_text = f"Post ({post[2]}):\n{post[1]}\nComments:\n{post[3] or 'No comments yet'}"
+            comments = format_comments(list(reversed(latest_comments.get(post[0], []))))
+            display_text = f"Post ({post[2]}):\n{post[1]}\nComments:\n{comments}"
             item = QListWidgetItem(display_text)
             item.setData(Qt.ItemDataRole.UserRole, post[0])
             self.community_list.addItem(item)
@@ -1001,13 +1100,14 @@ class MBSRApp(QMainWindow):
         reply = QMessageBox.question(self, "Confirm Delete", "Are you sure you want to delete this post?",
                                      QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if reply == QMessageBox.StandardButton.Yes:
-            conn = sqlite3.connect('mbsr_data.db')
-            c = conn.cursor()
-            c.execute("DELETE FROM community_posts WHERE id=?", (post_id,))
-            conn.commit()
-            conn.close()
-            self.update_manage_community()
-            QMessageBox.information(self, "Success", "Post deleted successfully")
+            self.write(("delete_post", post_id), core.delete_post, post_id,
+                       on_done=lambda deleted: self.finish_delete_post(post_id))
+
+    def finish_delete_post(self, post_id):
+        if "community" in self.pages:
+            self.remove_post_frame(post_id)
+        self.update_manage_community()
+        QMessageBox.information(self, "Success", "Post deleted successfully")
 
     def assess_stress(self):
         if self.is_admin:
@@ -1016,11 +1116,11 @@ class MBSRApp(QMainWindow):
         if self.user_id is None:
             QMessageBox.warning(self, "Login Required", "Please login to access exercises")
             if not self.show_login_dialog():
-                self.page_stack.setCurrentWidget(self.home_page)
+                self.show_page("home")
                 return
         self.stress_before_level = int(self.stress_before_combo.currentText())
         QMessageBox.information(self, "Success", f"Stress level {self.stress_before_level} recorded")
-        self.page_stack.setCurrentWidget(self.exercise_recommendation_page)
+        self.show_page("exercise_recommendation")
         self.recommend_exercise()
 
     def recommend_exercise(self):
@@ -1030,7 +1130,7 @@ class MBSRApp(QMainWindow):
         if self.user_id is None:
             QMessageBox.warning(self, "Login Required", "Please login to access exercises")
             if not self.show_login_dialog():
-                self.page_stack.setCurrentWidget(self.home_page)
+                self.show_page("home")
                 return
         if self.stress_before_level is None:
             self.recommendation_label.setText(
@@ -1042,28 +1142,24 @@ class MBSRApp(QMainWindow):
             self.timer_label.hide()
             self.timer_progress.hide()
             return
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        c.execute("SELECT name, description FROM exercises WHERE ? BETWEEN stress_level_min AND stress_level_max",
-                  (self.stress_before_level,))
-        exercises = c.fetchall()
-        if not exercises:
-            c.execute(
-                "SELECT name, description FROM exercises WHERE stress_level_min <= 3 AND stress_level_max >= 3")
-            exercises = c.fetchall()
-        conn.close()
-        if exercises:
-            selected_exercise = random.choice(exercises)
-            self.current_exercise = selected_exercise[0]
+        self.recommendation_label.setText("Finding an exercise for you...")
+        self.data.submit("recommendation", lambda conn, user_id, level: core.recommend_for_user(user_id, level),
+                         self.user_id, self.stress_before_level, on_done=self.show_recommendation,
+                         on_error=lambda e: self.recommendation_label.setText(
+                             "Could not load a recommendation. Please try again."))
+
+    def show_recommendation(self, selected_exercise):
+        if selected_exercise:
+            self.current_exercise = selected_exercise.name
             self.recommendation_label.setText(
-                f"Recommended Exercise: {selected_exercise[0]}\nDescription: {selected_exercise[1]}")
+                f"Recommended Exercise: {selected_exercise.name}\nDescription: {selected_exercise.description}")
             self.recommendation_label.setWordWrap(True)
-            self.exercise_content.setText(selected_exercise[1])
+            self.exercise_content.setText(selected_exercise.description)
             self.exercise_content.setLineWrapMode(QTextEdit.LineWrapMode.WidgetWidth)
             self.exercise_content.show()
             self.finish_btn.show()
             self.end_early_btn.show()
-            duration_seconds = self.get_exercise_duration(self.current_exercise)
+            duration_seconds = core.exercise_duration(self.current_exercise)
             self.timer_count = duration_seconds
             self.timer_progress.setMaximum(duration_seconds)
             self.timer_progress.setValue(0)
@@ -1082,17 +1178,6 @@ class MBSRApp(QMainWindow):
             self.timer_label.hide()
             self.timer_progress.hide()
 
-    def get_exercise_duration(self, exercise_name):
-        durations = {
-            "Mindful Breathing 1": 5 * 60,
-            "Mindful Breathing 2": 10 * 60,
-            "Body Scan": 15 * 60,
-            "Walking Meditation": 10 * 60,
-            "Loving-Kindness Meditation": 12 * 60,
-            "Gentle Stretching": 12 * 60
-        }
-        return durations.get(exercise_name, 5 * 60)
-
     def update_timer(self):
         self.timer_count -= 1
         minutes = self.timer_count // 60
@@ -1107,13 +1192,11 @@ class MBSRApp(QMainWindow):
     def end_exercise(self, complete=True):
         if hasattr(self, 'timer') and self.timer.isActive():
             self.timer.stop()
-        duration_seconds = self.get_exercise_duration(self.current_exercise)
-        duration_percentage = min((duration_seconds - self.timer_count) / duration_seconds * 100,
-                                  100.0) if self.timer_count > 0 else 0.0
+        duration_percentage = core.completion_percentage(self.current_exercise, self.timer_count)
         if not complete:
             QMessageBox.information(self, "Exercise Ended",
                                     f"Exercise ended early. Completion: {duration_percentage:.1f}%")
-        self.page_stack.setCurrentWidget(self.exercise_completion_page)
+        self.show_page("exercise_completion")
 
     def submit_exercise(self):
         if self.is_admin:
@@ -1122,34 +1205,32 @@ class MBSRApp(QMainWindow):
         if self.user_id is None:
             QMessageBox.warning(self, "Login Required", "Please login to submit")
             if not self.show_login_dialog():
-                self.page_stack.setCurrentWidget(self.home_page)
+                self.show_page("home")
                 return
         if self.current_exercise is None:
             QMessageBox.warning(self, "Error", "No exercise selected. Please start a new exercise.")
-            self.page_stack.setCurrentWidget(self.exercise_assessment_page)
+            self.show_page("exercise_assessment")
             return
-        duration_seconds = self.get_exercise_duration(self.current_exercise)
-        duration_percentage = min((duration_seconds - self.timer_count) / duration_seconds * 100,
-                                  100.0) if self.timer_count > 0 else 0.0
-        stress_after = int(self.stress_after_combo.currentText())
-        with get_db_connection() as conn:
-            c = conn.cursor()
-            c.execute(
-                "INSERT INTO stress_levels (user_id, date, stress_before, stress_after, exercise_type, notes, duration_percentage) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (self.user_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                 self.stress_before_level,
-                 stress_after,
-                 self.current_exercise,
-                 self.notes_input.toPlainText(),
-                 duration_percentage))
-            conn.commit()
+        duration_percentage = core.completion_percentage(self.current_exercise, self.timer_count)
+        self.submit_btn.setEnabled(False)
+        self.write("record_session", core.record_session, self.user_id, self.current_exercise,
+                   self.stress_before_level, int(self.stress_after_combo.currentText()), duration_percentage,
+                   self.notes_input.toPlainText(),
+                   on_done=lambda earned: self.finish_exercise(earned, duration_percentage),
+                   on_error=self.submit_failed)
+
+    def submit_failed(self, error):
+        self.submit_btn.setEnabled(True)
+        self.show_write_error(error)
+
+    def finish_exercise(self, earned, duration_percentage):
+        self.submit_btn.setEnabled(True)
         QMessageBox.information(self, "Success",
                                 f"Exercise completed and data saved! Completion: {duration_percentage:.1f}%")
         self.notes_input.clear()
-        self.check_and_award_rewards()
-        QTimer.singleShot(100, self.update_dashboard)
-        QTimer.singleShot(200, self.update_pressure_diagram)
-        self.page_stack.setCurrentWidget(self.home_page)
+        self.announce_rewards(earned)
+        self.show_page("home")
+        self.update_pressure_diagram()
         self.stress_before_level = None
         self.current_exercise = None
         self.timer_count = 0
@@ -1173,8 +1254,8 @@ class MBSRApp(QMainWindow):
             color: #A9A9A9;
         """)
         layout.addWidget(self.post_input, stretch=1)
-        post_btn = QPushButton("Post")
-        post_btn.setStyleSheet("""
+        self.post_btn = QPushButton("Post")
+        self.post_btn.setStyleSheet("""
             font-size: 14px;
             padding: 8px;
             background-color: #4CAF50;
@@ -1182,18 +1263,27 @@ class MBSRApp(QMainWindow):
             border: none;
             border-radius: 5px;
         """)
-        post_btn.clicked.connect(self.share_post)
-        layout.addWidget(post_btn)
+        self.post_btn.clicked.connect(self.share_post)
+        layout.addWidget(self.post_btn)
         scroll_area = QScrollArea()
         scroll_area.setWidgetResizable(True)
         self.posts_container = QWidget()
         self.posts_layout = QVBoxLayout(self.posts_container)
         self.posts_layout.setSpacing(15)
+        self.posts_status = QLabel()
+        self.posts_status.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.posts_layout.addWidget(self.posts_status)
         self.posts_layout.addStretch()
         scroll_area.setWidget(self.posts_container)
         scroll_area.setStyleSheet("border: none; ")
+        scroll_area.verticalScrollBar().valueChanged.connect(self.on_posts_scrolled)
+        scroll_area.verticalScrollBar().rangeChanged.connect(
+            lambda minimum, maximum: self.on_posts_scrolled(self.posts_scroll.verticalScrollBar().value()))
+        self.posts_scroll = scroll_area
         layout.addWidget(scroll_area, stretch=2)
         page.setLayout(layout)
+        self.post_frames = {}
+        self.posts_loading = False
         self.update_posts()
         return page
 
@@ -1204,47 +1294,37 @@ class MBSRApp(QMainWindow):
         if self.user_id is None:
             QMessageBox.warning(self, "Login Required", "Please login to post")
             if not self.show_login_dialog():
-                self.page_stack.setCurrentWidget(self.home_page)
+                self.show_page("home")
                 return
-        content = self.post_input.toPlainText().strip()
-        if not content:
-            QMessageBox.warning(self, "Error", "Post content cannot be empty")
-            return
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        c.execute("INSERT INTO community_posts (user_id, content, date) VALUES (?, ?, ?)",
-                  (self.user_id, content, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-        conn.commit()
-        conn.close()
+        self.post_btn.setEnabled(False)
+        self.write("share_post", core.share_post, self.user_id, self.post_input.toPlainText(),
+                   on_done=self.finish_share_post, on_error=self.share_post_failed)
+
+    def share_post_failed(self, error):
+        self.post_btn.setEnabled(True)
+        self.show_write_error(error)
+
+    def finish_share_post(self, result):
+        post_id, earned = result
+        self.post_btn.setEnabled(True)
         self.post_input.clear()
-        self.update_posts()
-        self.check_and_award_rewards()
+        self.load_newer_posts()
+        self.announce_rewards(earned)
         QMessageBox.information(self, "Success", "Post shared anonymously!")
 
     def show_login_dialog(self):
-        login_dialog = LoginDialog()
+        login_dialog = LoginDialog(self.data)
         if login_dialog.exec():
-            self.user_id = login_dialog.user_id
-            self.is_admin = login_dialog.is_admin
-            conn = sqlite3.connect('mbsr_data.db')
-            c = conn.cursor()
-            if self.is_admin:
-                c.execute("SELECT username FROM managers WHERE id=?", (self.user_id,))
-            else:
-                c.execute("SELECT username FROM users WHERE id=?", (self.user_id,))
-            username = c.fetchone()
-            self.username = username[0] if username else "Manager"
-            conn.close()
+            self.session = login_dialog.login.session
             self.update_navigation_bar()
-            self.check_and_award_rewards()
+            self.update_reward_page()
+            self.announce_rewards(login_dialog.login.earned)
             if self.is_admin:
-                self.page_stack.setCurrentWidget(self.manage_user_page)
+                self.show_page("manage_user")
                 self.update_manage_user()
             else:
-                self.page_stack.setCurrentWidget(self.home_page)
+                self.show_page("home")
                 self.update_pressure_diagram()
-            QTimer.singleShot(100, self.update_pressure_diagram)
-            QTimer.singleShot(200, self.update_dashboard)
             return True
         return False
 
@@ -1258,7 +1338,7 @@ class MBSRApp(QMainWindow):
             nav_button_texts = ["Manage User", "Manage Exercise", "Manage Community", "Logout"]
         else:
             nav_button_texts = ["Home", "View Dashboard", "Get Reward", "Exercises List", "Community",
-                                f"Hi {self.username}"]
+                                "Login" if self.user_id is None else f"Hi {self.username}"]
         for text in nav_button_texts:
             button = QPushButton(text)
             button.clicked.connect(lambda checked, b=text: self.navigate(b))
@@ -1266,16 +1346,52 @@ class MBSRApp(QMainWindow):
             self.nav_buttons.append(button)
 
     def logout(self):
-        self.user_id = None
-        self.is_admin = False
-        self.username = "Guest"
+        self.session = GUEST_SESSION
         self.stress_before_level = None
         self.current_exercise = None
         self.timer_count = 0
         if hasattr(self, 'timer') and self.timer.isActive():
             self.timer.stop()
             del self.timer
-        self.init_ui()
+        self.reset_user_pages()
+        self.update_navigation_bar()
+        self.show_page("home")
+        self.update_pressure_diagram()
+        self.update_sample_comment()
+
+    def reset_user_pages(self):
+        if "dashboard" in self.pages:
+            self.data.cancel("dashboard")
+            self.update_calendar_activity()
+            self.session_model.clear()
+            self.canvas_dashboard.hide()
+            self.date_label.setText("Showing all records")
+            self.progress_label.setText("Completed Exercises: 0")
+        if "exercise_assessment" in self.pages:
+            self.stress_before_combo.setCurrentIndex(0)
+        if "exercise_recommendation" in self.pages:
+            self.data.cancel("recommendation")
+            self.recommendation_label.setText(
+                "Please assess your stress level on the previous page to see a recommendation.")
+            for widget in (self.exercise_content, self.finish_btn, self.end_early_btn, self.timer_label,
+                           self.timer_progress):
+                widget.hide()
+        if "exercise_completion" in self.pages:
+            self.stress_after_combo.setCurrentIndex(0)
+            self.notes_input.clear()
+        if "community" in self.pages:
+            self.post_input.clear()
+        if "reward" in self.pages:
+            self.update_reward_page()
+        if "manage_user" in self.pages:
+            self.data.cancel("manage_user")
+            self.user_table.setRowCount(0)
+        if "manage_exercise" in self.pages:
+            self.data.cancel("manage_exercise")
+            self.exercise_table.setRowCount(0)
+        if "manage_community" in self.pages:
+            self.data.cancel("manage_community")
+            self.community_list.clear()
 
     def get_motivational_quote(self):
         quotes = [
@@ -1285,127 +1401,92 @@ class MBSRApp(QMainWindow):
         ]
         return random.choice(quotes)
 
-    def get_sample_comment(self):
-        with get_db_connection() as conn:
-            c = conn.cursor()
-            c.execute("SELECT id, content, date, comments FROM community_posts")
-            posts = c.fetchall()
-            if not posts:
-                return "No community posts available yet. Be the first to share your experience!"
-            max_comments = -1
-            selected_post = None
-            for post in posts:
-                comments = post[3] or ""
-                comment_count = comments.count("\n") + 1 if comments else 0
-                if comment_count > max_comments:
-                    max_comments = comment_count
-                    selected_post = post
-            if selected_post:
-                return f"{selected_post[1]}\nSee More\n{selected_post[2].split()[0]}"
-            else:
-                return "No community posts with comments yet. Share your thoughts!"
+    def update_sample_comment(self):
+        self.data.submit("sample_comment", most_discussed_post,
+                         on_done=lambda post: self.comment_label.setText(self.format_sample_comment(post)))
+
+    def format_sample_comment(self, selected_post):
+        if not selected_post:
+            return "No community posts available yet. Be the first to share your experience!"
+        return f"{selected_post[1]}\nSee More\n{selected_post[2].split()[0]}"
 
-    def plot_stress_diagram(self, canvas, title, data):
-        canvas.axes.clear()
+    def plot_stress_diagram(self, canvas, title):
         if self.user_id is None and not self.is_admin:
-            canvas.axes.text(0.5, 0.5, "Please login to view your stress data",
-                             horizontalalignment='center',
-                             verticalalignment='center',
-                             transform=canvas.axes.transAxes)
-            canvas.axes.set_title(title)
+            canvas.show_message(title, "Please login to view your stress data")
         else:
-            if data:
-                dates = [row[0] for row in data]
-                stress_before = [row[2] for row in data]
-                stress_after = [row[3] for row in data]
-                percentages = [row[4] for row in data]
-                ax1 = canvas.axes
-                ax2 = ax1.twinx()
-                ax1.plot(dates, stress_before, label="Before", marker='o', color='blue')
-                ax1.plot(dates, stress_after, label="After", marker='o', color='green')
-                ax1.set_ylim(0, 10)
-                ax1.set_ylabel("Stress Level (0-10)")
-                ax1.tick_params(axis='y', labelcolor='black')
-                ax1.legend(loc='upper left')
-                ax2.plot(dates, percentages, label="Completion %", marker='s', linestyle='--', color='orange')
-                ax2.set_ylim(0, 110)
-                ax2.set_ylabel("Completion % (0-100)")
-                ax2.tick_params(axis='y', labelcolor='black')
-                ax2.legend(loc='upper right')
-                canvas.axes.set_title(title)
-                canvas.axes.set_xlabel("Date")
-                canvas.axes.tick_params(axis='x', rotation=10)
-            else:
-                canvas.axes.text(0.5, 0.5, "No data available",
-                                 horizontalalignment='center',
-                                 verticalalignment='center',
-                                 transform=canvas.axes.transAxes)
-                canvas.axes.set_title(title)
-        canvas.draw()
+            canvas.show_trend(self.user_id, title)
 
     def update_pressure_diagram(self):
         if self.is_admin:
-            self.canvas.axes.clear()
-            self.canvas.axes.text(0.5, 0.5, "Managers cannot view stress data",
-                                  horizontalalignment='center',
-                                  verticalalignment='center',
-                                  transform=self.canvas.axes.transAxes)
-            self.canvas.axes.set_title("Pressure Change Diagram")
-            self.canvas.draw()
+            self.canvas.show_message("Pressure Change Diagram", "Managers cannot view stress data")
             return
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        c.execute(
-            "SELECT date, exercise_type, stress_before, stress_after, duration_percentage, notes FROM stress_levels WHERE user_id=? ORDER BY date",
-            (self.user_id,))
-        data = c.fetchall()
-        conn.close()
-        self.plot_stress_diagram(self.canvas, "Pressure Change Diagram", data)
+        self.plot_stress_diagram(self.canvas, "Pressure Change Diagram")
 
     def update_dashboard(self, selected_date=None):
         if self.is_admin:
             self.progress_label.setText("Managers cannot view progress")
             self.date_label.setText("Managers cannot view records")
             self.canvas_dashboard.hide()
-            self.session_table.setRowCount(0)
+            self.session_model.clear()
             return
         if self.user_id is None:
             self.progress_label.setText("Please login to view your progress")
             self.date_label.setText("Please login to view records")
             self.canvas_dashboard.hide()
-            self.session_table.setRowCount(0)
+            self.session_model.clear()
             return
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
+        user_id = self.user_id
+        self.progress_label.setText("Completed Exercises: ...")
         if selected_date:
-            query_date = selected_date.toString("yyyy-MM-dd")
-            c.execute(
-                "SELECT date, exercise_type, stress_before, stress_after, duration_percentage, notes FROM stress_levels WHERE user_id=? AND date LIKE ? ORDER BY date",
-                (self.user_id, f"{query_date}%"))
-            self.date_label.setText(f"Showing records for {query_date}")
+            period = span_range(self.span_combo.currentData(), selected_date.toString("yyyy-MM-dd"))
+            self.date_label.setText(f"Showing records for {describe_range(period)}")
             self.canvas_dashboard.hide()
+            activity_user, month, activity = self.calendar_activity
+            if self.span_combo.currentData() == DAY and (activity_user, month) == (user_id, month_range(period.first)):
+                completed = activity.get(period.first, (0, None))[0]
+                self.data.cancel("dashboard")
+                self.progress_label.setText(f"Completed Exercises: {completed}")
+                if completed:
+                    self.session_model.load(user_id, period, empty_message="No records for this period")
+                else:
+                    self.session_model.clear()
+                    self.session_model.on_loaded([], "No records for this period")
+                return
+            self.session_model.load(user_id, period, empty_message="No records for this period")
+            load_completed = lambda conn: cached(user_id, ("session_count", period),
+                                                 lambda: count_sessions(conn, user_id, period))
         else:
-            c.execute(
-                "SELECT date, exercise_type, stress_before, stress_after, duration_percentage, notes FROM stress_levels WHERE user_id=? ORDER BY date",
-                (self.user_id,))
+            self.session_model.load(user_id)
             self.date_label.setText("Showing all records")
             self.canvas_dashboard.show()
-        data = c.fetchall()
-        conn.close()
-        self.progress_label.setText(f"Completed Exercises: {len(data)}")
-        if not selected_date:
-            self.plot_stress_diagram(self.canvas_dashboard, "Stress Level and Completion % Trends", data)
-        self.session_table.setRowCount(len(data))
-        if not data and selected_date:
-            self.session_table.setRowCount(1)
-            self.session_table.setItem(0, 0, QTableWidgetItem("No records for this date"))
-        else:
-            for i, row in enumerate(data):
-                for j, value in enumerate(row):
-                    if j == 4 and value is not None:
-                        self.session_table.setItem(i, j, QTableWidgetItem(str(builtins.round(float(value), 1))))
-                    else:
-                        self.session_table.setItem(i, j, QTableWidgetItem(str(value) if value is not None else ""))
+            load_completed = lambda conn: cached(user_id, ("stats",), lambda: user_stats(conn, user_id)).session_count
+            self.plot_stress_diagram(self.canvas_dashboard, "Stress Level and Completion % Trends")
+        self.data.submit("dashboard", load_completed,
+                         on_done=lambda completed: self.progress_label.setText(f"Completed Exercises: {completed}"))
+
+    def update_calendar_activity(self):
+        if "dashboard" not in self.pages:
+            return
+        if self.user_id is None or self.is_admin:
+            self.data.cancel("calendar")
+            self.show_calendar_activity(None, None, {})
+            return
+        user_id = self.user_id
+        month = month_range(f"{self.calendar.yearShown():04d}-{self.calendar.monthShown():02d}-01")
+        self.data.submit("calendar", lambda conn: cached(user_id, ("day_activity", month),
+                                                         lambda: fetch_day_activity(conn, user_id, month)),
+                         on_done=lambda activity: self.show_calendar_activity(user_id, month, activity))
+
+    def show_calendar_activity(self, user_id, month, activity):
+        self.calendar_activity = (user_id, month, activity)
+        self.calendar.setDateTextFormat(QDate(), QTextCharFormat())
+        max_count = max((count for count, _ in activity.values()), default=0)
+        for day, (count, reduction) in activity.items():
+            text_format = QTextCharFormat()
+            text_format.setBackground(activity_color(count, max_count, reduction))
+            text_format.setToolTip(f"{count} sessions, average stress reduction {reduction:+.1f}"
+                                   if reduction is not None else f"{count} sessions")
+            self.calendar.setDateTextFormat(QDate(day.year, day.month, day.day), text_format)
 
     def update_dashboard_by_date(self):
         selected_date = self.calendar.selectedDate()
@@ -1418,74 +1499,170 @@ class MBSRApp(QMainWindow):
         if self.user_id is None:
             QMessageBox.warning(self, "Login Required", "Please login to comment")
             if not self.show_login_dialog():
-                self.page_stack.setCurrentWidget(self.home_page)
+                self.show_page("home")
                 return
         post_id = frame.property("post_id")
         comment, ok = QInputDialog.getText(self, "Add Comment", "Enter your comment:")
-        if ok and comment:
-            conn = sqlite3.connect('mbsr_data.db')
-            c = conn.cursor()
-            c.execute("SELECT comments FROM community_posts WHERE id=?", (post_id,))
-            current_comments = c.fetchone()
-            new_comments = current_comments[
-                               0] + f"\nAnonymous ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')}): {comment}" if current_comments and \
-                                                                                                                  current_comments[
-                                                                                                                      0] else f"Anonymous ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')}): {comment}"
-            c.execute("UPDATE community_posts SET comments=? WHERE id=?", (new_comments, post_id))
-            conn.commit()
-            conn.close()
-            self.update_posts()
-            QMessageBox.information(self, "Success", "Comment added!")
+        if ok and comment.strip():
+            self.write(("comment", post_id), core.comment_on_post, post_id, comment,
+                       on_done=lambda new_comment: self.finish_comment(post_id, new_comment))
+
+    def finish_comment(self, post_id, new_comment):
+        if new_comment is None:
+            QMessageBox.warning(self, "Error", "Post not found")
+            self.remove_post_frame(post_id)
+            return
+        self.append_comment(post_id, new_comment)
+        self.update_sample_comment()
+        QMessageBox.information(self, "Success", "Comment added!")
 
     def update_posts(self):
-        for i in reversed(range(self.posts_layout.count())):
-            widget = self.posts_layout.itemAt(i).widget()
-            if widget:
-                widget.deleteLater()
-        conn = sqlite3.connect('mbsr_data.db')
-        c = conn.cursor()
-        c.execute("SELECT id, content, date, comments FROM community_posts ORDER BY date DESC")
-        posts = c.fetchall()
-        conn.close()
+        for frame in self.post_frames.values():
+            frame.deleteLater()
+        self.post_frames.clear()
+        self.data.cancel("newer_posts")
+        self.oldest_post_key = None
+        self.newest_post_key = None
+        self.posts_exhausted = False
+        self.posts_loading = False
+        self.load_older_posts()
+
+    def load_older_posts(self):
+        if self.posts_exhausted or self.posts_loading:
+            return
+        self.posts_loading = True
+        self.posts_status.setText("Loading posts...")
+        self.posts_status.show()
+        self.data.submit("older_posts", self.fetch_posts_with_comments, self.oldest_post_key,
+                         on_done=self.show_older_posts)
+
+    def fetch_posts_with_comments(self, conn, before=None, after=None):
+        posts = fetch_posts_after(conn, after) if after is not None else fetch_post_page(conn, before=before)
+        return posts, fetch_latest_comments(conn, [post[0] for post in posts], limit=COMMENT_PAGE_SIZE + 1)
+
+    def show_older_posts(self, result):
+        posts, latest_comments = result
+        self.posts_loading = False
+        self.posts_exhausted = len(posts) < POST_PAGE_SIZE
+        self.posts_status.hide()
+        if not posts:
+            return
         for post in posts:
-            post_frame = QFrame()
-            post_frame.setStyleSheet("""
-                background-color: #222;
-                border: 1px solid #444;
-                border-radius: 8px;
-                padding: 15px;
-                margin: 5px;
-            """)
-            post_layout = QVBoxLayout()
-            content_label = QLabel(f"Post ({post[2]}):\n{post[1]}")
-            content_label.setStyleSheet("""
-                font-size: 14px;
-                color: #E0E0E0;
-                font-weight: bold;
-                margin-bottom: 10px;
-            """)
-            content_label.setWordWrap(True)
-            post_layout.addWidget(content_label)
-            comments_label = QLabel(f"Comments:\n{post[3] or 'No comments yet'}")
-            comments_label.setStyleSheet("""
-                font-size: 12px;
-                color: #B0B0B0;
-                font-style: italic;
-            """)
-            comments_label.setWordWrap(True)
-            post_layout.addWidget(comments_label)
-            post_frame.setLayout(post_layout)
-            post_frame.setProperty("post_id", post[0])
-            post_frame.mouseDoubleClickEvent = lambda event, frame=post_frame: self.show_comment_dialog(frame)
-            self.posts_layout.insertWidget(0, post_frame)
-        self.posts_layout.addStretch()
+            frame = self.create_post_frame(post, latest_comments.get(post[0], []))
+            self.posts_layout.insertWidget(self.posts_layout.count() - 2, frame)
+        self.oldest_post_key = (posts[-1][2], posts[-1][0])
+        if self.newest_post_key is None:
+            self.newest_post_key = (posts[0][2], posts[0][0])
+
+    def load_newer_posts(self):
+        if self.newest_post_key is None:
+            if not self.posts_loading:
+                self.update_posts()
+            return
+        self.data.submit("newer_posts", lambda conn, after, loaded: (
+            *self.fetch_posts_with_comments(conn, after=after), loaded, existing_post_ids(conn, loaded)),
+            self.newest_post_key, list(self.post_frames), on_done=self.show_newer_posts)
+
+    def show_newer_posts(self, result):
+        posts, latest_comments, loaded, existing = result
+        for post_id in set(loaded) - existing:
+            self.remove_post_frame(post_id)
+        for post in posts:
+            if post[0] not in self.post_frames:
+                self.posts_layout.insertWidget(0, self.create_post_frame(post, latest_comments.get(post[0], [])))
+        if posts:
+            self.newest_post_key = max(self.newest_post_key, (posts[-1][2], posts[-1][0]))
+
+    def remove_post_frame(self, post_id):
+        frame = self.post_frames.pop(post_id, None)
+        if frame is not None:
+            frame.deleteLater()
+
+    def append_comment(self, post_id, comment):
+        frame = self.post_frames.get(post_id)
+        if frame is not None:
+            frame.comments.append(comment)
+            self.render_comments(frame)
+
+    def load_earlier_comments(self, frame):
+        oldest = frame.comments[0]
+        frame.more_comments_btn.setEnabled(False)
+        self.data.submit(("comments", frame.property("post_id")), fetch_comment_page, frame.property("post_id"),
+                         (oldest[1], oldest[0]), COMMENT_PAGE_SIZE + 1,
+                         on_done=lambda page: self.show_earlier_comments(frame, page))
+
+    def show_earlier_comments(self, frame, page):
+        frame.more_comments_btn.setEnabled(True)
+        frame.more_comments_btn.setVisible(len(page) > COMMENT_PAGE_SIZE)
+        frame.comments[:0] = reversed(page[:COMMENT_PAGE_SIZE])
+        self.render_comments(frame)
+
+    def render_comments(self, frame):
+        frame.comments_label.setText(f"Comments:\n{format_comments(frame.comments)}")
+
+    def on_posts_scrolled(self, value):
+        if value >= self.posts_scroll.verticalScrollBar().maximum() - 200:
+            self.load_older_posts()
+
+    def create_post_frame(self, post, latest_comments):
+        post_frame = QFrame()
+        post_frame.setStyleSheet("""
+            background-color: #222;
+            border: 1px solid #444;
+            border-radius: 8px;
+            padding: 15px;
+            margin: 5px;
+        """)
+        post_layout = QVBoxLayout()
+        content_label = QLabel(f"Post ({post[2]}):\n{post[1]}")
+        content_label.setStyleSheet("""
+            font-size: 14px;
+            color: #E0E0E0;
+            font-weight: bold;
+            margin-bottom: 10px;
+        """)
+        content_label.setWordWrap(True)
+        post_layout.addWidget(content_label)
+        comments_label = QLabel()
+        comments_label.setStyleSheet("""
+            font-size: 12px;
+            color: #B0B0B0;
+            font-style: italic;
+        """)
+        comments_label.setWordWrap(True)
+        post_layout.addWidget(comments_label)
+        more_comments_btn = QPushButton("Show earlier comments")
+        more_comments_btn.setStyleSheet("font-size: 12px; color: #B0B0B0; border: none; text-align: left;")
+        more_comments_btn.clicked.connect(lambda checked, frame=post_frame: self.load_earlier_comments(frame))
+        more_comments_btn.setVisible(len(latest_comments) > COMMENT_PAGE_SIZE)
+        post_layout.addWidget(more_comments_btn)
+        post_frame.setLayout(post_layout)
+        post_frame.setProperty("post_id", post[0])
+        post_frame.comments_label = comments_label
+        post_frame.more_comments_btn = more_comments_btn
+        post_frame.comments = list(reversed(latest_comments[:COMMENT_PAGE_SIZE]))
+        self.render_comments(post_frame)
+        post_frame.mouseDoubleClickEvent = lambda event, frame=post_frame: self.show_comment_dialog(frame)
+        self.post_frames[post[0]] = post_frame
+        return post_frame
 
 def main():
     app = QApplication(sys.argv)
+    startup.mark("QApplication")
     init_db()
+    startup.mark("init_db")
     window = MBSRApp()
+    startup.mark("window construction")
+    if startup.enabled:
+        watcher = FirstPaintWatcher(app)
+        app.installEventFilter(watcher)
     window.show()
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    data_access().shutdown()
+    chart_pool().clear()
+    chart_pool().waitForDone()
+    close_connection()
+    sys.exit(exit_code)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
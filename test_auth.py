@@ -0,0 +1,63 @@
+import pytest
+
+import auth
+import core
+import database
+import migrations
+from database import get_connection, transaction
+
+
+def _stored_hash(conn, username):
+    return auth.find_credentials(conn, username)[2]
+
+
+def _iterations(encoded):
+    return int(encoded.split("$")[1])
+
+
+def test_login_rehashes_outdated_hash(conn, monkeypatch):
+    user_id = core.register("alice", "secret")
+    manager_id = core.add_manager("boss", "secret")
+    monkeypatch.setattr(auth, "PASSWORD_ITERATIONS", 2000)
+    assert core.login("alice", "wrong") is None
+    assert _iterations(_stored_hash(conn, "alice")) == 1000
+    for username, account_id in (("alice", user_id), ("boss", manager_id)):
+        old = _stored_hash(conn, username)
+        assert core.login(username, "secret").session.user_id == account_id
+        new = _stored_hash(conn, username)
+        assert _iterations(new) == 2000 and new != old
+        assert auth.verify_password("secret", new) and not auth.needs_rehash(new)
+        core.login(username, "secret")
+        assert _stored_hash(conn, username) == new
+    assert conn.execute("SELECT COUNT(*) FROM login_history").fetchone()[0] == 2
+
+
+def test_unknown_user_and_empty_password(conn):
+    assert core.login("nobody", "secret") is None
+    with pytest.raises(ValueError):
+        core.login("alice", "")
+
+
+def test_plaintext_passwords_migrate_and_rehash(tmp_path, monkeypatch):
+    database.close_connection()
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "legacy.db"))
+    monkeypatch.setattr(auth, "PASSWORD_ITERATIONS", 2000)
+    with monkeypatch.context() as patch:
+        patch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:9])
+        patch.setattr(migrations, "SCHEMA_VERSION", 9)
+        migrations.init_db()
+    conn = get_connection()
+    try:
+        with transaction():
+            user_id = conn.execute("INSERT INTO users (username, password) VALUES ('sam', 'pw1')").lastrowid
+            conn.execute("INSERT INTO managers (username, password) VALUES ('sam', 'pw2')")
+        migrations.init_db()
+        assert "password" not in migrations._table_columns(conn.cursor(), "users")
+        renamed = f"sam-{user_id}"
+        assert _iterations(_stored_hash(conn, renamed)) == auth.MIGRATION_ITERATIONS
+        assert core.login("sam", "pw1") is None
+        assert core.login("sam", "pw2").session.is_admin
+        assert core.login(renamed, "pw1").session.user_id == user_id
+        assert _iterations(_stored_hash(conn, renamed)) == 2000
+    finally:
+        database.close_connection()
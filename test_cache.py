@@ -0,0 +1,85 @@
+import sqlite3
+
+import database
+from cache import QueryCache, _size_of, data_version
+from database import transaction
+
+
+def _add_user(conn, username="alice"):
+    with transaction():
+        return conn.execute("INSERT INTO users (username) VALUES (?)", (username,)).lastrowid
+
+
+def _add_session(conn, user_id):
+    with transaction():
+        return conn.execute("INSERT INTO stress_levels (user_id, date, stress_before, stress_after, exercise_type) "
+                            "VALUES (?, '2024-01-01 08:00:00', 6, 3, 'Body Scan')", (user_id,)).lastrowid
+
+
+def test_hits_until_data_version_changes(conn):
+    user_id = _add_user(conn)
+    cache = QueryCache()
+    loads = []
+    load = lambda: loads.append(1) or len(loads)
+    assert cache.get_or_load(user_id, ("k",), load) == 1
+    assert cache.get_or_load(user_id, ("k",), load) == 1
+    _add_session(conn, user_id)
+    assert cache.get_or_load(user_id, ("k",), load) == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_writes_from_other_connections_invalidate(conn):
+    user_id = _add_user(conn)
+    before = data_version(user_id)
+    other = sqlite3.connect(database.DB_PATH)
+    other.execute("INSERT INTO stress_levels (user_id, date, stress_before, stress_after) "
+                  "VALUES (?, '2024-01-01 08:00:00', 5, 4)", (user_id,))
+    other.commit()
+    other.close()
+    assert data_version(user_id) == before + 1
+
+
+def test_invalidate_drops_user_entries(conn):
+    alice, bob = _add_user(conn, "alice"), _add_user(conn, "bob")
+    cache = QueryCache()
+    cache.get_or_load(alice, ("k",), lambda: "a")
+    cache.get_or_load(bob, ("k",), lambda: "b")
+    cache.invalidate(alice)
+    assert cache.get_or_load(alice, ("k",), lambda: "reloaded") == "reloaded"
+    assert cache.get_or_load(bob, ("k",), lambda: "reloaded") == "b"
+
+
+def test_evicts_least_recently_used(conn):
+    user_id = _add_user(conn)
+    value = "x" * 100
+    cache = QueryCache(max_bytes=_size_of(value) * 2)
+    for key in ("a", "b"):
+        cache.get_or_load(user_id, (key,), lambda: value)
+    cache.get_or_load(user_id, ("a",), lambda: None)
+    cache.get_or_load(user_id, ("c",), lambda: value)
+    assert cache.size <= cache.max_bytes
+    assert cache.get_or_load(user_id, ("a",), lambda: "missed") == value
+    assert cache.get_or_load(user_id, ("b",), lambda: "missed") == "missed"
+
+
+def test_update_applies_change_and_respects_cap(conn):
+    user_id = _add_user(conn)
+    version = data_version(user_id)
+    cache = QueryCache(max_bytes=_size_of(("y",) * 10) + _size_of(("x",)) - 1)
+    cache.get_or_load(user_id, ("small",), lambda: ("x",))
+    cache.get_or_load(user_id, ("grow",), lambda: ("y",))
+    cache.update(user_id, ("grow",), version, version, lambda value: value * 10)
+    assert cache.size <= cache.max_bytes
+    assert cache.get_or_load(user_id, ("grow",), lambda: "missed") == ("y",) * 10
+    assert cache.get_or_load(user_id, ("small",), lambda: "missed") == "missed"
+
+
+def test_update_ignores_stale_entries(conn):
+    user_id = _add_user(conn)
+    cache = QueryCache()
+    cache.get_or_load(user_id, ("k",), lambda: 1)
+    _add_session(conn, user_id)
+    _add_session(conn, user_id)
+    version = data_version(user_id)
+    cache.update(user_id, ("k",), version - 1, version, lambda value: value + 1)
+    assert cache.get_or_load(user_id, ("k",), lambda: "reloaded") == "reloaded"
@@ -0,0 +1,82 @@
+from datetime import date, timedelta
+
+import pytest
+
+from database import transaction
+from dateranges import (DateRange, custom_range, day_number, day_number_sql, from_day_number, month_range,
+                        range_clause, week_range)
+from sessions import count_sessions, fetch_day_activity, fetch_session_page
+
+
+def _add_user(conn):
+    with transaction():
+        return conn.execute("INSERT INTO users (username) VALUES ('alice')").lastrowid
+
+
+def _add_sessions(conn, user_id, dates):
+    with transaction():
+        conn.executemany("INSERT INTO stress_levels (user_id, date, stress_before, stress_after, exercise_type) "
+                         "VALUES (?, ?, 7, 4, 'Body Scan')", [(user_id, at) for at in dates])
+
+
+def _page_through(conn, user_id, period, limit):
+    rows, after = [], None
+    while True:
+        page = fetch_session_page(conn, user_id, period, after, limit)
+        rows.extend(page)
+        if len(page) < limit:
+            return rows
+        after = (page[-1][0], page[-1][-1])
+
+
+@pytest.mark.parametrize("day, expected", [
+    ("2024-02-29", DateRange(date(2024, 2, 1), date(2024, 2, 29))),
+    ("2023-02-10 08:00:00", DateRange(date(2023, 2, 1), date(2023, 2, 28))),
+    ("2024-12-31", DateRange(date(2024, 12, 1), date(2024, 12, 31))),
+])
+def test_month_range(day, expected):
+    assert month_range(day) == expected
+
+
+def test_week_range_crosses_year():
+    assert week_range("2025-01-01") == DateRange(date(2024, 12, 30), date(2025, 1, 5))
+    assert week_range(date(2024, 12, 30)) == week_range("2025-01-05 23:59:59")
+
+
+def test_custom_range_orders_bounds():
+    assert custom_range("2024-03-05", "2024-03-01") == DateRange(date(2024, 3, 1), date(2024, 3, 5))
+
+
+def test_day_number_matches_sql(conn):
+    for day in (date(1969, 12, 31), date(1970, 1, 1), date(2000, 2, 29), date(2024, 12, 31)):
+        number = day_number(day)
+        assert from_day_number(number) == day
+        assert conn.execute(f"SELECT {day_number_sql('?')}", (f"{day} 23:59:59",)).fetchone()[0] == number
+
+
+def test_range_clause_includes_last_day():
+    clause, bounds = range_clause(month_range("2024-02-10"), "s.day_number")
+    assert clause == "s.day_number >= ? AND s.day_number < ?"
+    assert bounds == [day_number("2024-02-01"), day_number("2024-03-01")]
+
+
+def test_keyset_pages_cover_range_in_order(conn):
+    user_id = _add_user(conn)
+    start = date(2024, 1, 30)
+    dates = [f"{start + timedelta(days=offset // 4)} {'08:00:00' if offset % 2 else '23:59:59'}"
+             for offset in range(40)]
+    _add_sessions(conn, user_id, dates + ["not a date"])
+    period = month_range("2024-02-01")
+    expected = sorted((at, row_id) for row_id, at in conn.execute(
+        "SELECT id, date FROM stress_levels WHERE date LIKE '2024-02-%'"))
+    for limit in (1, 3, 7, len(expected), len(expected) + 1):
+        assert [(row[0], row[-1]) for row in _page_through(conn, user_id, period, limit)] == expected
+    assert count_sessions(conn, user_id, period) == len(expected)
+    assert count_sessions(conn, user_id) == len(dates) + 1
+    assert len(_page_through(conn, user_id, None, 5)) == len(dates) + 1
+
+
+def test_day_activity(conn):
+    user_id = _add_user(conn)
+    _add_sessions(conn, user_id, ["2024-02-29 00:00:00", "2024-02-29 23:59:59", "2024-03-01 00:00:00"])
+    assert fetch_day_activity(conn, user_id, month_range("2024-02-01")) == {date(2024, 2, 29): (2, 3.0)}
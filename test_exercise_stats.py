@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from database import transaction
+from stats import exercise_stats, rebuild_exercise_stats
+
+EXERCISES = ("Mindful Breathing 1", "Body Scan", "Walking Meditation")
+
+
+def _snapshot(conn, user_ids):
+    return {user_id: exercise_stats(conn, user_id) for user_id in user_ids}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_triggers_match_rebuild(conn, seed):
+    rng = random.Random(seed)
+    with transaction():
+        user_ids = [conn.execute("INSERT INTO users (username) VALUES (?)", (f"user{index}",)).lastrowid
+                    for index in range(4)]
+    session_ids = []
+    for _ in range(600):
+        with transaction():
+            if session_ids and rng.random() < 0.3:
+                session_id = session_ids.pop(rng.randrange(len(session_ids)))
+                conn.execute("DELETE FROM stress_levels WHERE id=?", (session_id,))
+            else:
+                completion = rng.choice((None, rng.uniform(0, 100)))
+                session_ids.append(conn.execute(
+                    "INSERT INTO stress_levels (user_id, date, stress_before, stress_after, exercise_type, "
+                    "duration_percentage) VALUES (?, '2024-01-01 08:00:00', ?, ?, ?, ?)",
+                    (rng.choice(user_ids), rng.randint(1, 10), rng.randint(1, 10), rng.choice(EXERCISES),
+                     completion)).lastrowid)
+    maintained = _snapshot(conn, user_ids)
+    with transaction():
+        rebuild_exercise_stats(conn)
+    rebuilt = _snapshot(conn, user_ids)
+    assert maintained.keys() == rebuilt.keys()
+    for user_id, stats in rebuilt.items():
+        assert maintained[user_id].keys() == stats.keys()
+        for exercise, expected in stats.items():
+            assert maintained[user_id][exercise] == pytest.approx(expected)
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+import database
+from database import transaction
+from exporter import BY_MONTH, BY_USER, export_sessions, write_user_sessions
+from importer import import_sessions
+from rewards import REWARDS, backfill_rewards
+
+SESSIONS = [
+    ("alice", "2024-01-31 23:30:00", "Body Scan", 7, 3, 100.0, "late"),
+    ("alice", "2024-01-31 08:00:00", "Body Scan", 6, 4, 50.0, ""),
+    ("bob", "2024-01-31 08:00:00", "Mindful Breathing 1", 8, 2, 75.5, "with, comma"),
+    ("bob", "2024-02-01 09:15:00", "Walking Meditation", 5, 5, 0.0, ""),
+    ("alice", "2024-02-29 12:00:00", "Body Scan", 4, 2, 100.0, "leap day"),
+]
+
+
+def _add_sessions(conn):
+    with transaction():
+        user_ids = {username: conn.execute("INSERT INTO users (username) VALUES (?)", (username,)).lastrowid
+                    for username in ("alice", "bob")}
+        for username, *session in SESSIONS:
+            conn.execute("INSERT INTO stress_levels (user_id, date, exercise_type, stress_before, stress_after, "
+                         "duration_percentage, notes) VALUES (?, ?, ?, ?, ?, ?, ?)", (user_ids[username], *session))
+        backfill_rewards(conn)
+    return user_ids
+
+
+def _sessions(conn):
+    return sorted(conn.execute(
+        "SELECT users.username, date, exercise_type, stress_before, stress_after, duration_percentage, notes "
+        "FROM stress_levels JOIN users ON users.id = stress_levels.user_id"))
+
+
+def _rewards(conn):
+    return sorted(conn.execute("SELECT user_id, reward_name, earned, earn_date, progress FROM rewards"))
+
+
+def _reimport(conn, files, username=None):
+    expected = (_sessions(conn), _rewards(conn))
+    with transaction():
+        conn.execute("DELETE FROM stress_levels")
+        conn.execute("DELETE FROM rewards")
+    result = import_sessions(files, username)
+    assert (result.skipped, result.errors) == (0, [])
+    return expected
+
+
+def _month_order(path):
+    with open(path, encoding="utf-8") as source:
+        return [line.split(",")[1] for line in source.read().splitlines()[1:]]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_month_export_round_trips(conn, tmp_path, compress):
+    _add_sessions(conn)
+    result = export_sessions(database.DB_PATH, str(tmp_path / "out"), BY_MONTH, compress, workers=1)
+    assert [os.path.basename(path) for path in result.files] == [
+        "2024-01.csv" + (".gz" if compress else ""), "2024-02.csv" + (".gz" if compress else "")]
+    assert (result.rows, result.cancelled) == (len(SESSIONS), False)
+    if not compress:
+        assert _month_order(result.files[0]) == ["2024-01-31 08:00:00", "2024-01-31 08:00:00", "2024-01-31 23:30:00"]
+    expected = _reimport(conn, result.files)
+    assert (_sessions(conn), _rewards(conn)) == expected
+    assert [earned for _, _, earned, _, _ in expected[1]].count(1) > 0
+    assert len(expected[1]) == 2 * len(REWARDS)
+
+
+def test_user_export_round_trips(conn, tmp_path):
+    user_ids = _add_sessions(conn)
+    result = export_sessions(database.DB_PATH, str(tmp_path / "out"), BY_USER, workers=1)
+    assert [os.path.basename(path) for path in result.files] == [f"{user_ids['alice']}_alice.csv",
+                                                                 f"{user_ids['bob']}_bob.csv"]
+    path = str(tmp_path / "alice.csv")
+    assert write_user_sessions(conn, user_ids["alice"], path) == 3
+    expected = _reimport(conn, [path], "alice")
+    assert _sessions(conn) == [session for session in expected[0] if session[0] == "alice"]
@@ -0,0 +1,40 @@
+import pytest
+
+import database
+import migrations
+from database import get_connection, transaction
+
+
+@pytest.fixture
+def legacy_db(tmp_path, monkeypatch):
+    database.close_connection()
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "legacy.db"))
+    with monkeypatch.context() as patch:
+        patch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:12])
+        patch.setattr(migrations, "SCHEMA_VERSION", 12)
+        migrations.init_db()
+    conn = get_connection()
+    with transaction():
+        user_id = conn.execute("INSERT INTO users (username) VALUES ('alice')").lastrowid
+        for day in ("2024-01-01", "2024-01-02", "2024-01-03"):
+            conn.execute("INSERT INTO stress_levels (user_id, date, stress_before, stress_after, exercise_type) "
+                         "VALUES (?, ?, 8, 3, 'Body Scan')", (user_id, f"{day} 09:00:00"))
+            conn.execute("INSERT INTO login_history (user_id, login_date) VALUES (?, ?)", (user_id, f"{day} 08:00:00"))
+        conn.execute("INSERT INTO community_posts (user_id, content, date) VALUES (?, 'hi', '2024-01-03 10:00:00')",
+                     (user_id,))
+    yield conn
+    database.close_connection()
+
+
+def test_upgrade_from_existing_database(legacy_db):
+    applied = [version for version, _, _ in migrations.init_db()]
+    assert applied == list(range(13, migrations.SCHEMA_VERSION + 1))
+    assert migrations.schema_version(legacy_db) == migrations.SCHEMA_VERSION
+    assert legacy_db.execute("SELECT day_number FROM community_posts").fetchone() == (19725,)
+    earned = dict(legacy_db.execute("SELECT reward_name, earn_date FROM rewards WHERE earned"))
+    assert earned == {"First Community Post": "2024-01-03 10:00:00", "Three Day Exercise": "2024-01-03 09:00:00",
+                      "Three Day Login": "2024-01-03 08:00:00", "Stress Reduction Master": "2024-01-03 09:00:00"}
+    indexes = {row[0] for row in legacy_db.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    assert {"idx_stress_levels_day_date", "idx_community_posts_user_day"} <= indexes
+    assert "idx_stress_levels_day" not in indexes
+    assert migrations.init_db() == []
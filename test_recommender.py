@@ -0,0 +1,73 @@
+import random
+import sqlite3
+
+import pytest
+
+import core
+import database
+from cache import catalog_version
+from recommender import ExerciseIndex
+
+
+def _traced(conn):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    return statements
+
+
+def test_index_buckets_cover_every_level(conn):
+    index = ExerciseIndex(core.list_exercises(conn), core.STRESS_LEVELS, core.FALLBACK_STRESS_LEVEL)
+    for level in core.STRESS_LEVELS:
+        assert all(e.stress_level_min <= level <= e.stress_level_max for e in index.candidates(level))
+
+
+def test_sample_skips_recent_exercises(conn):
+    index = ExerciseIndex(core.list_exercises(conn), core.STRESS_LEVELS, core.FALLBACK_STRESS_LEVEL)
+    rng = random.Random(1)
+    recent = {exercise.name for exercise in index.candidates(2)[:-1]}
+    assert {index.sample(2, rng, recent).name for _ in range(20)} == {index.candidates(2)[-1].name}
+
+
+def test_recommend_does_not_query_sqlite(conn):
+    user_id = core.register("alice", "secret")
+    core.record_session(user_id, "Body Scan", 8, 4, 100)
+    core.recommend_for_user(user_id, 8)
+    statements = _traced(conn)
+    for _ in range(20):
+        core.recommend_for_user(user_id, 8)
+    assert statements == []
+
+
+def test_record_session_updates_inputs_in_place(conn):
+    user_id = core.register("alice", "secret")
+    core.recommend_for_user(user_id, 5)
+    core.record_session(user_id, "Walking Meditation", 5, 2, 80)
+    statements = _traced(conn)
+    assert core.recent_exercises(user_id)[0] == "Walking Meditation"
+    assert core.user_exercise_stats(user_id)["Walking Meditation"].session_count == 1
+    assert statements == []
+
+
+def test_catalog_edits_from_other_processes_reach_the_index(conn, monkeypatch):
+    before = catalog_version()
+    assert any(e.name == "Body Scan" for e in core.exercise_index.get().candidates(9))
+    other = sqlite3.connect(database.DB_PATH)
+    other.execute("DELETE FROM exercises WHERE name='Body Scan'")
+    other.commit()
+    other.close()
+    assert catalog_version() == before + 1
+    monkeypatch.setattr(core.exercise_index, "max_age", 0)
+    assert all(e.name != "Body Scan" for e in core.exercise_index.get().candidates(9))
+
+
+def test_local_catalog_edits_rebuild_immediately(conn):
+    core.exercise_index.get()
+    exercise_id = core.add_exercise("Cold Water", "Splash your face", 9, 10)
+    assert any(e.id == exercise_id for e in core.exercise_index.get().candidates(10))
+    core.delete_exercise(exercise_id)
+    assert all(e.id != exercise_id for e in core.exercise_index.get().candidates(10))
+
+
+def test_rejects_unknown_stress_level(conn):
+    with pytest.raises(ValueError):
+        core.recommend_exercise(11)
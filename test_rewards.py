@@ -0,0 +1,70 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import transaction
+from rewards import LOGIN, POST_SHARED, SESSION_SUBMITTED, backfill_rewards, record_event, seed_user_rewards
+
+EXERCISES = ("Mindful Breathing 1", "Mindful Breathing 2", "Body Scan", "Walking Meditation")
+
+
+def _add_users(conn, count):
+    user_ids = []
+    with transaction():
+        for index in range(count):
+            user_id = conn.execute("INSERT INTO users (username) VALUES (?)", (f"user{index}",)).lastrowid
+            seed_user_rewards(conn, user_id)
+            user_ids.append(user_id)
+    return user_ids
+
+
+def _events(rng, user_ids, days):
+    start = datetime(2024, 1, 1)
+    activity = {user_id: rng.choice((0.3, 0.6, 0.9)) for user_id in user_ids}
+    events = []
+    for day in range(days):
+        for user_id in user_ids:
+            if rng.random() < activity[user_id]:
+                for _ in range(rng.randint(1, 3)):
+                    at = start + timedelta(days=day, minutes=rng.randrange(24 * 60))
+                    events.append((at.strftime("%Y-%m-%d %H:%M:%S"), user_id,
+                                   rng.choices((SESSION_SUBMITTED, POST_SHARED, LOGIN), (6, 1, 3))[0]))
+    return sorted(events)
+
+
+def _replay(conn, rng, events):
+    for at, user_id, event in events:
+        with transaction():
+            if event == SESSION_SUBMITTED:
+                exercise = rng.choices(EXERCISES, (4, 4, 1, 1))[0]
+                before, after = rng.randint(1, 10), rng.randint(1, 10)
+                conn.execute("INSERT INTO stress_levels (user_id, date, stress_before, stress_after, exercise_type, "
+                             "duration_percentage) VALUES (?, ?, ?, ?, ?, ?)",
+                             (user_id, at, before, after, exercise, rng.uniform(0, 100)))
+                record_event(conn, user_id, event, date=at, exercise_type=exercise,
+                             stress_before=before, stress_after=after)
+            elif event == POST_SHARED:
+                conn.execute("INSERT INTO community_posts (user_id, content, date) VALUES (?, ?, ?)",
+                             (user_id, "post", at))
+                record_event(conn, user_id, event, date=at)
+            else:
+                conn.execute("INSERT INTO login_history (user_id, login_date) VALUES (?, ?)", (user_id, at))
+                record_event(conn, user_id, event, date=at)
+
+
+def _reward_state(conn):
+    return conn.execute("SELECT user_id, reward_name, earned, earn_date, progress, last_day FROM rewards "
+                        "ORDER BY user_id, reward_name").fetchall()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_record_event_matches_backfill(conn, seed):
+    rng = random.Random(seed)
+    _replay(conn, rng, _events(rng, _add_users(conn, 8), 90))
+    recorded = _reward_state(conn)
+    assert any(row[2] for row in recorded)
+    with transaction():
+        conn.execute("UPDATE rewards SET earned=0, earn_date=NULL, progress=0, last_day=NULL")
+        backfill_rewards(conn)
+    assert _reward_state(conn) == recorded
@@ -0,0 +1,124 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+import pytest
+
+import core
+import service
+
+
+@pytest.fixture
+def api(conn):
+    instance = service.Service(workers=1)
+    yield instance
+    instance.close()
+
+
+def call(api, method, path, body=None, token=None):
+    headers = {"authorization": f"Bearer {token}"} if token else {}
+    payload = body if isinstance(body, bytes) else json.dumps(body).encode() if body is not None else b""
+    return asyncio.run(api.dispatch(method, path, headers, payload))
+
+
+def login(api, username, password="secret"):
+    status, result = call(api, "POST", "/login", {"username": username, "password": password})
+    assert status == HTTPStatus.OK
+    return result["token"]
+
+
+@pytest.fixture
+def member(api):
+    core.register("alice", "secret")
+    return login(api, "alice")
+
+
+@pytest.fixture
+def manager(api):
+    core.add_manager("boss", "secret")
+    return login(api, "boss")
+
+
+def test_login_rejects_bad_password(api, member):
+    status, result = call(api, "POST", "/login", {"username": "alice", "password": "wrong"})
+    assert status == HTTPStatus.UNAUTHORIZED
+
+
+def test_routes_check_roles(api, member, manager):
+    assert call(api, "GET", "/stats")[0] == HTTPStatus.UNAUTHORIZED
+    assert call(api, "GET", "/stats", token=member)[0] == HTTPStatus.OK
+    assert call(api, "GET", "/stats", token=manager)[0] == HTTPStatus.FORBIDDEN
+    assert call(api, "GET", "/users", token=member)[0] == HTTPStatus.FORBIDDEN
+    assert call(api, "GET", "/users", token=manager)[0] == HTTPStatus.OK
+
+
+def test_unknown_routes(api):
+    assert call(api, "GET", "/nowhere")[0] == HTTPStatus.NOT_FOUND
+    assert call(api, "PATCH", "/posts")[0] == HTTPStatus.METHOD_NOT_ALLOWED
+
+
+def test_rejects_malformed_bodies(api, member):
+    assert call(api, "POST", "/posts", b"{", member)[0] == HTTPStatus.BAD_REQUEST
+    assert call(api, "POST", "/posts", b"[]", member)[0] == HTTPStatus.BAD_REQUEST
+    assert call(api, "POST", "/posts", {}, member)[0] == HTTPStatus.BAD_REQUEST
+
+
+def test_rejects_non_finite_completion(api, member):
+    body = b'{"exercise": "Body Scan", "stress_before": 6, "stress_after": 3, "completion": NaN}'
+    status, result = call(api, "POST", "/sessions", body, member)
+    assert status == HTTPStatus.BAD_REQUEST
+    assert call(api, "GET", "/sessions", token=member)[1] == []
+
+
+def test_comment_on_missing_post(api, member):
+    status, result = call(api, "POST", "/posts/999/comments", {"body": "hi"}, member)
+    assert status == HTTPStatus.NOT_FOUND
+    post_id = call(api, "POST", "/posts", {"content": "hello"}, member)[1]["id"]
+    assert call(api, "POST", f"/posts/{post_id}/comments", {"body": "hi"}, member)[0] == HTTPStatus.OK
+
+
+def test_delete_missing_post(api, manager):
+    assert call(api, "DELETE", "/posts/999", token=manager)[0] == HTTPStatus.NOT_FOUND
+
+
+def test_idle_tokens_expire(api, member, monkeypatch):
+    now = service.time.monotonic()
+    monkeypatch.setattr(service.time, "monotonic", lambda: now + service.TOKEN_IDLE_SECONDS - 1)
+    assert call(api, "GET", "/stats", token=member)[0] == HTTPStatus.OK
+    monkeypatch.setattr(service.time, "monotonic", lambda: now + 2 * service.TOKEN_IDLE_SECONDS - 2)
+    assert call(api, "GET", "/stats", token=member)[0] == HTTPStatus.OK
+    monkeypatch.setattr(service.time, "monotonic", lambda: now + 3 * service.TOKEN_IDLE_SECONDS)
+    assert call(api, "GET", "/stats", token=member)[0] == HTTPStatus.UNAUTHORIZED
+    assert not api.tokens
+
+
+def test_token_limit_evicts_oldest(api, member, monkeypatch):
+    monkeypatch.setattr(service, "MAX_TOKENS", 2)
+    tokens = [login(api, "alice") for _ in range(3)]
+    assert call(api, "GET", "/stats", token=member)[0] == HTTPStatus.UNAUTHORIZED
+    assert [call(api, "GET", "/stats", token=token)[0] for token in tokens] == [
+        HTTPStatus.UNAUTHORIZED, HTTPStatus.OK, HTTPStatus.OK]
+
+
+def test_logout_revokes_token(api, member):
+    assert call(api, "POST", "/logout", token=member)[0] == HTTPStatus.OK
+    assert call(api, "GET", "/stats", token=member)[0] == HTTPStatus.UNAUTHORIZED
+
+
+def _raw_request(api, request):
+    async def run():
+        server = await asyncio.start_server(api.handle_connection, "127.0.0.1", 0)
+        async with server:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(request)
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return response
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("length", ["-1", "ten"])
+def test_rejects_bad_content_length(api, length):
+    response = _raw_request(api, f"POST /login HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode())
+    assert response.startswith(b"HTTP/1.1 400 ")
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+from database import transaction
+from trends import DAILY, MAX_POINTS, RAW, WEEKLY, choose_resolution, fetch_trend, lttb
+
+
+def _add_sessions(conn, count, every):
+    start = datetime(2024, 1, 1)
+    with transaction():
+        user_id = conn.execute("INSERT INTO users (username) VALUES ('alice')").lastrowid
+        conn.executemany(
+            "INSERT INTO stress_levels (user_id, date, stress_before, stress_after, exercise_type, "
+            "duration_percentage) VALUES (?, ?, ?, ?, 'Body Scan', ?)",
+            [(user_id, (start + every * index).strftime("%Y-%m-%d %H:%M:%S"), index % 10 + 1, 1 + index % 3,
+              10.0 if index == count // 2 else 100.0) for index in range(count)])
+    return user_id
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    xs = list(range(1000))
+    ys = [100.0 if x == 500 else 0.0 for x in xs]
+    keep = lttb(xs, ys, 50)
+    assert len(keep) == 50 and keep == sorted(keep)
+    assert {0, 500, 999} <= set(keep)
+    assert lttb(xs[:10], ys[:10], 50) == list(range(10))
+
+
+def test_long_raw_history_is_downsampled(conn):
+    user_id = _add_sessions(conn, 2000, timedelta(hours=2))
+    assert choose_resolution(conn, user_id) == RAW
+    trend = fetch_trend(conn, user_id)
+    assert trend.resolution == RAW
+    for dates, values in (trend.stress_before, trend.stress_after, trend.completion):
+        assert len(dates) == len(values) == MAX_POINTS
+        assert dates == sorted(dates)
+        assert (dates[0], dates[-1]) == (datetime(2024, 1, 1), datetime(2024, 1, 1) + timedelta(hours=2 * 1999))
+    assert min(trend.completion[1]) == 10.0
+
+
+def test_histories_past_raw_limit_are_binned(conn):
+    user_id = _add_sessions(conn, 400, timedelta(hours=12))
+    assert choose_resolution(conn, user_id, raw_limit=300) == DAILY
+    assert len(fetch_trend(conn, user_id, DAILY).stress_before[0]) == 200
+    assert choose_resolution(conn, user_id, max_points=100, raw_limit=300) == WEEKLY
@@ -0,0 +1,87 @@
+from collections import namedtuple
+from datetime import datetime
+
+RAW = "raw"
+DAILY = "daily"
+WEEKLY = "weekly"
+MONTHLY = "monthly"
+
+MAX_POINTS = 300
+RAW_LIMIT = 3000
+
+BUCKETS = {
+    DAILY: "substr(date, 1, 10)",
+    WEEKLY: "date(date, 'weekday 0', '-6 days')",
+    MONTHLY: "substr(date, 1, 7) || '-01'",
+}
+
+SPAN_DAYS = {DAILY: 1, WEEKLY: 7, MONTHLY: 30}
+
+Trend = namedtuple("Trend", ["resolution", "stress_before", "stress_after", "completion"])
+
+
+def lttb(xs, ys, threshold):
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int((i + 1) * every) + 1
+        end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(xs[start:end]) / (end - start)
+        avg_y = sum(ys[start:end]) / (end - start)
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(int(i * every) + 1, start):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def _downsample(dates, values, max_points):
+    points = [(d, v) for d, v in zip(dates, values) if v is not None]
+    if len(points) <= max_points:
+        return [d for d, _ in points], [v for _, v in points]
+    xs = [d.timestamp() for d, _ in points]
+    ys = [float(v) for _, v in points]
+    keep = lttb(xs, ys, max_points)
+    return [points[i][0] for i in keep], [points[i][1] for i in keep]
+
+
+def choose_resolution(conn, user_id, max_points=MAX_POINTS, raw_limit=RAW_LIMIT):
+    count, first, last = conn.execute(
+        """SELECT (SELECT session_count FROM user_stats WHERE user_id = ?),
+                  (SELECT MIN(date) FROM stress_levels WHERE user_id = ?),
+                  (SELECT MAX(date) FROM stress_levels WHERE user_id = ?)""",
+        (user_id, user_id, user_id)).fetchone()
+    if first is None or (count or 0) <= raw_limit:
+        return RAW
+    span = (datetime.fromisoformat(last[:10]) - datetime.fromisoformat(first[:10])).days + 1
+    for resolution in (DAILY, WEEKLY):
+        if span / SPAN_DAYS[resolution] <= max_points:
+            return resolution
+    return MONTHLY
+
+
+def fetch_trend(conn, user_id, resolution=None, max_points=MAX_POINTS):
+    if resolution is None:
+        resolution = choose_resolution(conn, user_id, max_points)
+    if resolution == RAW:
+        rows = conn.execute(
+            "SELECT date, stress_before, stress_after, duration_percentage FROM stress_levels "
+            "WHERE user_id = ? AND date IS NOT NULL ORDER BY date", (user_id,)).fetchall()
+    else:
+        rows = conn.execute(
+            f"SELECT {BUCKETS[resolution]} AS bucket, AVG(stress_before), AVG(stress_after), "
+            f"AVG(duration_percentage) FROM stress_levels WHERE user_id = ? AND date IS NOT NULL "
+            f"GROUP BY bucket ORDER BY bucket", (user_id,)).fetchall()
+    if not rows:
+        return None
+    dates = [datetime.fromisoformat(row[0]) for row in rows]
+    return Trend(resolution, *(_downsample(dates, [row[i] for row in rows], max_points) for i in (1, 2, 3)))